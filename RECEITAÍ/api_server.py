@@ -0,0 +1,239 @@
+import argparse
+import json
+import queue
+import re
+import sys
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from recipe_io import normalize_recipe
+from recipe_repository import DuplicateIngredientError, RecipeNotFoundError, RecipeRepository, RepositoryError
+
+# Small local JSON API over RecipeRepository, so other programs can use the recipe bank without the GUI.
+# Example: python api_server.py --db receitas.db --port 8000
+#   GET    /recipes?ingredients=ovo,leite&category=Doce&text=bolo&limit=50&offset=0
+#   GET    /recipes/<id>
+#   POST   /recipes          (body: a recipe in the same format as the bulk import)
+#   PUT    /recipes/<id>
+#   DELETE /recipes/<id>
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+LOG_FLUSH_INTERVAL = 1.0 # Seconds between the checks for buffered log events old enough to be written (see LogBuffer)
+
+
+class RecipeRequestHandler(BaseHTTPRequestHandler):
+    server_version = "ReceitaiAPI/1.0"
+
+    # (method, path pattern, handler method name). The groups of the pattern are passed to the handler
+    ROUTES = (
+        ("GET", r"/recipes", "_list_recipes"),
+        ("POST", r"/recipes", "_create_recipe"),
+        ("GET", r"/recipes/(\d+)", "_get_recipe"),
+        ("PUT", r"/recipes/(\d+)", "_update_recipe"),
+        ("DELETE", r"/recipes/(\d+)", "_delete_recipe"),
+    )
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        path = url.path.rstrip('/') or '/'
+        route = None
+        path_exists = False
+        for route_method, pattern, handler_name in self.ROUTES:
+            match = re.fullmatch(pattern, path)
+            if match:
+                path_exists = True
+                if route_method == method:
+                    route = (handler_name, match.groups())
+                    break
+        if route is None:
+            if path_exists:
+                self._send_error(HTTPStatus.METHOD_NOT_ALLOWED, "Método Não Permitido", f"{method} não é aceito em {path}.")
+            else:
+                self._send_error(HTTPStatus.NOT_FOUND, "Não Encontrado", f"Caminho desconhecido: {path}")
+            return
+
+        handler_name, groups = route
+        try:
+            status, body = getattr(self, handler_name)(self.server.repository, parse_qs(url.query), *groups)
+        except RecipeNotFoundError as e:
+            self._send_error(HTTPStatus.NOT_FOUND, e.title, str(e))
+        except DuplicateIngredientError as e:
+            self._send_error(HTTPStatus.CONFLICT, e.title, str(e))
+        except RepositoryError as e:
+            self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, e.title, str(e))
+        except ValueError as e: # Bad JSON, bad numbers, bad match_mode...
+            self._send_error(HTTPStatus.BAD_REQUEST, "Requisição Inválida", str(e))
+        else:
+            self._send_json(status, body)
+
+    def _list_recipes(self, repository, query):
+        filters = {
+            'ingredients_input': _query_value(query, 'ingredients'),
+            'max_prep_time': _query_value(query, 'max_prep_time'),
+            'category': _query_value(query, 'category'),
+            'difficulty': _query_value(query, 'difficulty'),
+            'match_mode': _query_value(query, 'match_mode', "prefix"),
+            'text': _query_value(query, 'text'),
+        }
+        limit = min(int(_query_value(query, 'limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        offset = int(_query_value(query, 'offset', 0))
+        if limit < 0 or offset < 0:
+            raise ValueError("limit e offset não podem ser negativos.")
+        total = repository.count_recipes(**filters)
+        recipes = repository.filter_recipes(**filters, limit=limit, offset=offset)
+        return HTTPStatus.OK, {'total': total, 'limit': limit, 'offset': offset, 'recipes': recipes}
+
+    def _get_recipe(self, repository, query, recipe_id):
+        recipe = repository.get_recipe_by_id(int(recipe_id))
+        if recipe is None:
+            raise RecipeNotFoundError(f"Receita {recipe_id} não encontrada.")
+        return HTTPStatus.OK, recipe
+
+    def _create_recipe(self, repository, query):
+        recipe = self._read_recipe()
+        recipe_id = repository.add_recipe(recipe['name'], recipe['prep_time'], recipe['difficulty'], recipe['category'],
+                                          recipe['instructions'], recipe['tags'], recipe['ingredients'])
+        return HTTPStatus.CREATED, {'recipe_id': recipe_id}
+
+    def _update_recipe(self, repository, query, recipe_id):
+        recipe = self._read_recipe()
+        repository.update_recipe(int(recipe_id), recipe['name'], recipe['prep_time'], recipe['difficulty'], recipe['category'],
+                                 recipe['instructions'], recipe['tags'], recipe['ingredients'])
+        return HTTPStatus.OK, {'recipe_id': int(recipe_id)}
+
+    def _delete_recipe(self, repository, query, recipe_id):
+        repository.delete_recipe(int(recipe_id))
+        return HTTPStatus.NO_CONTENT, None
+
+    def _read_recipe(self):
+        """Reads the JSON body and normalizes it like the bulk import does."""
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            record = json.loads(self.rfile.read(length) or b"null")
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise ValueError(f"O corpo da requisição não é um JSON válido: {e}") from e
+        if not isinstance(record, dict):
+            raise ValueError("O corpo da requisição deve ser um objeto JSON com a receita.")
+        recipe = normalize_recipe(record)
+        if not recipe['name']:
+            raise ValueError("O nome da receita é obrigatório.")
+        return recipe
+
+    def _send_error(self, status, title, message):
+        self._send_json(status, {'error': title, 'message': message})
+
+    def _send_json(self, status, body):
+        self.send_response(status)
+        if body is None:
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _query_value(query, name, default=""):
+    values = query.get(name)
+    return values[-1] if values else default
+
+
+class RecipeAPIServer(HTTPServer):
+    """
+    HTTP server that answers requests in a fixed number of worker threads.
+    The workers share one RecipeRepository with a read connection per worker, so searches run in parallel
+    and the writes take turns on the single writer connection. wal=True lets the searches go on during writes.
+    """
+
+    def __init__(self, server_address, db_name="receitas.db", workers=4, wal=False):
+        # Opened before binding the port, so a bad database doesn't leave a server that only answers errors
+        self.repository = RecipeRepository(db_name, wal=wal, read_pool_size=workers)
+        try:
+            super().__init__(server_address, RecipeRequestHandler)
+        except OSError:
+            self.repository.close()
+            raise
+        self._requests = queue.Queue()
+        self._workers = [threading.Thread(target=self._work, name=f"RecipeAPI-{n}", daemon=True) for n in range(workers)]
+        for worker in self._workers:
+            worker.start()
+        # Without it the events of a quiet server would stay in memory until the 100th one (or the shutdown)
+        self._closing = threading.Event()
+        self._log_flusher = threading.Thread(target=self._flush_logs, name="RecipeAPI-logs", daemon=True)
+        self._log_flusher.start()
+
+    def process_request(self, request, client_address):
+        self._requests.put((request, client_address))
+
+    def _work(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                break
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def _flush_logs(self):
+        while not self._closing.wait(LOG_FLUSH_INTERVAL):
+            self.repository.flush_logs_if_due()
+
+    def server_close(self):
+        """Lets the workers finish the requests already accepted, then closes the repository (flushing the logs)."""
+        super().server_close()
+        for _ in self._workers:
+            self._requests.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._closing.set()
+        self._log_flusher.join()
+        self.repository.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP local (JSON) do banco de receitas.")
+    parser.add_argument("--host", default="127.0.0.1", help="Endereço (padrão: 127.0.0.1, só esta máquina)")
+    parser.add_argument("--port", type=int, default=8000, help="Porta (padrão: 8000)")
+    parser.add_argument("--db", default="receitas.db", help="Banco de dados SQLite (padrão: receitas.db)")
+    parser.add_argument("--workers", type=int, default=4, help="Requisições atendidas ao mesmo tempo (padrão: 4)")
+    parser.add_argument("--wal", action="store_true", help="Usa o modo WAL, para as buscas não esperarem as gravações")
+    args = parser.parse_args(argv)
+
+    try:
+        server = RecipeAPIServer((args.host, args.port), args.db, workers=args.workers, wal=args.wal)
+    except RepositoryError as e:
+        print(f"Erro no banco de dados: {e}", file=sys.stderr)
+        return 1
+    print(f"API de receitas em http://{args.host}:{server.server_port}/recipes (Ctrl+C para parar)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+import argparse
+import sys
+
+from recipe_repository import LOG_RETENTION_DAYS, RecipeRepository, RepositoryError
+
+# Archives the user logs older than the retention period right away (the app also does it by itself, a batch at a time,
+# when it is idle), shows the per day counts and can compact the database file.
+# Example: python archive_logs.py --db receitas.db --days 30 --vacuum
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Arquiva os logs antigos do usuário e compacta o banco de dados.")
+    parser.add_argument("--db", default="receitas.db", help="Banco de dados SQLite (padrão: receitas.db)")
+    parser.add_argument("--days", type=int, default=LOG_RETENTION_DAYS,
+                        help=f"Mantém na tabela de logs só os últimos DAYS dias (padrão: {LOG_RETENTION_DAYS})")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="Compacta o arquivo do banco depois (lento em bancos grandes; bancos antigos passam a se compactar sozinhos)")
+    parser.add_argument("--rollups", action="store_true", help="Mostra quantas ações de cada tipo houve por dia")
+    args = parser.parse_args(argv)
+
+    try:
+        db_manager = RecipeRepository(args.db, log_retention_days=args.days)
+    except RepositoryError as e:
+        print(f"Erro no banco de dados: {e}", file=sys.stderr)
+        return 1
+
+    try:
+        archived = db_manager.archive_old_logs()
+        print(f"{archived} eventos arquivados (anteriores a {args.days} dias).")
+        if args.vacuum:
+            db_manager.vacuum()
+            print("Banco de dados compactado.")
+        if args.rollups:
+            for day, action_type, events in db_manager.get_log_rollups():
+                print(f"{day}  {events:>8}  {action_type}")
+    except RepositoryError as e:
+        print(f"Erro no banco de dados: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db_manager.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
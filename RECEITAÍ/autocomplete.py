@@ -0,0 +1,117 @@
+import tkinter as tk
+
+# Keys that move around or pick in the list, they don't change the text so they don't refresh the suggestions
+NAVIGATION_KEYS = {"Up", "Down", "Return", "KP_Enter", "Escape", "Tab", "Left", "Right", "Home", "End",
+                   "Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R"}
+
+
+class AutocompleteDropdown:
+    """
+    Suggestion list under an Entry, refreshed on every key.
+    complete(prefix) gives the suggestions. It is called on the Tk thread for every key, so it has to be
+    in-memory and fast (a PrefixIndex.complete, see RecipeRepository.autocomplete_indexes), never a query.
+    With multiple=True the entry is a comma separated list and only the word after the last comma is completed.
+    Up/Down choose a suggestion, Return or a click picks it and Escape closes the list.
+    on_pick() is called after a suggestion is written in the entry.
+    Its bindings are added to the entry's, so create it before binding <Return> to something else:
+    a Return that picks a suggestion stops there.
+    """
+
+    def __init__(self, entry, complete, on_pick=None, multiple=False, limit=8):
+        self.entry = entry
+        self.complete = complete
+        self.on_pick = on_pick
+        self.multiple = multiple
+        self.limit = limit
+        self.popup = None # Created the first time there is something to show
+        self.listbox = None
+
+        entry.bind("<KeyRelease>", self._on_key_release, add="+")
+        entry.bind("<Down>", lambda event: self._move_selection(1), add="+")
+        entry.bind("<Up>", lambda event: self._move_selection(-1), add="+")
+        entry.bind("<Return>", self._on_return, add="+")
+        entry.bind("<Escape>", self._on_escape, add="+")
+        # Waits a bit before closing, so a click on the list still gets there
+        entry.bind("<FocusOut>", lambda event: entry.after(150, self.hide), add="+")
+
+    def is_open(self):
+        return self.popup is not None and self.popup.winfo_exists() and self.listbox.size() > 0
+
+    def _current_word(self):
+        """(text before the word being typed, the word)."""
+        text = self.entry.get()
+        if self.multiple and "," in text:
+            head, _, word = text.rpartition(",")
+            return head + ", ", word.strip()
+        return "", text.strip()
+
+    def _on_key_release(self, event):
+        if event.keysym in NAVIGATION_KEYS:
+            return
+        _, word = self._current_word()
+        suggestions = self.complete(word) if word else []
+        if suggestions == [word]:
+            suggestions = [] # Already typed in full
+        self._show(suggestions)
+
+    def _show(self, suggestions):
+        if not suggestions:
+            self.hide()
+            return
+        if self.popup is None or not self.popup.winfo_exists():
+            self.popup = tk.Toplevel(self.entry)
+            self.popup.wm_overrideredirect(True) # No title bar, it is just a list under the entry
+            self.listbox = tk.Listbox(self.popup, activestyle="none", takefocus=0)
+            self.listbox.pack(fill=tk.BOTH, expand=True)
+            self.listbox.bind("<ButtonRelease-1>", lambda event: self._pick())
+        self.listbox.delete(0, tk.END)
+        for suggestion in suggestions:
+            self.listbox.insert(tk.END, suggestion)
+        self.listbox.config(height=len(suggestions))
+        self.popup.geometry(f"{self.entry.winfo_width()}x{self.listbox.winfo_reqheight()}"
+                            f"+{self.entry.winfo_rootx()}+{self.entry.winfo_rooty() + self.entry.winfo_height()}")
+        self.popup.deiconify()
+        self.popup.lift()
+
+    def hide(self):
+        if self.popup is not None and self.popup.winfo_exists():
+            self.listbox.delete(0, tk.END)
+            self.popup.withdraw()
+
+    def _move_selection(self, step):
+        if not self.is_open():
+            return None
+        selection = self.listbox.curselection()
+        position = (selection[0] + step if selection else (0 if step > 0 else self.listbox.size() - 1)) % self.listbox.size()
+        self.listbox.selection_clear(0, tk.END)
+        self.listbox.selection_set(position)
+        self.listbox.see(position)
+        return "break"
+
+    def _on_return(self, event):
+        if self.is_open() and self.listbox.curselection():
+            self._pick()
+            return "break" # Picking a suggestion doesn't run the entry's own Return (the search)
+        self.hide()
+        return None
+
+    def _on_escape(self, event):
+        if self.is_open():
+            self.hide()
+            return "break"
+        return None
+
+    def _pick(self):
+        selection = self.listbox.curselection()
+        if not selection:
+            return
+        head, _ = self._current_word()
+        text = head + self.listbox.get(selection[0])
+        if self.multiple:
+            text += ", " # Ready for the next ingredient
+        self.entry.delete(0, tk.END)
+        self.entry.insert(0, text)
+        self.entry.icursor(tk.END)
+        self.hide()
+        if self.on_pick:
+            self.on_pick()
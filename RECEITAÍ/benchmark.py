@@ -0,0 +1,227 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from recipe_corpus import CORPUS_SIZES, DEFAULT_SEED, INGREDIENTS, build_database, generate_recipes
+from recipe_repository import RecipeRepository
+
+# Benchmark suite: times every repository operation on synthetic collections (see recipe_corpus.py)
+# and writes the results as JSON, so two versions can be compared on the same machine.
+# Run it with: python benchmark.py --sizes 1000 10000 --output resultados.json
+# The generated databases are kept in --corpus-dir, so the (slow) 1M one is only built once.
+
+RESULTS_PAGE_SIZE = 200 # Same page size the app uses
+SHOPPING_LIST_RECIPES = 50 # Recipes picked for the shopping list, a busy week
+EXPORT_SAMPLE = 1000 # Recipes streamed by the iter_recipes operation (the export reads every one the same way)
+POPULAR_INGREDIENTS = [ingredient[0] for ingredient in INGREDIENTS[:15]]
+SEARCH_WORDS = ("bolo", "torta de frango", "chocolate", "sopa", "cremoso", "forno", "vovó", "arroz")
+
+
+class _QueryCounter:
+    """
+    Counts the SELECT statements sent to SQLite, as the observer of the repository's statement trace
+    (which then stays on for every connection the repository uses, its slow query log keeps working meanwhile).
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.selects = 0
+
+    def __enter__(self):
+        self.repository.statement_trace.observer = self._trace
+        return self
+
+    def __exit__(self, *exc_info):
+        self.repository.statement_trace.observer = None
+
+    def _trace(self, statement):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.selects += 1
+
+
+def _measure(repository, calls):
+    """Runs each (function, args, kwargs) once. Returns the times in seconds and the SELECTs per call."""
+    times = []
+    with _QueryCounter(repository) as counter:
+        for function, args, kwargs in calls:
+            start = time.perf_counter()
+            function(*args, **kwargs)
+            times.append(time.perf_counter() - start)
+    return times, counter.selects / len(calls)
+
+
+def _summary(recipes, operation, times, queries):
+    times_ms = sorted(t * 1000 for t in times)
+    return {
+        'recipes': recipes,
+        'operation': operation,
+        'runs': len(times_ms),
+        'mean_ms': statistics.fmean(times_ms),
+        'median_ms': statistics.median(times_ms),
+        'p95_ms': times_ms[min(len(times_ms) - 1, int(len(times_ms) * 0.95))],
+        'min_ms': times_ms[0],
+        'max_ms': times_ms[-1],
+        'queries_per_call': queries,
+    }
+
+
+def _benchmark_operations(repository, size, runs, seed):
+    """Yields (operation, calls) in the order they must run. Write operations come first and undo each other."""
+    rng = random.Random(seed)
+    heavy_runs = max(1, min(runs, 5 if size <= 10000 else 1)) # get_all_recipes loads the whole collection
+
+    new_recipes = list(generate_recipes(runs, seed + 1000))
+    yield "add_recipe", [(repository.add_recipe, (r['name'], r['prep_time'], r['difficulty'], r['category'],
+                                                  r['instructions'], r['tags'], r['ingredients']), {}) for r in new_recipes]
+
+    edits = list(generate_recipes(runs, seed + 2000))
+    yield "update_recipe", [(repository.update_recipe, (rng.randint(1, size), r['name'], r['prep_time'], r['difficulty'],
+                                                        r['category'], r['instructions'], r['tags'], r['ingredients']), {})
+                            for r in edits]
+
+    # The recipes added above are the last ids, deleting them puts the collection back to its size
+    added_ids = [row[0] for row in repository.conn.execute("SELECT recipe_id FROM recipes ORDER BY recipe_id DESC LIMIT ?", (runs,))]
+    yield "delete_recipe", [(repository.delete_recipe, (recipe_id,), {}) for recipe_id in added_ids]
+
+    def get_uncached(recipe_id):
+        repository.recipe_cache.clear()
+        return repository.get_recipe_by_id(recipe_id)
+    yield "get_recipe_by_id", [(get_uncached, (rng.randint(1, size),), {}) for _ in range(runs)]
+    yield "get_recipe_by_id[cache]", [(repository.get_recipe_by_id, (recipe_id,), {})
+                                      for recipe_id in [rng.randint(1, size)] for _ in range(runs)]
+
+    def uncached(method):
+        """The searches are timed running their queries, not coming from the query cache."""
+        def call(*args, **kwargs):
+            repository.query_cache.clear()
+            return method(*args, **kwargs)
+        return call
+
+    yield "get_all_recipes", [(uncached(repository.get_all_recipes), (), {}) for _ in range(heavy_runs)]
+
+    def export_sample():
+        for _ in itertools.islice(repository.iter_recipes(), EXPORT_SAMPLE):
+            pass
+
+    yield f"iter_recipes[{EXPORT_SAMPLE}]", [(export_sample, (), {}) for _ in range(runs)]
+
+    for count in range(1, 6):
+        calls = []
+        for _ in range(runs):
+            ingredients = ", ".join(rng.sample(POPULAR_INGREDIENTS, count))
+            calls.append((uncached(repository.filter_recipes), (ingredients, "", "", ""), {'limit': RESULTS_PAGE_SIZE}))
+        yield f"filter_recipes[{count} ingrediente{'s' if count > 1 else ''}]", calls
+    yield "filter_recipes[categoria+dificuldade]", [
+        (uncached(repository.filter_recipes), ("", "", rng.choice(["Doce", "Salgado", "Lanche"]), rng.choice(["Fácil", "Médio"])),
+         {'limit': RESULTS_PAGE_SIZE}) for _ in range(runs)]
+    yield "filter_recipes[cache]", [(repository.filter_recipes, (ingredients, "", "", ""), {'limit': RESULTS_PAGE_SIZE})
+                                    for ingredients in [", ".join(rng.sample(POPULAR_INGREDIENTS, 2))] for _ in range(runs)]
+    yield "count_recipes[2 ingredientes]", [(uncached(repository.count_recipes), (", ".join(rng.sample(POPULAR_INGREDIENTS, 2)), "", "", ""), {})
+                                            for _ in range(runs)]
+    yield "search_recipes_text", [(repository.search_recipes_text, (rng.choice(SEARCH_WORDS),), {'limit': RESULTS_PAGE_SIZE})
+                                  for _ in range(runs)]
+    yield "find_recipes_by_pantry[construção do índice]", [(repository._load_pantry_index, (), {})]
+    for count in (3, 10):
+        yield f"find_recipes_by_pantry[{count} ingredientes]", [
+            (repository.find_recipes_by_pantry, (", ".join(rng.sample(POPULAR_INGREDIENTS, count)),), {'limit': RESULTS_PAGE_SIZE})
+            for _ in range(runs)]
+    yield "find_similar_recipes[assinaturas]", [(repository._backfill_signatures, (), {})] # Only signs older corpora
+    yield "find_similar_recipes", [(repository.find_similar_recipes, (rng.randint(1, size),), {}) for _ in range(runs)]
+    yield f"shopping_list[{SHOPPING_LIST_RECIPES} receitas]", [
+        (repository.shopping_list, (rng.sample(range(1, size + 1), min(size, SHOPPING_LIST_RECIPES)),), {}) for _ in range(runs)]
+
+    yield "get_logs[primeira página]", [(repository.get_logs, (), {'limit': RESULTS_PAGE_SIZE}) for _ in range(runs)]
+    deep_page = repository.get_logs(limit=RESULTS_PAGE_SIZE * 50)
+    if deep_page:
+        before = deep_page[-1][1], deep_page[-1][0]
+        yield "get_logs[página 50]", [(repository.get_logs, (), {'before': before, 'limit': RESULTS_PAGE_SIZE}) for _ in range(runs)]
+    yield "get_logs[por ação]", [(repository.get_logs, (), {'action_type': "Receita Excluída", 'limit': RESULTS_PAGE_SIZE})
+                                 for _ in range(runs)]
+
+    yield "log_action", [(repository.log_action, ("Busca de Receita", f"Benchmark {n}"), {}) for n in range(runs)]
+    def log_and_flush(events):
+        for n in range(events):
+            repository.log_buffer.add("2024-01-01 00:00:00", "Busca de Receita", f"Benchmark {n}")
+        repository.flush_logs()
+    yield "flush_logs[100 eventos]", [(log_and_flush, (100,), {}) for _ in range(runs)]
+
+
+def corpus_path(corpus_dir, size, seed):
+    """Builds the synthetic database for this size and seed, unless it is already in corpus_dir."""
+    path = os.path.join(corpus_dir, f"corpus_{size}_{seed}.db")
+    if not os.path.exists(path):
+        print(f"Gerando coleção com {size} receitas em {path}...", file=sys.stderr)
+        partial = path + ".parcial"
+        if os.path.exists(partial):
+            os.remove(partial)
+        build_database(partial, size, seed)
+        os.replace(partial, path)
+    return path
+
+
+def run_benchmarks(sizes, runs=20, seed=DEFAULT_SEED, corpus_dir=None):
+    """Times every operation for each collection size. Returns the results dict written as JSON."""
+    corpus_dir = corpus_dir or os.path.join(tempfile.gettempdir(), "receitai_corpus")
+    os.makedirs(corpus_dir, exist_ok=True)
+    results = []
+    for size in sizes:
+        source = corpus_path(corpus_dir, size, seed)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # A copy, so the write operations never change the cached collection
+            db_path = os.path.join(tmp_dir, "bench.db")
+            shutil.copyfile(source, db_path)
+            repository = RecipeRepository(db_path)
+            try:
+                for operation, calls in _benchmark_operations(repository, size, runs, seed):
+                    times, queries = _measure(repository, calls)
+                    results.append(_summary(size, operation, times, queries))
+                    print(f"{size:>9} {operation:>38} {results[-1]['median_ms']:>11.3f} {results[-1]['p95_ms']:>11.3f} "
+                          f"{queries:>8.1f}", file=sys.stderr)
+            finally:
+                repository.close()
+    return {
+        'meta': {
+            'date': datetime.now().isoformat(timespec="seconds"),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'seed': seed,
+            'runs': runs,
+        },
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede o tempo das operações do banco em coleções sintéticas de receitas.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000],
+                        help=f"Quantidades de receitas (padrão: 1000 10000; todas: {' '.join(map(str, CORPUS_SIZES))})")
+    parser.add_argument("--runs", type=int, default=20, help="Repetições de cada operação (padrão: 20)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help=f"Semente das coleções (padrão: {DEFAULT_SEED})")
+    parser.add_argument("--corpus-dir", help="Pasta onde as coleções geradas ficam guardadas (padrão: pasta temporária)")
+    parser.add_argument("--output", help="Arquivo JSON com os resultados (padrão: saída padrão)")
+    args = parser.parse_args(argv)
+
+    print(f"{'receitas':>9} {'operação':>38} {'mediana ms':>11} {'p95 ms':>11} {'queries':>8}", file=sys.stderr)
+    report = run_benchmarks(args.sizes, args.runs, args.seed, args.corpus_dir)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+import argparse
+import sys
+
+from recipe_io import FORMATS, read_recipes
+from recipe_repository import RecipeRepository, RepositoryError
+
+# Command line bulk import, for seeding or migrating big recipe collections without the GUI.
+# Example: python bulk_import.py receitas.jsonl --db receitas.db
+
+
+def _print_progress(imported, elapsed):
+    rate = imported / elapsed if elapsed > 0 else 0.0
+    print(f"\r{imported} receitas importadas ({rate:.0f} receitas/s)", end="", file=sys.stderr, flush=True)
+
+
+def _print_invalid(record_number, error):
+    print(f"\nReceita {record_number} ignorada: {error}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa receitas em massa de arquivos JSON, JSONL ou CSV (também .gz).")
+    parser.add_argument("files", nargs="+", help="Arquivos com as receitas")
+    parser.add_argument("--db", default="receitas.db", help="Banco de dados SQLite (padrão: receitas.db)")
+    parser.add_argument("--format", choices=FORMATS, help="Formato dos arquivos (padrão: pela extensão)")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Receitas por transação (padrão: 10000)")
+    args = parser.parse_args(argv)
+
+    try:
+        db_manager = RecipeRepository(args.db)
+    except RepositoryError as e:
+        print(f"Erro no banco de dados: {e}", file=sys.stderr)
+        return 1
+    try:
+        for path in args.files:
+            print(f"Importando {path}...", file=sys.stderr)
+            summary = db_manager.bulk_add_recipes(read_recipes(path, args.format, on_invalid=_print_invalid), batch_size=args.batch_size,
+                                                  progress_callback=_print_progress, source=path)
+            print(file=sys.stderr)
+            print(f"{path}: {summary['imported']} receitas importadas, {summary['skipped']} ignoradas, "
+                  f"{summary['seconds']:.2f}s ({summary['recipes_per_second']:.0f} receitas/s)")
+    except (OSError, ValueError) as e:
+        print(f"\nErro ao ler o arquivo: {e}", file=sys.stderr)
+        return 1
+    except RepositoryError as e: # The batch that failed was already rolled back
+        print(f"\nErro no banco de dados: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db_manager.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
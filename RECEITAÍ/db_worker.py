@@ -0,0 +1,128 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class DatabaseWorker:
+    """
+    Runs every database call in its own thread, so the Tk mainloop never waits for SQLite.
+    The worker thread creates the RecipeRepository and executes the requests from a queue, one at a time.
+    The repository opens its connections with check_same_thread=False and guards them with its own locks,
+    so any thread may use it; the point of the worker is only that the Tk thread never waits for a query.
+
+    Results go back through futures. Callbacks given to submit run on the Tk thread: attach(root)
+    starts a root.after loop that delivers them, so they can touch widgets safely.
+
+    Requests submitted with a key supersede the previous one with the same key: if it is still waiting
+    in the queue it is cancelled, if it is already running its callback is just never called.
+    """
+
+    def __init__(self, db_factory, on_error=None, idle_interval=1.0):
+        self.on_error = on_error # Called on the Tk thread as on_error(title, message) when something fails
+        self.idle_interval = idle_interval # How often the worker flushes the log buffer when nothing is happening
+        self._requests = queue.Queue()
+        self._done = queue.Queue() # Functions to run on the Tk thread
+        self._latest = {} # key --> Future of the most recent request with that key
+        self._lock = threading.Lock()
+        self._root = None
+        self._poll_interval = 20
+        self._thread = threading.Thread(target=self._run, args=(db_factory,), name="DatabaseWorker", daemon=True)
+        self._thread.start()
+
+    def attach(self, root, poll_interval=20):
+        """Starts delivering results to callbacks on the Tk thread, checking every poll_interval ms."""
+        self._root = root
+        self._poll_interval = poll_interval
+        self._poll()
+
+    def submit(self, operation, *args, callback=None, errback=None, key=None, **kwargs):
+        """
+        Queues a call. operation is a RecipeRepository method name ("filter_recipes") or a function
+        that receives the repository (for several calls that belong together).
+        callback(result) is called on the Tk thread when it finishes. If it raises, on_error gets
+        the error instead (its title attribute, when it has one, is the title) and then errback(error),
+        for cleaning up what was waiting for the result (a busy indicator, for example). Returns a Future.
+        """
+        future = Future()
+        if key is not None:
+            with self._lock:
+                previous = self._latest.get(key)
+                self._latest[key] = future
+            if previous is not None:
+                previous.cancel() # Only works if it didn't start yet, otherwise _deliver ignores its result
+        self._requests.put((future, operation, args, kwargs, callback, errback, key))
+        return future
+
+    def is_busy(self, key):
+        """True while the latest request with this key hasn't finished."""
+        with self._lock:
+            future = self._latest.get(key)
+        return future is not None and not future.done()
+
+    def close(self, timeout=10.0):
+        """Finishes the queued requests, closes the database (flushing the logs) and stops the thread."""
+        self._requests.put(None)
+        self._thread.join(timeout)
+
+    def _run(self, db_factory):
+        try:
+            db = db_factory()
+        except Exception as e:
+            self._report(e)
+            return
+        while True:
+            try:
+                request = self._requests.get(timeout=self.idle_interval)
+            except queue.Empty:
+                db.flush_logs_if_due() # Nothing to do, good time to write old buffered log events
+                db.archive_logs_step() # and to archive one batch of old ones (see RecipeRepository.archive_old_logs)
+                continue
+            if request is None:
+                break
+
+            future, operation, args, kwargs, callback, errback, key = request
+            if not future.set_running_or_notify_cancel():
+                continue # A newer request with the same key replaced this one while it was waiting
+            try:
+                function = getattr(db, operation) if isinstance(operation, str) else operation
+                if not isinstance(operation, str):
+                    args = (db,) + args
+                future.set_result(function(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            self._done.put(lambda future=future, callback=callback, errback=errback, key=key: self._deliver(future, callback, errback, key))
+            db.flush_logs_if_due()
+        db.close()
+
+    def _deliver(self, future, callback, errback, key):
+        """Runs on the Tk thread: calls the callback (or errback), unless a newer request with the same key exists."""
+        if key is not None:
+            with self._lock:
+                if self._latest.get(key) is not future:
+                    return
+        error = future.exception()
+        if error is not None:
+            self._show_error(error)
+            if errback is not None:
+                errback(error)
+        elif callback is not None:
+            callback(future.result())
+
+    def _report(self, error):
+        """Called by the worker thread: the error is shown by the Tk thread, never by the worker."""
+        self._done.put(lambda: self._show_error(error))
+
+    def _show_error(self, error):
+        if self.on_error:
+            self.on_error(getattr(error, 'title', "Erro de Banco de Dados"), str(error))
+
+    def _poll(self):
+        """Runs the finished requests callbacks and schedules itself again."""
+        while True:
+            try:
+                deliver = self._done.get_nowait()
+            except queue.Empty:
+                break
+            deliver()
+        if self._thread.is_alive() or not self._done.empty():
+            self._root.after(self._poll_interval, self._poll)
@@ -0,0 +1,53 @@
+import argparse
+import sys
+import time
+
+from recipe_io import FORMATS, write_recipes
+from recipe_repository import EXPORT_CHUNK_SIZE, RecipeRepository, RepositoryError
+
+# Command line export of the whole recipe database, in the formats bulk_import.py reads (so it is also a backup).
+# Recipes are read a chunk at a time and written as they come, memory use doesn't grow with the database.
+# Example: python export_recipes.py receitas.jsonl.gz --db receitas.db
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta todas as receitas para um arquivo JSON, JSONL ou CSV (também .gz).")
+    parser.add_argument("output", help="Arquivo de saída (termine com .gz para compactar)")
+    parser.add_argument("--db", default="receitas.db", help="Banco de dados SQLite (padrão: receitas.db)")
+    parser.add_argument("--format", choices=FORMATS, help="Formato do arquivo (padrão: pela extensão)")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE,
+                        help=f"Receitas lidas por consulta (padrão: {EXPORT_CHUNK_SIZE})")
+    args = parser.parse_args(argv)
+
+    try:
+        db_manager = RecipeRepository(args.db)
+    except RepositoryError as e:
+        print(f"Erro no banco de dados: {e}", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+
+    def print_progress(written):
+        elapsed = time.perf_counter() - start
+        rate = written / elapsed if elapsed > 0 else 0.0
+        print(f"\r{written} receitas exportadas ({rate:.0f} receitas/s)", end="", file=sys.stderr, flush=True)
+
+    try:
+        written = write_recipes(db_manager.iter_recipes(chunk_size=args.chunk_size), args.output, args.format,
+                                progress_callback=print_progress)
+        elapsed = time.perf_counter() - start
+        print(file=sys.stderr)
+        print(f"{args.output}: {written} receitas exportadas, {elapsed:.2f}s")
+    except (OSError, ValueError) as e:
+        print(f"\nErro ao gravar o arquivo: {e}", file=sys.stderr)
+        return 1
+    except RepositoryError as e:
+        print(f"\nErro no banco de dados: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db_manager.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+import functools
+import re
+import unicodedata
+
+# Parser for the ingredient lines typed in the app or read by the bulk import, written as
+# "quantidade unidade de ingrediente": "1/2 xícara de açúcar", "2 colheres de sopa de manteiga", "3 ovos", "sal a gosto".
+# Besides the text as typed, it gives the quantity as a number and the unit in a canonical form,
+# which is what the database stores in quantity_value and unit_canonical to sum quantities in SQL.
+
+# Canonical unit --> the ways people write it. Matching ignores case, and the longest alias wins,
+# so "colher de sopa" is never read as "colher" followed by the ingredient "sopa".
+UNIT_ALIASES = {
+    "colher de sopa": ("colher de sopa", "colheres de sopa", "colher (sopa)", "colheres (sopa)", "c. de sopa", "c.s.", "cs", "csp"),
+    "colher de chá": ("colher de chá", "colheres de chá", "colher de cha", "colheres de cha", "colher (chá)", "colheres (chá)",
+                      "c. de chá", "c.c.", "cc", "cch"),
+    "colher de sobremesa": ("colher de sobremesa", "colheres de sobremesa"),
+    "colher": ("colher", "colheres"),
+    "xícara": ("xícara", "xícaras", "xicara", "xicaras", "xícara de chá", "xícaras de chá", "xicara de cha", "xicaras de cha",
+               "xícara (chá)", "xícaras (chá)", "xicara (cha)", "xicaras (cha)", "xic", "xíc"),
+    "copo": ("copo", "copos", "copo americano", "copos americanos"),
+    "g": ("g", "gr", "grs", "grama", "gramas"),
+    "kg": ("kg", "kgs", "quilo", "quilos", "kilo", "kilos", "quilograma", "quilogramas"),
+    "mg": ("mg", "miligrama", "miligramas"),
+    "ml": ("ml", "mililitro", "mililitros"),
+    "l": ("l", "litro", "litros"),
+    "lata": ("lata", "latas"),
+    "caixa": ("caixa", "caixas", "caixinha", "caixinhas"),
+    "pacote": ("pacote", "pacotes"),
+    "vidro": ("vidro", "vidros"),
+    "pote": ("pote", "potes"),
+    "envelope": ("envelope", "envelopes", "sachê", "sachês"),
+    "barra": ("barra", "barras"),
+    "pitada": ("pitada", "pitadas"),
+    "fio": ("fio", "fios"),
+    "dente": ("dente", "dentes"),
+    "fatia": ("fatia", "fatias"),
+    "maço": ("maço", "maços", "maco", "macos"),
+    "folha": ("folha", "folhas"),
+    "pedaço": ("pedaço", "pedaços", "pedaco", "pedacos"),
+    "filé": ("filé", "filés", "file", "files"),
+    "gomo": ("gomo", "gomos"),
+    "espiga": ("espiga", "espigas"),
+    "ramo": ("ramo", "ramos"),
+    "unidade": ("unidade", "unidades", "un", "und", "unid"),
+}
+_UNIT_BY_ALIAS = {alias: canonical for canonical, aliases in UNIT_ALIASES.items() for alias in aliases}
+
+# Canonical units that can be summed with others of the same kind --> (base unit, how much of the base one is), for the
+# shopping list: "1 xícara" and "100 ml" of milk become 340 ml. Kitchen measures use the usual Brazilian equivalences.
+# "unidade" is the same as no unit at all ("3 ovos"). Units missing here only sum with themselves.
+UNIT_CONVERSIONS = {
+    "mg": ("g", 0.001),
+    "g": ("g", 1.0),
+    "kg": ("g", 1000.0),
+    "ml": ("ml", 1.0),
+    "l": ("ml", 1000.0),
+    "xícara": ("ml", 240.0),
+    "copo": ("ml", 250.0),
+    "colher de sopa": ("ml", 15.0),
+    "colher de sobremesa": ("ml", 10.0),
+    "colher de chá": ("ml", 5.0),
+    "unidade": (None, 1.0),
+}
+# Base unit --> (bigger unit, how much of the base it is), used once a converted total gets there (1500 g --> 1,5 kg)
+LARGER_UNITS = {"g": ("kg", 1000.0), "ml": ("l", 1000.0)}
+
+# Quantities written with words or unicode fraction characters
+WORD_QUANTITIES = {"meia": 0.5, "meio": 0.5, "um": 1.0, "uma": 1.0, "dois": 2.0, "duas": 2.0, "três": 3.0, "tres": 3.0,
+                   "quatro": 4.0, "cinco": 5.0, "seis": 6.0, "dez": 10.0, "dúzia": 12.0, "duzia": 12.0}
+UNICODE_FRACTIONS = {"½": 0.5, "⅓": 1 / 3, "⅔": 2 / 3, "¼": 0.25, "¾": 0.75, "⅛": 0.125}
+TO_TASTE = ("a gosto", "q.b.", "qb")
+
+# In Portuguese "." separates thousands and "," decimals: "1.000 g" is a thousand grams and "1.000,5" is 1000.5.
+# A dot followed by groups of exactly three digits (and a first digit that is not 0) is read that way,
+# any other dot is a decimal point, as people also write "1.5 xícara"
+_THOUSANDS_NUMBER = r"[1-9]\d{0,2}(?:\.\d{3})+(?:,\d+)?(?!\d)"
+_NUMBER = rf"(?:{_THOUSANDS_NUMBER}|\d+(?:[.,]\d+)?)"
+_FRACTION = r"\d+\s*/\s*\d+"
+_UNICODE_FRACTION = "[" + "".join(UNICODE_FRACTIONS) + "]"
+_SINGLE_QUANTITY = (rf"(?:\d+\s+{_FRACTION}|\d+\s*{_UNICODE_FRACTION}|{_FRACTION}|{_NUMBER}|{_UNICODE_FRACTION}|"
+                    rf"(?:{'|'.join(sorted(WORD_QUANTITIES, key=len, reverse=True))})\b)")
+# A range like "2 a 3" or "2-3" is one quantity
+_QUANTITY = rf"{_SINGLE_QUANTITY}(?:\s*(?:-|–|a|até|ou)\s*{_SINGLE_QUANTITY})?"
+_UNIT = "|".join(re.escape(alias) for alias in sorted(_UNIT_BY_ALIAS, key=len, reverse=True))
+
+_LINE_RE = re.compile(
+    rf"^(?P<quantity>{_QUANTITY}|{'|'.join(map(re.escape, TO_TASTE))})?\s*"
+    rf"(?:(?P<unit>{_UNIT})(?!\w)\s*)?" # (?!\w) so "g" is not the start of "gengibre"
+    r"(?:(?:de|da|do|das|dos)\s+)?"
+    r"(?P<name>.*?)"
+    rf"(?:\s*,?\s+(?P<to_taste>{'|'.join(map(re.escape, TO_TASTE))}))?\s*$",
+    re.IGNORECASE,
+)
+_QUANTITY_RE = re.compile(rf"^\s*(?P<first>{_SINGLE_QUANTITY})(?:\s*(?:-|–|a|até|ou)\s*(?P<last>{_SINGLE_QUANTITY}))?\s*$",
+                          re.IGNORECASE)
+_THOUSANDS_RE = re.compile(rf"^{_THOUSANDS_NUMBER}$")
+_MIXED_RE = re.compile(rf"^(\d+)\s*(?:(\d+)\s*/\s*(\d+)|({_UNICODE_FRACTION}))$")
+
+
+def _single_value(text):
+    text = text.strip().lower()
+    if text in WORD_QUANTITIES:
+        return WORD_QUANTITIES[text]
+    if text in UNICODE_FRACTIONS:
+        return UNICODE_FRACTIONS[text]
+    mixed = _MIXED_RE.match(text)
+    if mixed:
+        whole, numerator, denominator, symbol = mixed.groups()
+        fraction = UNICODE_FRACTIONS[symbol] if symbol else int(numerator) / int(denominator) if int(denominator) else 0.0
+        return int(whole) + fraction
+    if "/" in text:
+        numerator, denominator = text.split("/", 1)
+        return int(numerator) / int(denominator) if int(denominator) else None
+    if _THOUSANDS_RE.match(text):
+        text = text.replace(".", "")
+    return float(text.replace(",", "."))
+
+
+@functools.lru_cache(maxsize=4096)
+def quantity_value(text):
+    """
+    The number in a quantity text ("1/2" --> 0.5, "1,5" --> 1.5, "1 1/2" --> 1.5, "meia" --> 0.5, "1.000" --> 1000),
+    or None when there is none ("a gosto", ""). For a range ("2 a 3") it is the biggest value, which is what you should buy.
+    """
+    if not text:
+        return None
+    match = _QUANTITY_RE.match(text)
+    if not match:
+        return None
+    return _single_value(match.group('last') or match.group('first'))
+
+
+@functools.lru_cache(maxsize=1024)
+def canonical_unit(text):
+    """
+    The canonical form of a unit ("colheres de sopa" --> "colher de sopa", "gramas" --> "g").
+    Units we don't know are just lowercased, so they still group together. Empty units give None.
+    """
+    unit = " ".join((text or "").lower().split())
+    if not unit:
+        return None
+    return _UNIT_BY_ALIAS.get(unit, unit)
+
+
+def base_unit(unit):
+    """(base unit, factor) of a canonical unit: quantity * factor is the quantity in the base unit (see UNIT_CONVERSIONS)."""
+    return UNIT_CONVERSIONS.get(unit, (unit, 1.0))
+
+
+def readable_quantity(value, unit):
+    """(value, unit) of a quantity in a base unit, moved to the bigger unit when it is big enough (1500 g --> 1.5 kg)."""
+    if unit in LARGER_UNITS and value >= LARGER_UNITS[unit][1]:
+        larger_unit, factor = LARGER_UNITS[unit]
+        return value / factor, larger_unit
+    return value, unit
+
+
+def format_quantity(value):
+    """A number as the user writes it: at most 2 decimals and a decimal comma (1.5 --> "1,5", 2.0 --> "2")."""
+    return f"{value:.2f}".rstrip("0").rstrip(".").replace(".", ",")
+
+
+def parse_ingredient_line(line):
+    """
+    Parses one ingredient line into the dict used by the database: 'name', 'quantity' and 'unit' as typed,
+    plus 'quantity_value' (float or None) and 'unit_canonical' (str or None).
+    Lines without a recognizable quantity or unit are just the ingredient name ("farinha de trigo").
+    """
+    line = " ".join(line.split())
+    match = _LINE_RE.match(line)
+    quantity = (match.group('quantity') or match.group('to_taste') or "").strip()
+    unit = (match.group('unit') or "").strip()
+    name = match.group('name').strip()
+
+    if quantity and not unit and " de " in name and " " not in name.split(" de ", 1)[0]:
+        # "2 pedacinhos de gengibre": a unit we don't know, written the way the form asks for
+        unit, name = name.split(" de ", 1)
+    if not name: # "2 xícaras" or just a unit: better keep the text as the name than lose the ingredient
+        name, quantity, unit = line, "", ""
+
+    return {
+        'name': name,
+        'quantity': quantity,
+        'unit': unit,
+        'quantity_value': quantity_value(quantity),
+        'unit_canonical': canonical_unit(unit),
+    }
+
+
+def parse_ingredient_lines(lines):
+    """Yields the parsed ingredients of an iterable of lines (a file, a bulk import stream...), skipping blank lines."""
+    for line in lines:
+        if line.strip():
+            yield parse_ingredient_line(line)
+
+
+def parse_ingredient_block(text, separators="\n"):
+    """Parses a whole pasted block of ingredients, one per line (or per any of the separators)."""
+    for separator in separators:
+        if separator != "\n":
+            text = text.replace(separator, "\n")
+    return list(parse_ingredient_lines(text.split("\n")))
+
+
+@functools.lru_cache(maxsize=65536)
+def ingredient_key(name):
+    """
+    The accent and case folded form of an ingredient name, stored in ingredients.name_key so the same ingredient
+    is found however it was typed: "Açúcar", "acucar" and "açucar" all give "acucar".
+    """
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    return " ".join("".join(char for char in decomposed if not unicodedata.combining(char)).split())
+
+
+def _padded_trigrams(key):
+    padded = f"  {key} " # Padding makes the start of the word count more, like PostgreSQL's pg_trgm
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigram_similarity(key, other_key):
+    """How alike two ingredient keys are, from 0 to 1: the share of their trigrams in common ("acuar" x "acucar" --> 0.44)."""
+    trigrams = _padded_trigrams(key)
+    other_trigrams = _padded_trigrams(other_key)
+    return len(trigrams & other_trigrams) / len(trigrams | other_trigrams)
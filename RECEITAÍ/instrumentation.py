@@ -0,0 +1,205 @@
+import bisect
+import collections
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Logging, timing and the slow query log of the app.
+# Everything logs to the "receitai" logger, which shows nothing below WARNING until configure_logging turns it on
+# (main.py does it with the RECEITAI_LOG environment variable, e.g. RECEITAI_LOG=DEBUG python main.py).
+
+logger = logging.getLogger("receitai")
+logger.addHandler(logging.NullHandler())
+
+# Upper bounds of the latency histogram buckets in milliseconds, roughly 1-2.5-5 steps. Anything slower goes to the last one
+HISTOGRAM_BOUNDS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+SLOW_QUERY_LOG_SIZE = 50 # Slow calls kept for the diagnostics panel, the oldest ones are dropped
+STATEMENTS_PER_CALL = 20 # SQL statements remembered per call for the slow query log (an import runs thousands)
+
+
+def configure_logging(level=None):
+    """
+    Turns the "receitai" logger on at level (a logging level or its name, like "DEBUG"), printing to stderr.
+    With None or "" the logger stays quiet, only warnings and errors show up.
+    """
+    if not level:
+        return
+    if not any(isinstance(handler, logging.StreamHandler) for handler in logger.handlers):
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+
+
+class LatencyHistogram:
+    """
+    Call count and latency histogram of one operation. The percentiles come from the buckets, so they are
+    the upper bound of the bucket the percentile falls in: precise enough to see a regression, and recording
+    a call is a bisect and a few additions.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms):
+        self.counts[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, elapsed_ms)] += 1
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def percentile(self, fraction):
+        """Upper bound (ms) of the bucket where the given fraction of the calls is reached."""
+        wanted = fraction * self.calls
+        seen = 0
+        for bound, count in zip(HISTOGRAM_BOUNDS_MS, self.counts):
+            seen += count
+            if count and seen >= wanted:
+                return bound
+        return self.max_ms
+
+    def summary(self):
+        return {
+            'calls': self.calls,
+            'mean_ms': self.total_ms / self.calls if self.calls else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'max_ms': self.max_ms,
+            'histogram': dict(zip([f"<={bound}" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}"], self.counts)),
+        }
+
+
+class Metrics:
+    """
+    Latency histograms by operation name, and the slow query log: the calls slower than slow_ms, with the
+    SQL statements they ran and their query plans. Thread safe, the worker records and the GUI reads.
+    """
+
+    def __init__(self, slow_ms=200.0):
+        self.slow_ms = slow_ms
+        self.slow_calls = collections.deque(maxlen=SLOW_QUERY_LOG_SIZE)
+        self._histograms = collections.defaultdict(LatencyHistogram)
+        self._lock = threading.Lock()
+
+    def record(self, name, elapsed_ms):
+        with self._lock:
+            self._histograms[name].record(elapsed_ms)
+
+    def record_slow_call(self, name, elapsed_ms, statements):
+        """statements is a list of {'sql', 'plan'} dicts."""
+        entry = {'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 'operation': name, 'ms': elapsed_ms, 'statements': statements}
+        with self._lock:
+            self.slow_calls.append(entry)
+        logger.warning("Operação lenta: %s levou %.0f ms", name, elapsed_ms)
+        for statement in statements:
+            logger.info("  %s", statement['sql'])
+            for line in statement['plan']:
+                logger.info("    plano: %s", line)
+
+    def snapshot(self):
+        """{operation: summary} of every operation called so far, and the slow calls, newest first."""
+        with self._lock:
+            return {
+                'operations': {name: histogram.summary() for name, histogram in sorted(self._histograms.items())},
+                'slow_calls': list(reversed(self.slow_calls)),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self.slow_calls.clear()
+
+
+class StatementTrace:
+    """
+    Remembers the SQL statements run by the current thread while a timed call is running, for the slow query log.
+    It is a connection trace callback (sqlite3 gives the statement with its parameters filled in), but SQLite builds
+    that text for every statement and every executemany row, so it is only installed on a connection while a thread
+    that is collecting holds it (see tracing), and taken off for the batches (see paused).
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self.observer = None # Also gets every traced statement, and keeps the tracing on outside timed calls (see benchmark.py)
+
+    def __call__(self, statement):
+        statements = getattr(self._local, "statements", None)
+        if statements is not None and len(statements) < STATEMENTS_PER_CALL:
+            statements.append(statement)
+        if self.observer is not None:
+            self.observer(statement)
+
+    def _traced(self):
+        """The connections this thread has installed the callback on."""
+        if not hasattr(self._local, "connections"):
+            self._local.connections = set()
+        return self._local.connections
+
+    @contextmanager
+    def tracing(self, conn):
+        """
+        Installs the callback on conn for the block if this thread is collecting. No other thread may use conn
+        meanwhile (the writer is held with the write lock, a pooled reader is taken from the pool):
+        set_trace_callback waits for a statement running on the connection while holding the GIL.
+        """
+        traced = self._traced()
+        if conn in traced or (getattr(self._local, "statements", None) is None and self.observer is None):
+            yield
+            return
+        conn.set_trace_callback(self)
+        traced.add(conn)
+        try:
+            yield
+        finally:
+            traced.discard(conn)
+            conn.set_trace_callback(None)
+
+    @contextmanager
+    def paused(self, conn):
+        """Takes the callback off conn for the block, for executemany batches (one trace per row would cost more than the insert)."""
+        if conn not in self._traced():
+            yield
+            return
+        conn.set_trace_callback(None)
+        try:
+            yield
+        finally:
+            conn.set_trace_callback(self)
+
+    def start(self):
+        """Starts collecting. Returns False if a call of this thread is already collecting (a nested call)."""
+        if getattr(self._local, "statements", None) is not None:
+            return False
+        self._local.statements = []
+        return True
+
+    def stop(self):
+        statements, self._local.statements = self._local.statements, None
+        return statements
+
+
+def timed(method):
+    """
+    Records the duration of each call in self.metrics, under the method name. The outermost timed call slower than
+    metrics.slow_ms goes to the slow query log with its statements and their plans (see self._explain_statements).
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        outermost = self.statement_trace.start()
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            statements = self.statement_trace.stop() if outermost else None
+            self.metrics.record(name, elapsed_ms)
+            if outermost and elapsed_ms >= self.metrics.slow_ms:
+                self.metrics.record_slow_call(name, elapsed_ms, self._explain_statements(statements))
+    return wrapper
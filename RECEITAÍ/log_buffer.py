@@ -0,0 +1,56 @@
+import time
+
+# Actions that are written right away. Deleting a recipe can't be undone, so its audit entry must never be lost;
+# the bulk import is rare and its summary is the only record of what was imported.
+DURABLE_ACTIONS = frozenset({"Receita Excluída", "Importação em Massa"})
+
+
+class LogBuffer:
+    """
+    Keeps user log events in memory so they can be written together in one transaction,
+    instead of one INSERT + commit (one fsync) per event.
+
+    Durability policy: actions in durable_actions are flushed immediately. Every other event
+    is written when the buffer has max_events events, when the oldest one is older than
+    max_delay seconds (checked on each new event and by flush_if_due), or when the app closes.
+    Whoever owns the repository must call flush_if_due (through RecipeRepository.flush_logs_if_due) every second
+    or so: the GUI's DatabaseWorker does it when idle and after each request, the API server has a timer for it.
+    So in a crash at most max_delay seconds (plus that second) of searches and detail views are lost.
+    Not thread safe by itself, RecipeRepository only uses it holding its write lock.
+    """
+
+    def __init__(self, write_rows, max_events=100, max_delay=5.0, durable_actions=DURABLE_ACTIONS):
+        self.write_rows = write_rows # Callback that writes a list of (timestamp, action_type, description) rows
+        self.max_events = max_events
+        self.max_delay = max_delay
+        self.durable_actions = durable_actions
+        self._events = []
+        self._oldest = None # time.monotonic() of the oldest event in the buffer
+
+    def add(self, timestamp, action_type, description):
+        """Buffers one event, flushing if the policy says so."""
+        if not self._events:
+            self._oldest = time.monotonic()
+        self._events.append((timestamp, action_type, description))
+        if action_type in self.durable_actions or len(self._events) >= self.max_events:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        """Flushes if the oldest buffered event has waited more than max_delay seconds. Returns how many were written."""
+        if self._events and time.monotonic() - self._oldest >= self.max_delay:
+            return self.flush()
+        return 0
+
+    def flush(self):
+        """Writes every buffered event. Returns how many were written."""
+        if not self._events:
+            return 0
+        events, self._events = self._events, []
+        self._oldest = None
+        self.write_rows(events)
+        return len(events)
+
+    def __len__(self):
+        return len(self._events)
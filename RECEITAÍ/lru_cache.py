@@ -0,0 +1,73 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Small bounded cache that throws away the least recently used entry when it is full.
+    It is thread safe, so it can be shared by code running in different threads.
+    generation goes up on every invalidate/clear: a reader that loaded a value while another thread
+    was changing it can pass the generation it saw to put, and the stale value is not stored.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Returns the cached value (marking it as recently used) or default if it is not cached."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, generation=None):
+        """Stores a value, removing the oldest entry if the cache is full (skipped if generation is outdated)."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        """Removes one entry, if it is cached."""
+        with self._lock:
+            self._data.pop(key, None)
+            self.generation += 1
+
+    def clear(self):
+        """Removes every entry."""
+        with self._lock:
+            self._data.clear()
+            self.generation += 1
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self):
+        """Hit/miss counters, useful to check if the cache is worth it."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
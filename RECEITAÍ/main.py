@@ -1,8 +1,19 @@
+import time
+started_at = time.perf_counter() # Before the imports, the startup report counts them too
+
+import os
 import tkinter as tk
+from instrumentation import configure_logging
 from receitai_app import ReceitAIApp
 
 if __name__ == "__main__":
+    configure_logging(os.environ.get("RECEITAI_LOG")) # RECEITAI_LOG=DEBUG shows the debug messages, quiet by default
+    # RECEITAI_LOG_RETENTION_DAYS=30 keeps 30 days of logs in the logs tab (older ones go to the daily summary), 0 never archives
+    retention = os.environ.get("RECEITAI_LOG_RETENTION_DAYS", "").strip()
     root = tk.Tk()
-    app = ReceitAIApp(root)
+    if retention.isdigit():
+        app = ReceitAIApp(root, started_at=started_at, log_retention_days=int(retention))
+    else:
+        app = ReceitAIApp(root, started_at=started_at)
     root.protocol("WM_DELETE_WINDOW", app.on_closing) # Ensures that the connection with the DataBase is closed
     root.mainloop()
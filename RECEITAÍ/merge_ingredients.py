@@ -0,0 +1,53 @@
+import argparse
+import sys
+
+from recipe_repository import RecipeRepository, RepositoryError
+
+# Finds ingredients registered more than once with different accents or case ("açúcar" and "acucar")
+# and joins each group into its oldest ingredient. Without --apply it only lists them.
+# Example: python merge_ingredients.py --db receitas.db --apply
+# With --similar it shows the ingredients whose names look like the given one, typos included.
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Junta ingredientes duplicados (mesmo nome com outros acentos ou maiúsculas).")
+    parser.add_argument("--db", default="receitas.db", help="Banco de dados SQLite (padrão: receitas.db)")
+    parser.add_argument("--apply", action="store_true", help="Junta os duplicados (sem isso só mostra a lista)")
+    parser.add_argument("--similar", metavar="NOME", help="Mostra os ingredientes com nome parecido com NOME")
+    args = parser.parse_args(argv)
+
+    try:
+        db_manager = RecipeRepository(args.db)
+    except RepositoryError as e:
+        print(f"Erro no banco de dados: {e}", file=sys.stderr)
+        return 1
+
+    try:
+        if args.similar:
+            for ingredient in db_manager.find_similar_ingredients(args.similar):
+                print(f"{ingredient['ingredient_id']:>8}  {ingredient['similarity']:>4.0%}  {ingredient['name']}")
+            return 0
+
+        groups = db_manager.find_duplicate_ingredients()
+        for group in groups:
+            (keep_id, keep_name), *merged = group
+            names = ", ".join(name for _, name in merged)
+            if args.apply:
+                recipes = db_manager.merge_ingredients(keep_id, [ingredient_id for ingredient_id, _ in merged])
+                print(f"{keep_name} <- {names} ({recipes} receitas)")
+            else:
+                print(f"{keep_name} <- {names}")
+        if not groups:
+            print("Nenhum ingrediente duplicado.")
+        elif not args.apply:
+            print(f"{len(groups)} grupos de duplicados. Rode com --apply para juntá-los.", file=sys.stderr)
+    except RepositoryError as e:
+        print(f"Erro no banco de dados: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db_manager.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+import threading
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+# An ingredient used by more than this fraction of the recipe_id range gets a bitset (highest recipe_id / 8 bytes),
+# the rarer ones a sorted array of 8 byte recipe_ids, which is smaller below 1 in 64
+BITSET_MIN_DENSITY = 1 / 64
+
+
+def _bits_from_ids(ids):
+    """Bitset (a Python int) with the bits of the given non-negative ids set."""
+    if not ids:
+        return 0
+    buffer = bytearray(max(ids) // 8 + 1)
+    for recipe_id in ids:
+        buffer[recipe_id >> 3] |= 1 << (recipe_id & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def _ids_from_bits(bits):
+    """Sorted array of the positions of the set bits (the inverse of _bits_from_ids)."""
+    return array("q", _bit_positions(bits))
+
+
+def _bit_positions(bits, skip=0, limit=None):
+    """Yields the positions of the set bits, lowest first, skipping the first skip of them."""
+    # bin() and str.find run in C, much faster than shifting a big int bit by bit
+    text = bin(bits)[:1:-1]
+    position = text.find("1")
+    found = 0
+    while position != -1:
+        if found >= skip:
+            yield position
+            if limit is not None and found + 1 - skip >= limit:
+                return
+        found += 1
+        position = text.find("1", position + 1)
+
+
+class PantryIndex:
+    """
+    In-memory recipe x ingredient incidence index for the "what can I cook" search.
+
+    Every common ingredient has a bitset (a Python int where bit n is recipe_id n) of the recipes that use it,
+    the rare ones (see BITSET_MIN_DENSITY) a sorted array of recipe_ids that is turned into a bitset when a search
+    needs it. The recipes are also grouped in bitsets by how many ingredients they have.
+    For a pantry, the number of pantry ingredients of every recipe is counted all at once with bit-sliced addition:
+    the count is kept in binary in a few bitsets ("planes", plane i is bit i of every recipe's count) and each pantry
+    ingredient is added with a ripple carry, like a hardware adder. So a search costs a few big int operations per
+    pantry ingredient, and never loops over the recipes in Python.
+
+    Memory is about (highest recipe_id / 8) bytes per common ingredient, 12 KB each for 100k recipes,
+    and 8 bytes per recipe of a rare one, so the long tail of ingredients used by a handful of recipes costs little.
+    The index is kept up to date by RecipeRepository (add, remove, update) and is safe to use from several threads.
+    """
+
+    def __init__(self):
+        self._postings = {} # ingredient_id --> bitset or sorted array of the recipes that use it
+        self._by_size = {} # ingredient count --> bitset of the recipes with that many ingredients
+        self._max_recipe_id = 0 # The size of the bitsets, for BITSET_MIN_DENSITY
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, rows):
+        """Builds the index from (recipe_id, ingredient_id) rows, like the ones in recipe_ingredients."""
+        recipes_by_ingredient = defaultdict(list)
+        sizes = defaultdict(int)
+        for recipe_id, ingredient_id in rows:
+            recipes_by_ingredient[ingredient_id].append(recipe_id)
+            sizes[recipe_id] += 1
+        recipes_by_size = defaultdict(list)
+        for recipe_id, size in sizes.items():
+            recipes_by_size[size].append(recipe_id)
+
+        index = cls()
+        index._max_recipe_id = max(sizes, default=0)
+        index._postings = {ingredient_id: index._posting(ids) for ingredient_id, ids in recipes_by_ingredient.items()}
+        index._by_size = {size: _bits_from_ids(ids) for size, ids in recipes_by_size.items()}
+        return index
+
+    def _dense_enough(self, recipe_count):
+        """If an ingredient used by recipe_count recipes is smaller as a bitset than as an array of ids."""
+        return recipe_count > self._max_recipe_id * BITSET_MIN_DENSITY
+
+    def _posting(self, ids):
+        """The posting of an ingredient used by these (distinct) recipes: bitset if it is common, sorted array if not."""
+        if self._dense_enough(len(ids)):
+            return _bits_from_ids(ids)
+        return array("q", sorted(ids))
+
+    def add(self, recipe_id, ingredient_ids):
+        """Adds a new recipe with these ingredients."""
+        ingredient_ids = set(ingredient_ids)
+        if not ingredient_ids:
+            return
+        bit = 1 << recipe_id
+        with self._lock:
+            self._max_recipe_id = max(self._max_recipe_id, recipe_id)
+            for ingredient_id in ingredient_ids:
+                posting = self._postings.get(ingredient_id)
+                if isinstance(posting, int):
+                    self._postings[ingredient_id] = posting | bit
+                    continue
+                # The arrays are replaced, never changed in place: _groups reads them after releasing the lock
+                ids = array("q") if posting is None else posting
+                position = bisect_left(ids, recipe_id)
+                if position < len(ids) and ids[position] == recipe_id:
+                    continue
+                if self._dense_enough(len(ids) + 1):
+                    self._postings[ingredient_id] = _bits_from_ids(ids) | bit
+                else:
+                    self._postings[ingredient_id] = ids[:position] + array("q", (recipe_id,)) + ids[position:]
+            size = len(ingredient_ids)
+            self._by_size[size] = self._by_size.get(size, 0) | bit
+
+    def remove(self, recipe_id, ingredient_ids):
+        """Removes a recipe, given the ingredients it had."""
+        ingredient_ids = set(ingredient_ids)
+        if not ingredient_ids:
+            return
+        mask = ~(1 << recipe_id)
+        with self._lock:
+            for ingredient_id in ingredient_ids:
+                posting = self._postings.get(ingredient_id)
+                if isinstance(posting, int):
+                    posting &= mask
+                    # Back to an array only well below the threshold, so a recipe added and removed doesn't flip it every time
+                    if posting and not self._dense_enough(posting.bit_count() * 2):
+                        posting = _ids_from_bits(posting)
+                elif posting is not None:
+                    position = bisect_left(posting, recipe_id)
+                    if position < len(posting) and posting[position] == recipe_id:
+                        posting = posting[:position] + posting[position + 1:]
+                if posting:
+                    self._postings[ingredient_id] = posting
+                else:
+                    self._postings.pop(ingredient_id, None)
+            size = len(ingredient_ids)
+            bits = self._by_size.get(size, 0) & mask
+            if bits:
+                self._by_size[size] = bits
+            else:
+                self._by_size.pop(size, None)
+
+    def update(self, recipe_id, old_ingredient_ids, new_ingredient_ids):
+        """Changes the ingredients of a recipe."""
+        self.remove(recipe_id, old_ingredient_ids)
+        self.add(recipe_id, new_ingredient_ids)
+
+    def _groups(self, pantry_ids, max_missing=None):
+        """
+        Yields (missing, size, bitset) groups of the recipes that use at least one pantry ingredient, in ranking order:
+        fewest missing ingredients first, then best coverage (for the same missing count, the recipes with more
+        ingredients cover a bigger part of them with the pantry), then recipe_id.
+        """
+        with self._lock: # The postings are never changed in place, so after this we can work without the lock
+            postings = [self._postings[ingredient_id] for ingredient_id in set(pantry_ids) if ingredient_id in self._postings]
+            by_size = dict(self._by_size)
+        if not postings:
+            return
+        postings = [bits if isinstance(bits, int) else _bits_from_ids(bits) for bits in postings]
+
+        planes = [] # planes[i] has bit i of each recipe's count of pantry ingredients
+        any_match = 0
+        for bits in postings:
+            any_match |= bits
+            carry = bits
+            for i in range(len(planes)):
+                planes[i], carry = planes[i] ^ carry, planes[i] & carry
+                if not carry:
+                    break
+            if carry:
+                planes.append(carry)
+
+        matches_by_count = {} # number of pantry ingredients --> recipes with exactly that many
+        for count in range(1, min(len(postings), (1 << len(planes)) - 1) + 1): # Only counts the planes can hold
+            bits = any_match
+            for i, plane in enumerate(planes):
+                bits &= plane if count >> i & 1 else ~plane
+            if bits:
+                matches_by_count[count] = bits
+
+        sizes = sorted(by_size, reverse=True)
+        for missing in range(0, (max(sizes) if max_missing is None else max_missing) + 1):
+            for size in sizes:
+                bits = matches_by_count.get(size - missing)
+                if bits:
+                    group = bits & by_size[size]
+                    if group:
+                        yield missing, size, group
+
+    def count(self, pantry_ids, max_missing=None):
+        """How many recipes use at least one pantry ingredient (and miss at most max_missing)."""
+        return sum(group.bit_count() for _, _, group in self._groups(pantry_ids, max_missing))
+
+    def rank(self, pantry_ids, limit=None, offset=0, max_missing=None):
+        """
+        Returns (recipe_id, matched, missing) for one page of the recipes that use at least one pantry ingredient,
+        best first (see _groups).
+        """
+        results = []
+        for missing, size, group in self._groups(pantry_ids, max_missing):
+            group_size = group.bit_count()
+            if offset >= group_size:
+                offset -= group_size # Whole groups are skipped without looking at their bits
+                continue
+            wanted = None if limit is None else limit - len(results)
+            for recipe_id in _bit_positions(group, skip=offset, limit=wanted):
+                results.append((recipe_id, size - missing, missing))
+            offset = 0
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+    def stats(self):
+        """Size of the index, for the diagnostics."""
+        with self._lock:
+            return {
+                'ingredients': len(self._postings),
+                'recipes': sum(bits.bit_count() for bits in self._by_size.values()),
+                'bitsets': sum(isinstance(posting, int) for posting in self._postings.values()),
+                'bytes': sum((posting.bit_length() + 7) // 8 if isinstance(posting, int) else posting.itemsize * len(posting)
+                             for posting in self._postings.values()),
+            }
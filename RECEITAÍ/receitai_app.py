@@ -1,17 +1,53 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import json
+import time
 import uuid
-
-from database_manager import DatabaseManager
+from datetime import datetime
+
+from recipe_repository import LOG_RETENTION_DAYS, RecipeRepository, format_ingredient
+from db_worker import DatabaseWorker
+from autocomplete import NAVIGATION_KEYS, AutocompleteDropdown
+from instrumentation import logger
+from ingredient_parser import format_quantity, parse_ingredient_block
+
+RESULTS_PAGE_SIZE = 200 # Recipes fetched per page in the search tab
+RESULTS_CHUNK_SIZE = 50 # Rows inserted in the Treeview per after() call, so the window never freezes
+SIMILAR_RECIPES_LIMIT = 8 # Similar recipes listed in the details window
+SEARCH_DEBOUNCE_MS = 300 # The search runs by itself once the user stops typing in the filters for this long
+AUTOCOMPLETE_LIMIT = 8 # Suggestions shown under the ingredients and category fields
+LOGS_PAGE_SIZE = 200 # Logs loaded each time the user scrolls to the end of the list
+LOG_ACTION_TYPES = ["", "Receita Cadastrada", "Receita Atualizada", "Receita Excluída", "Busca de Receita",
+                    "Ver Detalhes da Receita", "Importação em Massa", "Ingredientes Mesclados", "Lista de Compras"]
+# Search modes of the search tab --> (count method, page method) of the repository.
+# "O que posso cozinhar?" uses the ingredients field as the pantry and ignores the other filters
+SEARCH_MODES = {
+    "Filtros": ("count_recipes", "filter_recipes"),
+    "O que posso cozinhar?": ("count_recipes_by_pantry", "find_recipes_by_pantry"),
+}
 
 class ReceitAIApp:
-    def __init__(self, root):
+    def __init__(self, root, started_at=None, log_retention_days=LOG_RETENTION_DAYS):
+        """
+        started_at is the time.perf_counter() of the program start, for the startup report (see _mark_startup).
+        log_retention_days is how many days of logs the logs tab keeps, older ones are archived (0 or None never archives).
+        """
+        self.startup_start = started_at if started_at is not None else time.perf_counter()
+        self.startup_phases = [] # (phase, seconds since startup_start)
+        self.startup_report = None # Text of the startup report, once the window is painted and the database is open
+        self._mark_startup("importações e janela Tk")
         self.root = root
         self.root.title("ReceitAÍ Caderno de Receitas Inteligente")
         self.root.geometry("1000x700")
 
-        self.db_manager = DatabaseManager()
+        # Every database call runs in the DatabaseWorker thread, so the window never freezes waiting for SQLite.
+        # Results come back to callbacks on this (Tk) thread
+        self.log_retention_days = log_retention_days or None
+        self.db_worker = DatabaseWorker(lambda: RecipeRepository(log_retention_days=self.log_retention_days), on_error=messagebox.showerror)
+        self.db_worker.attach(self.root)
+        # The worker opens the database before its first request, so this comes back once it is open
+        self.db_worker.submit(lambda db_manager: None, callback=lambda _: self._mark_startup("banco aberto"))
+        self._mark_startup("worker")
 
         self.style = ttk.Style() 
 
@@ -23,6 +59,7 @@ class ReceitAIApp:
         self._initialize_firebase()
         
         self._create_notebook()
+        self._mark_startup("abas")
 
         
         self.style.theme_use('clam') # 'clam' is a good default theme for ttk, less frontend stuff for me
@@ -35,6 +72,32 @@ class ReceitAIApp:
         self.style.configure('TLabel', foreground='black')
         self.style.configure('Treeview', foreground='black') 
         self.style.configure('Treeview.Heading', foreground='black') 
+        self._mark_startup("tema")
+
+        # The idle call after the window is mapped runs once Tk has drawn it
+        self.root.bind("<Map>", self._on_first_map, add="+")
+
+    def _on_first_map(self, event):
+        if event.widget is self.root and not any(phase == "primeira pintura" for phase, _ in self.startup_phases):
+            self.root.after_idle(self._mark_startup, "primeira pintura")
+
+    def _mark_startup(self, phase):
+        """
+        Records the time a startup phase ended. When the window was painted and the database is open, the report is
+        ready: how long each phase of the Tk thread took until the first paint, so a slow startup shows where the
+        time went, and when the database was ready (it opens in the worker thread, at the same time).
+        It is shown in the Diagnóstico tab and logged at INFO (in the console with RECEITAI_LOG=INFO).
+        """
+        if self.startup_report is not None:
+            return
+        self.startup_phases.append((phase, time.perf_counter() - self.startup_start))
+        phases = dict(self.startup_phases)
+        if "primeira pintura" in phases and "banco aberto" in phases:
+            tk_phases = [(name, end) for name, end in self.startup_phases if name != "banco aberto"]
+            steps = [f"{name} {(end - previous) * 1000:.0f}" for (name, end), previous in zip(tk_phases, [0.0] + [end for _, end in tk_phases])]
+            self.startup_report = (f"Inicialização: primeira pintura em {phases['primeira pintura'] * 1000:.0f} ms ({', '.join(steps)}), "
+                                   f"banco aberto em {phases['banco aberto'] * 1000:.0f} ms")
+            logger.info(self.startup_report)
 
 
     def _initialize_firebase(self): # This took so long i made the Ai make some DEBUG messages for me. I will leave them in portuguese
@@ -42,33 +105,50 @@ class ReceitAIApp:
         Firebase initialization simulation.
         In a real application, this would connect to Firebase and authenticate the user. (Part of the API would enter here)
         """
-        print("Inicializando Firebase (simulado)...")
+        logger.info("Inicializando Firebase (simulado)...")
         initial_auth_token = globals().get('__initial_auth_token', None)
 
         if initial_auth_token:
             self.user_id = str(uuid.uuid4())
-            print(f"Usuário autenticado (simulado via token): {self.user_id}")
+            logger.info("Usuário autenticado (simulado via token): %s", self.user_id)
         else:
             self.user_id = str(uuid.uuid4()) #simulates an anonymous user
-            print(f"Usuário anônimo (simulado): {self.user_id}")
+            logger.info("Usuário anônimo (simulado): %s", self.user_id)
         
-        print(f"App ID: {self.app_id}")
-        print(f"Firebase Config: {self.firebase_config}")
+        logger.info("App ID: %s", self.app_id)
+        logger.info("Firebase Config: %s", self.firebase_config)
 
     def _create_notebook(self):
-        """Creates the main notebook with tabs for recipe registration, search, and logs."""
+        """
+        Creates the main notebook with tabs for recipe registration, search, and logs.
+        The tabs start empty and each one is built (and loads its data) the first time it is shown,
+        so opening the app doesn't wait for the search results nor the logs.
+        """
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(padx=10, pady=10, fill="both", expand=True)
 
-        self._create_recipe_registration_tab()
-        self._create_recipe_search_tab()
-        self._create_logs_tab()
-
-    def _create_recipe_registration_tab(self):
+        self.tab_builders = [] # (frame, function that fills it), by tab index
+        for text, builder in (("Cadastrar Receita", self._create_recipe_registration_tab),
+                              ("Buscar Receitas", self._create_recipe_search_tab),
+                              ("Logs do Usuário", self._create_logs_tab),
+                              ("Diagnóstico", self._create_diagnostics_tab)):
+            frame = ttk.Frame(self.notebook, padding="10")
+            self.notebook.add(frame, text=text)
+            self.tab_builders.append((frame, builder))
+        self.built_tabs = set()
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+        self._on_tab_changed() # The first tab is shown right away
+
+    def _on_tab_changed(self, event=None):
+        """Builds the selected tab if it is the first time it is shown."""
+        index = self.notebook.index("current")
+        if index not in self.built_tabs:
+            self.built_tabs.add(index)
+            frame, builder = self.tab_builders[index]
+            builder(frame)
+
+    def _create_recipe_registration_tab(self, frame):
         """New recipe tab here."""
-        frame = ttk.Frame(self.notebook, padding="10")
-        self.notebook.add(frame, text="Cadastrar Receita")
-
         # Rows and columns configuration
         frame.columnconfigure(1, weight=1)
         for i in range(8):
@@ -125,7 +205,7 @@ class ReceitAIApp:
         instructions = self.instructions_text.get("1.0", tk.END).strip()
         ingredients_raw = self.ingredients_text.get("1.0", tk.END).strip()
 
-        print(f"DEBUG _save_recipe: Nome da receita capturado: '{name}'") # Debug messages written by Ai in some other parts too
+        logger.debug("_save_recipe: Nome da receita capturado: '%s'", name) # Debug messages written by Ai in some other parts too
 
         if not name or not instructions or not ingredients_raw:
             messagebox.showwarning("Campos Faltando", "Nome da receita, ingredientes e modo de preparo são obrigatórios.")
@@ -139,36 +219,17 @@ class ReceitAIApp:
                 messagebox.showwarning("Entrada Inválida", "Tempo de preparo deve ser um número inteiro.")
                 return
 
-        ingredients_list = []
-        for line in ingredients_raw.split('\n'):
-            line = line.strip()
-            if not line:
-                continue
-
-            # I hope the user will write the ingredients in the format "quantidade unidade de ingrediente" 1 colher de açúcar, 2 ovos, etc.
-            parts = line.split(' de ', 1)
-            if len(parts) == 2:
-                qty_unit = parts[0].strip()
-                ingredient_name = parts[1].strip() # Here is where the ingredient name is stored
-                
-                # This splits the quantity and unit, if they exist
-                # For example, "1 colher de sopa" will be split into "1 colher"
-                qty_parts = qty_unit.split(' ', 1)
-                quantity = qty_parts[0].strip() if qty_parts else ''
-                unit = qty_parts[1].strip() if len(qty_parts) > 1 else ''
-            else:
-                quantity = ''
-                unit = ''
-                ingredient_name = line # If the line doesn't contain "de", we assume it's just the ingredient name
-
-            ingredients_list.append({'name': ingredient_name, 'quantity': quantity, 'unit': unit}) # Here we create a dictionary for each ingredient with its name, quantity and unit
+        # "quantidade unidade de ingrediente", one per line: 1 colher de açúcar, 2 ovos, etc. (see ingredient_parser)
+        ingredients_list = parse_ingredient_block(ingredients_raw)
         
-        if self.db_manager.add_recipe(name, prep_time, difficulty, category, instructions, tags, ingredients_list):
-            messagebox.showinfo("Sucesso", "Receita cadastrada com sucesso!")
-            self._clear_recipe_form()
-            self._refresh_recipe_search_results() # Refresh the search results after adding a new recipe
-        else:
-            messagebox.showerror("Erro", "Erro ao cadastrar receita. Verifique o console para mais detalhes.")
+        self.db_worker.submit("add_recipe", name, prep_time, difficulty, category, instructions, tags, ingredients_list,
+                              callback=self._on_recipe_saved)
+
+    def _on_recipe_saved(self, recipe_id):
+        """Called when the worker saved the new recipe (errors go to the worker's on_error message box instead)."""
+        messagebox.showinfo("Sucesso", "Receita cadastrada com sucesso!")
+        self._clear_recipe_form()
+        self._refresh_recipe_search_results() # Refresh the search results after adding a new recipe
 
     def _clear_recipe_form(self):
         """After saving a recipe, this will clear the form fields."""
@@ -180,18 +241,17 @@ class ReceitAIApp:
         self.ingredients_text.delete("1.0", tk.END)
         self.instructions_text.delete("1.0", tk.END)
 
-    def _create_recipe_search_tab(self):
+    def _create_recipe_search_tab(self, frame):
         """Recipe search tab here."""
-        frame = ttk.Frame(self.notebook, padding="10")
-        self.notebook.add(frame, text="Buscar Receitas")
-
         frame.columnconfigure(1, weight=1)
-        frame.rowconfigure(4, weight=1) # This treeview took long, but works now
+        frame.rowconfigure(6, weight=1) # This treeview took long, but works now
 
         # Search Filters
         ttk.Label(frame, text="Ingredientes (separados por vírgula):").grid(row=0, column=0, sticky="w", pady=5)
         self.search_ingredients_entry = ttk.Entry(frame)
         self.search_ingredients_entry.grid(row=0, column=1, sticky="ew", pady=5)
+        AutocompleteDropdown(self.search_ingredients_entry, lambda prefix: self._complete("ingredients", prefix),
+                             on_pick=self._schedule_live_search, multiple=True, limit=AUTOCOMPLETE_LIMIT)
 
         ttk.Label(frame, text="Tempo Máximo (min):").grid(row=1, column=0, sticky="w", pady=5)
         self.search_prep_time_entry = ttk.Entry(frame)
@@ -200,92 +260,263 @@ class ReceitAIApp:
         ttk.Label(frame, text="Categoria:").grid(row=2, column=0, sticky="w", pady=5)
         self.search_category_entry = ttk.Entry(frame)
         self.search_category_entry.grid(row=2, column=1, sticky="ew", pady=5)
+        AutocompleteDropdown(self.search_category_entry, lambda prefix: self._complete("categories", prefix),
+                             on_pick=self._schedule_live_search, limit=AUTOCOMPLETE_LIMIT)
 
         ttk.Label(frame, text="Dificuldade:").grid(row=3, column=0, sticky="w", pady=5)
         self.search_difficulty_combobox = ttk.Combobox(frame, values=["", "Fácil", "Médio", "Difícil"])
         self.search_difficulty_combobox.grid(row=3, column=1, sticky="ew", pady=5)
         self.search_difficulty_combobox.set("") # Default value is empty, meaning no filter. Everything shows up
 
-        ttk.Button(frame, text="Buscar", command=self._perform_recipe_search).grid(row=4, column=0, columnspan=2, pady=10)
+        # Free text search over name, instructions and tags (full text index)
+        ttk.Label(frame, text="Texto (nome, preparo, tags):").grid(row=4, column=0, sticky="w", pady=5)
+        self.search_text_entry = ttk.Entry(frame)
+        self.search_text_entry.grid(row=4, column=1, sticky="ew", pady=5)
+
+        # Results refresh while the user types (see _schedule_live_search), Return searches right away
+        for entry in (self.search_ingredients_entry, self.search_prep_time_entry, self.search_category_entry, self.search_text_entry):
+            entry.bind("<KeyRelease>", self._schedule_live_search, add="+")
+            entry.bind("<Return>", lambda event: self._perform_recipe_search(), add="+")
+        self.search_difficulty_combobox.bind("<<ComboboxSelected>>", self._schedule_live_search)
+
+        search_buttons_frame = ttk.Frame(frame)
+        search_buttons_frame.grid(row=5, column=0, columnspan=2, pady=10)
+        ttk.Label(search_buttons_frame, text="Modo:").pack(side=tk.LEFT, padx=5)
+        self.search_mode_combobox = ttk.Combobox(search_buttons_frame, values=list(SEARCH_MODES), state="readonly", width=22)
+        self.search_mode_combobox.set("Filtros")
+        self.search_mode_combobox.pack(side=tk.LEFT, padx=5)
+        self.search_mode_combobox.bind("<<ComboboxSelected>>", self._schedule_live_search)
+        ttk.Button(search_buttons_frame, text="Buscar", command=self._perform_recipe_search).pack(side=tk.LEFT, padx=5)
 
         # Search Results Treeview
-        self.recipe_results_tree = ttk.Treeview(frame, columns=("Nome", "Tempo", "Dificuldade", "Categoria"), show="headings")
+        self.recipe_results_tree = ttk.Treeview(frame, columns=("Nome", "Tempo", "Dificuldade", "Categoria", "Faltam"), show="headings")
         self.recipe_results_tree.heading("Nome", text="Nome")
         self.recipe_results_tree.heading("Tempo", text="Tempo (min)")
         self.recipe_results_tree.heading("Dificuldade", text="Dificuldade")
         self.recipe_results_tree.heading("Categoria", text="Categoria")
+        self.recipe_results_tree.heading("Faltam", text="Faltam") # Only filled in the "O que posso cozinhar?" mode
         
         # Setting the column widths and alignment (Should work in most viewports)
         self.recipe_results_tree.column("Nome", width=250, anchor="w")
         self.recipe_results_tree.column("Tempo", width=80, anchor="center")
         self.recipe_results_tree.column("Dificuldade", width=100, anchor="center")
         self.recipe_results_tree.column("Categoria", width=150, anchor="w")
+        self.recipe_results_tree.column("Faltam", width=200, anchor="w")
 
 
-        self.recipe_results_tree.grid(row=5, column=0, columnspan=2, sticky="nsew", pady=10)
+        self.recipe_results_tree.grid(row=6, column=0, columnspan=2, sticky="nsew", pady=10)
         
         # Scrollbar for Treeview (Thanks to the Ai for this one, I was having trouble with it)
-        tree_scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.recipe_results_tree.yview)
-        tree_scrollbar.grid(row=5, column=2, sticky="ns")
-        self.recipe_results_tree.configure(yscrollcommand=tree_scrollbar.set)
+        self.recipe_scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.recipe_results_tree.yview)
+        self.recipe_scrollbar.grid(row=6, column=2, sticky="ns")
+        self.recipe_results_tree.configure(yscrollcommand=self._on_recipe_results_scroll)
 
         self.recipe_results_tree.bind("<Double-1>", self._show_recipe_details)
         
-        ttk.Button(frame, text="Ver Detalhes da Receita", command=self._show_recipe_details).grid(row=6, column=0, columnspan=2, pady=5)
+        # Several recipes can be selected (Ctrl/Shift + click) for the shopping list
+        recipe_buttons_frame = ttk.Frame(frame)
+        recipe_buttons_frame.grid(row=7, column=0, columnspan=2, pady=5)
+        ttk.Button(recipe_buttons_frame, text="Ver Detalhes da Receita", command=self._show_recipe_details).pack(side=tk.LEFT, padx=5)
+        ttk.Button(recipe_buttons_frame, text="Lista de Compras", command=self._show_shopping_list).pack(side=tk.LEFT, padx=5)
+
+        # Results are loaded one page at a time: scrolling to the end (or this button) loads the next one
+        results_frame = ttk.Frame(frame)
+        results_frame.grid(row=8, column=0, columnspan=2, pady=5)
+        self.results_count_label = ttk.Label(results_frame, text="")
+        self.results_count_label.pack(side=tk.LEFT, padx=5)
+        self.load_more_button = ttk.Button(results_frame, text="Carregar mais", command=self._load_more_recipe_results)
+        self.load_more_button.pack(side=tk.LEFT, padx=5)
+        self.search_status_label = ttk.Label(results_frame, text="") # Shows "Buscando..." while the worker is busy
+        self.search_status_label.pack(side=tk.LEFT, padx=5)
+
+        self.search_params = {}
+        self.search_methods = SEARCH_MODES["Filtros"]
+        self.search_total = 0
+        self.search_offset = 0 # How many results were already fetched
+        self.search_render_token = 0 # Changes on every new search, so the chunks of an old one stop being drawn
+        self.results_load_pending = False
+        self.results_rendering = False # True while the chunks of a page are still being inserted
+        self.live_search_job = None # after() id of the pending live search
+        self.autocomplete_indexes = None # Ingredient and category PrefixIndex, see _on_autocomplete_indexes
 
         self._refresh_recipe_search_results() # Show all recipes initially
+        self.db_worker.submit("autocomplete_indexes", callback=self._on_autocomplete_indexes)
+
+    def _on_autocomplete_indexes(self, indexes):
+        """The repository keeps these up to date on every write, so they are loaded only once."""
+        self.autocomplete_indexes = indexes
 
-    def _perform_recipe_search(self):
-        """Performs the recipe search based on the filters provided by the user."""
+    def _complete(self, name, prefix):
+        """Suggestions for the autocomplete, straight from memory (nothing until the indexes are loaded)."""
+        if self.autocomplete_indexes is None:
+            return []
+        return self.autocomplete_indexes[name].complete(prefix, AUTOCOMPLETE_LIMIT)
+
+    def _schedule_live_search(self, event=None):
+        """
+        Debounce: every key restarts the timer, so the search only runs after a pause in the typing and not once per key.
+        A search that is still running when the next one starts is dropped by the worker (key="search").
+        """
+        if event is not None and getattr(event, "keysym", None) in NAVIGATION_KEYS:
+            return
+        if self.live_search_job is not None:
+            self.root.after_cancel(self.live_search_job)
+        self.live_search_job = self.root.after(SEARCH_DEBOUNCE_MS, self._perform_recipe_search, True)
+
+    def _perform_recipe_search(self, live=False):
+        """
+        Performs the recipe search based on the filters provided by the user.
+        live is the search that runs while typing: it doesn't warn nor log, and does nothing if the filters didn't change.
+        """
+        if self.live_search_job is not None:
+            self.root.after_cancel(self.live_search_job)
+            self.live_search_job = None
         ingredients = self.search_ingredients_entry.get().strip()
         max_prep_time = self.search_prep_time_entry.get().strip()
         category = self.search_category_entry.get().strip()
         difficulty = self.search_difficulty_combobox.get().strip()
+        text = self.search_text_entry.get().strip()
+        mode = self.search_mode_combobox.get()
 
-        filtered_recipes = self.db_manager.filter_recipes(ingredients, max_prep_time, category, difficulty)
-        self._display_recipe_results(filtered_recipes)
-        
-        search_description = f"Ingredientes: {ingredients}, Tempo Máx: {max_prep_time}, Categoria: {category}, Dificuldade: {difficulty}"
-        self.db_manager.log_action("Busca de Receita", search_description)
+        if mode == "O que posso cozinhar?":
+            if not ingredients:
+                if not live:
+                    messagebox.showwarning("Despensa Vazia", "Digite no campo de ingredientes o que você tem em casa.")
+                return
+            params = {'pantry_input': ingredients}
+            search_description = f"Despensa: {ingredients}"
+        else:
+            params = {'ingredients_input': ingredients, 'max_prep_time': max_prep_time,
+                      'category': category, 'difficulty': difficulty, 'text': text}
+            search_description = f"Ingredientes: {ingredients}, Tempo Máx: {max_prep_time}, Categoria: {category}, Dificuldade: {difficulty}, Texto: {text}"
+        if live:
+            if params != self.search_params or SEARCH_MODES[mode] != self.search_methods:
+                self._start_recipe_search(params, mode)
+            return
+        self._start_recipe_search(params, mode)
+        self.db_worker.submit("log_action", "Busca de Receita", search_description)
 
 
     def _refresh_recipe_search_results(self):
         """Refreshes the recipe search results by fetching all recipes from the database."""
-        all_recipes = self.db_manager.get_all_recipes()
-        self._display_recipe_results(all_recipes)
-
-    def _display_recipe_results(self, recipes):
-        """Cleans the Treeview and displays the search results."""
-        for item in self.recipe_results_tree.get_children():
-            self.recipe_results_tree.delete(item)
-
-        for recipe in recipes:
-            # More debug messages to help me understand the flow
-            print(f"DEBUG _display_recipe_results: Inserindo '{recipe['name']}' na Treeview para recipe_id={recipe['recipe_id']}.")
+        if not hasattr(self, "recipe_results_tree"):
+            return # The search tab wasn't opened yet, it loads the results when it is
+        self._start_recipe_search({'ingredients_input': "", 'max_prep_time': "", 'category': "", 'difficulty': ""})
+
+    def _start_recipe_search(self, params, mode="Filtros"):
+        """Cleans the Treeview and shows the first page of a new search (params are those of the mode's methods)."""
+        self.search_params = params
+        self.search_methods = SEARCH_MODES[mode]
+        self.search_total = 0
+        self.search_offset = 0
+        self.search_render_token += 1
+        self.results_rendering = False
+        self.recipe_results_tree.delete(*self.recipe_results_tree.get_children())
+        self._set_search_busy(True)
+        # The "search" key makes this replace any search (or page) that is still waiting or running
+        self.db_worker.submit(self._fetch_first_results_page, params, self.search_methods, key="search", callback=self._on_first_results_page,
+                              errback=lambda error: self._set_search_busy(False))
+
+    @staticmethod
+    def _fetch_first_results_page(db_manager, params, methods):
+        """Runs in the worker thread: counts the results and fetches the first page."""
+        count_method, page_method = methods
+        return getattr(db_manager, count_method)(**params), getattr(db_manager, page_method)(**params, limit=RESULTS_PAGE_SIZE, offset=0)
+
+    def _on_first_results_page(self, result):
+        total, recipes = result
+        self.search_total = total
+        self._on_results_page(recipes)
+
+    def _load_more_recipe_results(self):
+        """Fetches the next page of the current search and starts drawing it."""
+        self.results_load_pending = False
+        if self.results_rendering or self.db_worker.is_busy("search"):
+            return # The next page goes after the current one is fully drawn, or the rows would get mixed
+        if self.search_offset < self.search_total:
+            self._set_search_busy(True)
+            self.db_worker.submit(self.search_methods[1], **self.search_params, limit=RESULTS_PAGE_SIZE, offset=self.search_offset,
+                                  key="search", callback=self._on_results_page, errback=lambda error: self._set_search_busy(False))
+
+    def _on_results_page(self, recipes):
+        """Called with each page of results that comes from the worker."""
+        self._set_search_busy(False)
+        self.search_offset += len(recipes)
+        if len(recipes) < RESULTS_PAGE_SIZE:
+            self.search_total = self.search_offset # Some recipe was deleted meanwhile, there is nothing else to load
+        self._display_recipe_results(recipes)
+        self._update_results_count()
+
+    def _set_search_busy(self, busy):
+        """Shows that a search is running (the window keeps working meanwhile)."""
+        self.search_status_label.config(text="Buscando..." if busy else "")
+        self.root.config(cursor="watch" if busy else "")
+
+    def _update_results_count(self):
+        """Shows how many results there are and enables "Carregar mais" while there are more to load."""
+        self.results_count_label.config(text=f"{self.search_total} receitas encontradas (mostrando {self.search_offset})")
+        self.load_more_button.state(["!disabled"] if self.search_offset < self.search_total else ["disabled"])
+
+    def _display_recipe_results(self, recipes, start=0, token=None):
+        """
+        Displays the search results in the Treeview, RESULTS_CHUNK_SIZE rows at a time.
+        The rest is scheduled with after(), so Tk can redraw and handle clicks between the chunks.
+        """
+        if token is None:
+            token = self.search_render_token
+        elif token != self.search_render_token:
+            return # A newer search already cleaned the Treeview
+
+        for recipe in recipes[start:start + RESULTS_CHUNK_SIZE]:
+            if self.recipe_results_tree.exists(recipe['recipe_id']):
+                continue # Pages moved because a recipe was added meanwhile
             self.recipe_results_tree.insert("", tk.END, iid=recipe['recipe_id'],
-                                           values=(recipe['name'], recipe['prep_time'], recipe['difficulty'], recipe['category']))
+                                           values=(recipe['name'], recipe['prep_time'], recipe['difficulty'], recipe['category'],
+                                                   self._format_missing(recipe)))
+        self.results_rendering = start + RESULTS_CHUNK_SIZE < len(recipes)
+        if self.results_rendering:
+            self.root.after(1, self._display_recipe_results, recipes, start + RESULTS_CHUNK_SIZE, token)
+
+    @staticmethod
+    def _format_missing(recipe):
+        """The "Faltam" column: what a pantry search result still needs ("2: ovo, leite"), empty for the other searches."""
+        if 'missing' not in recipe:
+            return ""
+        if not recipe['missing']:
+            return "nada"
+        return f"{len(recipe['missing'])}: {', '.join(recipe['missing'])}"
+
+    def _on_recipe_results_scroll(self, first, last):
+        """Moves the scrollbar and loads the next page of results when the user gets near the end."""
+        self.recipe_scrollbar.set(first, last)
+        if (float(last) > 0.9 and self.search_offset < self.search_total
+                and not (self.results_load_pending or self.results_rendering or self.db_worker.is_busy("search"))):
+            self.results_load_pending = True
+            self.root.after_idle(self._load_more_recipe_results)
 
     def _show_recipe_details(self, event=None):
         """Shows the details of the selected recipe in a new window for editing.""" # Update implemented
         selected_item = self.recipe_results_tree.selection()
-        print(f"DEBUG _show_recipe_details: Itens selecionados na Treeview: {selected_item}")
+        logger.debug("_show_recipe_details: Itens selecionados na Treeview: %s", selected_item)
 
         if not selected_item:
             messagebox.showwarning("Nenhuma Receita Selecionada", "Por favor, selecione uma receita na lista para ver os detalhes.")
             return
 
         recipe_id = int(selected_item[0]) 
-        print(f"DEBUG _show_recipe_details: ID da receita selecionada: {recipe_id}")
+        logger.debug("_show_recipe_details: ID da receita selecionada: %s", recipe_id)
         
-        all_recipes = self.db_manager.get_all_recipes()
-        selected_recipe = next((r for r in all_recipes if r['recipe_id'] == recipe_id), None)
-        print(f"DEBUG _show_recipe_details: Receita encontrada no banco de dados: {selected_recipe}")
+        self.db_worker.submit("get_recipe_by_id", recipe_id, key="details",
+                              callback=lambda selected_recipe: self._open_recipe_details(recipe_id, selected_recipe))
 
+    def _open_recipe_details(self, recipe_id, selected_recipe):
+        """Builds the details window once the worker has loaded the recipe."""
+        logger.debug("_show_recipe_details: Receita encontrada no banco de dados: %s", selected_recipe)
 
         if selected_recipe:
             details_window = tk.Toplevel(self.root)
             details_window.title(f"Editar Receita: {selected_recipe['name']}")
-            details_window.geometry("600x600") # Setting a fixed size for the details window
+            details_window.geometry("600x720") # Setting a fixed size for the details window
             details_window.transient(self.root)
             details_window.grab_set()
 
@@ -336,6 +567,18 @@ class ReceitAIApp:
             self.edit_instructions_text.grid(row=6, column=1, sticky="nsew", pady=2)
             self.edit_instructions_text.insert(tk.END, selected_recipe['instructions'])
 
+            # Recipes with similar ingredients, loaded by the worker after the window is open. Double click opens one
+            ttk.Label(details_frame, text="Receitas parecidas:", style='TLabel').grid(row=7, column=0, sticky="nw", pady=2)
+            similar_tree = ttk.Treeview(details_frame, columns=("Nome", "Semelhança"), show="headings", height=5)
+            similar_tree.heading("Nome", text="Nome")
+            similar_tree.heading("Semelhança", text="Semelhança")
+            similar_tree.column("Nome", width=300, anchor="w")
+            similar_tree.column("Semelhança", width=90, anchor="center")
+            similar_tree.grid(row=7, column=1, sticky="ew", pady=2)
+            similar_tree.bind("<Double-1>", lambda event: self._open_similar_recipe(similar_tree, details_window))
+            self.db_worker.submit("find_similar_recipes", recipe_id, limit=SIMILAR_RECIPES_LIMIT, key="similar",
+                                  callback=lambda similar_recipes: self._display_similar_recipes(similar_tree, similar_recipes))
+
             # Buttons for saving or canceling the edit
             button_frame = ttk.Frame(details_window, style='TFrame')
             button_frame.pack(pady=10)
@@ -345,10 +588,88 @@ class ReceitAIApp:
             ttk.Button(button_frame, text="Excluir Receita", command=lambda: self._delete_recipe(recipe_id, details_window)).pack(side=tk.LEFT, padx=5)
             ttk.Button(button_frame, text="Cancelar", command=details_window.destroy).pack(side=tk.LEFT, padx=5)
 
-            self.db_manager.log_action("Ver Detalhes da Receita", f"ID: {recipe_id}, Nome: {selected_recipe['name']}")
+            self.db_worker.submit("log_action", "Ver Detalhes da Receita", f"ID: {recipe_id}, Nome: {selected_recipe['name']}")
         else:
             messagebox.showerror("Erro", "Não foi possível carregar os detalhes da receita.")
 
+    def _display_similar_recipes(self, similar_tree, similar_recipes):
+        """Fills the "Receitas parecidas" list of a details window, if it is still open."""
+        if not similar_tree.winfo_exists():
+            return
+        if not similar_recipes:
+            similar_tree.insert("", tk.END, values=("Nenhuma receita parecida encontrada", ""))
+            return
+        for recipe in similar_recipes:
+            similar_tree.insert("", tk.END, iid=recipe['recipe_id'], values=(recipe['name'], f"{recipe['similarity']:.0%}"))
+
+    def _open_similar_recipe(self, similar_tree, details_window):
+        """Closes this details window and opens the one of the similar recipe double clicked."""
+        selected_item = similar_tree.selection()
+        if not selected_item or not selected_item[0].isdigit():
+            return
+        recipe_id = int(selected_item[0])
+        details_window.destroy() # Only one details window at a time, they share the edit_* widgets
+        self.db_worker.submit("get_recipe_by_id", recipe_id, key="details",
+                              callback=lambda selected_recipe: self._open_recipe_details(recipe_id, selected_recipe))
+
+    def _show_shopping_list(self):
+        """Asks the worker for the shopping list of the recipes selected in the results."""
+        selected_items = self.recipe_results_tree.selection()
+        if not selected_items:
+            messagebox.showwarning("Nenhuma Receita Selecionada",
+                                   "Selecione uma ou mais receitas na lista (Ctrl ou Shift + clique) para montar a lista de compras.")
+            return
+        recipe_ids = [int(item) for item in selected_items]
+        self.db_worker.submit("shopping_list", recipe_ids, key="shopping_list",
+                              callback=lambda shopping_list: self._open_shopping_list(recipe_ids, shopping_list))
+
+    def _open_shopping_list(self, recipe_ids, shopping_list):
+        """Shows the summed ingredients of the selected recipes, with a button to copy them as text."""
+        # "3 xícara de farinha", "sal a gosto": the same way the ingredients are typed
+        lines = []
+        for item in shopping_list:
+            quantity = format_quantity(item['quantity']) if item['quantity'] is not None else "a gosto"
+            line = format_ingredient(item['ingredient'], quantity, item['unit'] or "")
+            if item['quantity'] is not None and item['unquantified']:
+                line += " (+ a gosto)" # Some of the recipes don't say how much
+            lines.append((line, item['recipes']))
+
+        list_window = tk.Toplevel(self.root)
+        list_window.title(f"Lista de Compras ({len(recipe_ids)} receitas)")
+        list_window.geometry("500x500")
+        list_window.transient(self.root)
+        list_window.config(bg=self.style.lookup('TFrame', 'background', default='SystemButtonFace'))
+
+        list_frame = ttk.Frame(list_window, padding="10", style='TFrame')
+        list_frame.pack(fill="both", expand=True)
+        list_frame.columnconfigure(0, weight=1)
+        list_frame.rowconfigure(0, weight=1)
+
+        shopping_tree = ttk.Treeview(list_frame, columns=("Item", "Receitas"), show="headings")
+        shopping_tree.heading("Item", text="Item")
+        shopping_tree.heading("Receitas", text="Receitas")
+        shopping_tree.column("Item", width=380, anchor="w")
+        shopping_tree.column("Receitas", width=70, anchor="center")
+        shopping_tree.grid(row=0, column=0, sticky="nsew")
+        shopping_scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=shopping_tree.yview)
+        shopping_scrollbar.grid(row=0, column=1, sticky="ns")
+        shopping_tree.configure(yscrollcommand=shopping_scrollbar.set)
+        for line, recipes in lines:
+            shopping_tree.insert("", tk.END, values=(line, recipes))
+        if not lines:
+            shopping_tree.insert("", tk.END, values=("As receitas selecionadas não têm ingredientes", ""))
+
+        def copy_list():
+            self.root.clipboard_clear()
+            self.root.clipboard_append("\n".join(line for line, _ in lines))
+
+        button_frame = ttk.Frame(list_window, style='TFrame')
+        button_frame.pack(pady=10)
+        ttk.Button(button_frame, text="Copiar", command=copy_list).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Fechar", command=list_window.destroy).pack(side=tk.LEFT, padx=5)
+
+        self.db_worker.submit("log_action", "Lista de Compras", f"Receitas: {', '.join(str(recipe_id) for recipe_id in recipe_ids)}")
+
     def _save_edited_recipe(self, recipe_id, details_window):
         """Saves the edited recipe details to the database.""" # Strip used again
         name = self.edit_name_entry.get().strip()
@@ -371,51 +692,51 @@ class ReceitAIApp:
                 messagebox.showwarning("Entrada Inválida", "Tempo de preparo deve ser um número inteiro.")
                 return
         
-        ingredients_list = [] # This is the same thing from up there. 1 colher de açúcar.
-        for line in ingredients_raw.split('\n'):
-            line = line.strip()
-            if not line:
-                continue
-
-            parts = line.split(' de ', 1)
-            if len(parts) == 2:
-                qty_unit = parts[0].strip()
-                ingredient_name = parts[1].strip()
-                qty_parts = qty_unit.split(' ', 1)
-                quantity = qty_parts[0].strip() if qty_parts else ''
-                unit = qty_parts[1].strip() if len(qty_parts) > 1 else ''
-            else:
-                quantity = ''
-                unit = ''
-                ingredient_name = line
-
-            ingredients_list.append({'name': ingredient_name, 'quantity': quantity, 'unit': unit})
-
-        if self.db_manager.update_recipe(recipe_id, name, prep_time, difficulty, category, instructions, tags, ingredients_list):
-            messagebox.showinfo("Sucesso", "Receita atualizada com sucesso!")
-            details_window.destroy() # Fucking destroys the details window after saving
-            self._refresh_recipe_search_results() # Refresh the search results after updating a recipe
-        else:
-            messagebox.showerror("Erro", "Erro ao atualizar receita. Verifique o console para mais detalhes.")
+        ingredients_list = parse_ingredient_block(ingredients_raw) # Same parser as the new recipe form
+
+        self.db_worker.submit("update_recipe", recipe_id, name, prep_time, difficulty, category, instructions, tags, ingredients_list,
+                              callback=lambda _: self._on_recipe_updated(details_window))
+
+    def _on_recipe_updated(self, details_window):
+        """Called when the worker saved the edited recipe (errors go to on_error, the window stays open to try again)."""
+        messagebox.showinfo("Sucesso", "Receita atualizada com sucesso!")
+        details_window.destroy() # Fucking destroys the details window after saving
+        self._refresh_recipe_search_results() # Refresh the search results after updating a recipe
 
     def _delete_recipe(self, recipe_id, details_window):
         """Deletes the selected recipe after confirmation."""
         if messagebox.askyesno("Confirmar Exclusão", "Tem certeza que deseja excluir esta receita? Ela parece tão gostosa..."):
-            if self.db_manager.delete_recipe(recipe_id):
-                messagebox.showinfo("Sucesso", "Receita excluída com sucesso! Você não vai mais poder fazer essa delícia...")
-                details_window.destroy() # Fucking destroys the details window after saving
-                self._refresh_recipe_search_results() # Refresh the search results after deleting a recipe
-            else:
-                messagebox.showerror("Erro", "Ocorreu um erro ao excluir a receita.")
+            self.db_worker.submit("delete_recipe", recipe_id, callback=lambda _: self._on_recipe_deleted(details_window))
 
+    def _on_recipe_deleted(self, details_window):
+        """Called when the worker deleted the recipe (errors go to on_error)."""
+        messagebox.showinfo("Sucesso", "Receita excluída com sucesso! Você não vai mais poder fazer essa delícia...")
+        details_window.destroy() # Fucking destroys the details window after saving
+        self._refresh_recipe_search_results() # Refresh the search results after deleting a recipe
 
-    def _create_logs_tab(self):
-        """Logs tab here."""
-        frame = ttk.Frame(self.notebook, padding="10")
-        self.notebook.add(frame, text="Logs do Usuário")
 
+    def _create_logs_tab(self, frame):
+        """Logs tab here."""
         frame.columnconfigure(0, weight=1)
-        frame.rowconfigure(0, weight=1)
+        frame.rowconfigure(1, weight=1)
+
+        # Filters, applied in the database query (not in the Treeview)
+        filter_frame = ttk.Frame(frame)
+        filter_frame.grid(row=0, column=0, columnspan=2, sticky="ew")
+        ttk.Label(filter_frame, text="Tipo de Ação:").pack(side=tk.LEFT)
+        self.logs_action_combobox = ttk.Combobox(filter_frame, values=LOG_ACTION_TYPES, width=25)
+        self.logs_action_combobox.pack(side=tk.LEFT, padx=5)
+        ttk.Label(filter_frame, text="De (AAAA-MM-DD):").pack(side=tk.LEFT)
+        self.logs_start_entry = ttk.Entry(filter_frame, width=12)
+        self.logs_start_entry.pack(side=tk.LEFT, padx=5)
+        ttk.Label(filter_frame, text="Até:").pack(side=tk.LEFT)
+        self.logs_end_entry = ttk.Entry(filter_frame, width=12)
+        self.logs_end_entry.pack(side=tk.LEFT, padx=5)
+        ttk.Button(filter_frame, text="Filtrar", command=self._refresh_logs).pack(side=tk.LEFT, padx=5)
+        # Old events leave this list (see RecipeRepository.archive_old_logs), the summary still counts them and shows them by day
+        ttk.Button(filter_frame, text="Resumo por Dia", command=self._show_log_rollups).pack(side=tk.LEFT, padx=5)
+        if self.log_retention_days:
+            ttk.Label(filter_frame, text=f"Logs com mais de {self.log_retention_days} dias ficam no resumo por dia.").pack(side=tk.LEFT, padx=5)
 
         self.logs_tree = ttk.Treeview(frame, columns=("Timestamp", "Tipo de Ação", "Descrição"), show="headings")
         self.logs_tree.heading("Timestamp", text="Carimbo de Data/Hora")
@@ -426,26 +747,201 @@ class ReceitAIApp:
         self.logs_tree.column("Tipo de Ação", width=150, anchor="w")
         self.logs_tree.column("Descrição", width=400, anchor="w")
 
-        self.logs_tree.grid(row=0, column=0, sticky="nsew", pady=10)
+        self.logs_tree.grid(row=1, column=0, sticky="nsew", pady=10)
 
-        log_scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.logs_tree.yview)
-        log_scrollbar.grid(row=0, column=1, sticky="ns")
-        self.logs_tree.configure(yscrollcommand=log_scrollbar.set)
+        self.log_scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.logs_tree.yview)
+        self.log_scrollbar.grid(row=1, column=1, sticky="ns")
+        self.logs_has_more = False
+        self.logs_load_pending = False # Avoids scheduling the same page twice while scrolling
+        self.logs_tree.configure(yscrollcommand=self._on_logs_scroll)
 
-        ttk.Button(frame, text="Atualizar Logs", command=self._refresh_logs).grid(row=1, column=0, columnspan=2, pady=10)
+        ttk.Button(frame, text="Atualizar Logs", command=self._refresh_logs).grid(row=2, column=0, columnspan=2, pady=10)
 
         self._refresh_logs() # Initial load of logs
 
     def _refresh_logs(self):
-        """Refreshes the logs displayed in the logs tab. Treeview"""
-        for item in self.logs_tree.get_children():
-            self.logs_tree.delete(item)
+        """Refreshes the logs displayed in the logs tab. Treeview. Only the first page is loaded, the rest comes while scrolling."""
+        filters = self._read_log_filters()
+        if filters is None:
+            return
+        self.logs_filters = filters
+        self.logs_next_page = None # (timestamp, log_id) of the last loaded row, where the next page starts
+        self.logs_has_more = True
+        self.logs_tree.delete(*self.logs_tree.get_children())
+        self._request_logs_page()
+
+    def _load_more_logs(self):
+        """Asks the worker for the next page of logs."""
+        self.logs_load_pending = False
+        if self.logs_has_more and not self.db_worker.is_busy("logs"):
+            self._request_logs_page()
+
+    def _request_logs_page(self):
+        # The "logs" key makes a refresh replace a page that is still loading with the old filters
+        self.db_worker.submit("get_logs", before=self.logs_next_page, limit=LOGS_PAGE_SIZE, **self.logs_filters,
+                              key="logs", callback=self._on_logs_page)
+
+    def _on_logs_page(self, logs):
+        """Appends a page of logs to the Treeview."""
+        for log_id, timestamp, action_type, description in logs:
+            self.logs_tree.insert("", tk.END, iid=log_id, values=(timestamp, action_type, description))
+        self.logs_has_more = len(logs) == LOGS_PAGE_SIZE
+        if logs:
+            self.logs_next_page = (logs[-1][1], logs[-1][0])
+
+    def _on_logs_scroll(self, first, last):
+        """Moves the scrollbar and, when the user gets near the end of the list, loads the next page."""
+        self.log_scrollbar.set(first, last)
+        if float(last) > 0.9 and self.logs_has_more and not (self.logs_load_pending or self.db_worker.is_busy("logs")):
+            self.logs_load_pending = True
+            self.root.after_idle(self._load_more_logs)
+
+    def _read_log_filters(self):
+        """The filters typed in the logs tab as get_logs arguments, or None (after a warning) if a date is invalid."""
+        start_date = self.logs_start_entry.get().strip()
+        end_date = self.logs_end_entry.get().strip()
+        for date_text in (start_date, end_date):
+            if date_text:
+                try:
+                    datetime.strptime(date_text, "%Y-%m-%d")
+                except ValueError:
+                    messagebox.showwarning("Entrada Inválida", "As datas devem estar no formato AAAA-MM-DD.")
+                    return None
+        return {
+            'action_type': self.logs_action_combobox.get().strip() or None,
+            'start_date': start_date or None,
+            'end_date': end_date or None,
+        }
+
+    def _show_log_rollups(self):
+        """Opens the count of events by day and action (archived ones included), with the logs tab filters."""
+        filters = self._read_log_filters()
+        if filters is None:
+            return
+        self.db_worker.submit("get_log_rollups", **filters, key="log_rollups",
+                              callback=lambda rollups: self._open_log_rollups(rollups, filters['action_type']))
+
+    def _open_log_rollups(self, rollups, action_type):
+        """Window with the daily counts. Double clicking a day lists its events below, archived or not."""
+        rollups_window = tk.Toplevel(self.root)
+        rollups_window.title("Resumo dos Logs por Dia")
+        rollups_window.geometry("800x600")
+        rollups_window.transient(self.root)
+        rollups_window.config(bg=self.style.lookup('TFrame', 'background', default='SystemButtonFace'))
+
+        rollups_frame = ttk.Frame(rollups_window, padding="10", style='TFrame')
+        rollups_frame.pack(fill="both", expand=True)
+        rollups_frame.columnconfigure(0, weight=1)
+        rollups_frame.rowconfigure(0, weight=1)
+        rollups_frame.rowconfigure(2, weight=1)
+
+        rollups_tree = ttk.Treeview(rollups_frame, columns=("Dia", "Tipo de Ação", "Eventos"), show="headings", selectmode="browse")
+        rollups_tree.heading("Dia", text="Dia")
+        rollups_tree.heading("Tipo de Ação", text="Tipo de Ação")
+        rollups_tree.heading("Eventos", text="Eventos")
+        rollups_tree.column("Dia", width=120, anchor="w")
+        rollups_tree.column("Tipo de Ação", width=250, anchor="w")
+        rollups_tree.column("Eventos", width=100, anchor="center")
+        rollups_tree.grid(row=0, column=0, sticky="nsew")
+        rollups_scrollbar = ttk.Scrollbar(rollups_frame, orient="vertical", command=rollups_tree.yview)
+        rollups_scrollbar.grid(row=0, column=1, sticky="ns")
+        rollups_tree.configure(yscrollcommand=rollups_scrollbar.set)
+        for day, day_action_type, events in rollups:
+            rollups_tree.insert("", tk.END, values=(day, day_action_type, events))
+
+        ttk.Label(rollups_frame, text="Eventos do dia (clique duas vezes em um dia acima):").grid(row=1, column=0, sticky="w", pady=(10, 2))
+        day_tree = ttk.Treeview(rollups_frame, columns=("Timestamp", "Tipo de Ação", "Descrição"), show="headings")
+        day_tree.heading("Timestamp", text="Carimbo de Data/Hora")
+        day_tree.heading("Tipo de Ação", text="Tipo de Ação")
+        day_tree.heading("Descrição", text="Descrição")
+        day_tree.column("Timestamp", width=160, anchor="w")
+        day_tree.column("Tipo de Ação", width=150, anchor="w")
+        day_tree.column("Descrição", width=400, anchor="w")
+        day_tree.grid(row=2, column=0, sticky="nsew")
+
+        def show_day(event=None):
+            selected_item = rollups_tree.selection()
+            if not selected_item:
+                return
+            day, day_action_type, _ = rollups_tree.item(selected_item[0])['values']
+            self.db_worker.submit(self._fetch_day_logs, str(day), action_type or day_action_type, key="day_logs",
+                                  callback=lambda logs: self._display_day_logs(day_tree, logs))
+
+        rollups_tree.bind("<Double-1>", show_day)
+        ttk.Button(rollups_window, text="Fechar", command=rollups_window.destroy).pack(pady=10)
+
+    @staticmethod
+    def _fetch_day_logs(db_manager, day, action_type):
+        """Runs in the worker thread: the events of one day, the archived ones first (they are older), then the others."""
+        archived = [log for log in db_manager.get_archived_logs(day, day) if log[2] == action_type]
+        live = db_manager.get_logs(action_type=action_type, start_date=day, end_date=day)
+        return archived + sorted(live, key=lambda log: (log[1], log[0]))
+
+    def _display_day_logs(self, day_tree, logs):
+        """Fills the events list of a rollups window, if it is still open."""
+        if not day_tree.winfo_exists():
+            return
+        day_tree.delete(*day_tree.get_children())
+        for log_id, timestamp, action_type, description in logs:
+            day_tree.insert("", tk.END, values=(timestamp, action_type, description))
 
-        logs = self.db_manager.get_logs()
-        for log in logs:
-            self.logs_tree.insert("", tk.END, values=log)
+    def _create_diagnostics_tab(self, frame):
+        """
+        Diagnostics tab: startup report, latency of each repository method (see instrumentation.timed),
+        caches and the slow query log with the plans of the slow statements.
+        """
+        frame.columnconfigure(0, weight=1)
+        frame.rowconfigure(1, weight=1)
+        frame.rowconfigure(2, weight=1)
+
+        self.startup_label = ttk.Label(frame, text=self.startup_report or "", wraplength=900)
+        self.startup_label.grid(row=0, column=0, columnspan=2, sticky="w", pady=5)
+
+        columns = ("Operação", "Chamadas", "Média", "p50", "p95", "Máximo")
+        self.metrics_tree = ttk.Treeview(frame, columns=columns, show="headings", height=10)
+        for column, text in zip(columns, ("Operação", "Chamadas", "Média (ms)", "p50 (ms)", "p95 (ms)", "Máximo (ms)")):
+            self.metrics_tree.heading(column, text=text)
+            self.metrics_tree.column(column, width=250 if column == "Operação" else 100, anchor="w" if column == "Operação" else "e")
+        self.metrics_tree.grid(row=1, column=0, sticky="nsew", pady=5)
+        metrics_scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.metrics_tree.yview)
+        metrics_scrollbar.grid(row=1, column=1, sticky="ns")
+        self.metrics_tree.configure(yscrollcommand=metrics_scrollbar.set)
+
+        # Caches and slow queries, as text: the statements and their plans don't fit in a Treeview row
+        self.diagnostics_text = scrolledtext.ScrolledText(frame, height=12, wrap=tk.WORD)
+        self.diagnostics_text.grid(row=2, column=0, columnspan=2, sticky="nsew", pady=5)
+
+        ttk.Button(frame, text="Atualizar", command=self._refresh_diagnostics).grid(row=3, column=0, columnspan=2, pady=5)
+        self._refresh_diagnostics()
+
+    def _refresh_diagnostics(self):
+        self.db_worker.submit("diagnostics", key="diagnostics", callback=self._on_diagnostics)
+
+    def _on_diagnostics(self, snapshot):
+        """Shows a diagnostics snapshot of the worker's repository."""
+        self.startup_label.config(text=self.startup_report or "")
+        self.metrics_tree.delete(*self.metrics_tree.get_children())
+        for name, summary in snapshot['operations'].items():
+            self.metrics_tree.insert("", tk.END, values=(name, summary['calls'], f"{summary['mean_ms']:.2f}", f"{summary['p50_ms']:g}",
+                                                          f"{summary['p95_ms']:g}", f"{summary['max_ms']:.1f}"))
+
+        lines = ["Caches:"]
+        for name, stats in snapshot['caches'].items():
+            lines.append(f"  {name}: {stats['size']} itens, {stats['hits']} acertos, {stats['misses']} falhas ({stats['hit_rate']:.0%})")
+        for name in ("pantry_index", "autocomplete", "user_logs"):
+            if name in snapshot:
+                lines.append(f"  {name}: " + ", ".join(f"{key} {value}" for key, value in snapshot[name].items()))
+        lines.append("")
+        lines.append(f"Operações lentas (mais de {snapshot['slow_query_ms']:g} ms): {len(snapshot['slow_calls']) or 'nenhuma'}")
+        for call in snapshot['slow_calls']:
+            lines.append(f"{call['time']}  {call['operation']}  {call['ms']:.0f} ms")
+            for statement in call['statements']:
+                lines.append(f"    {statement['sql'].strip()}")
+                lines.extend(f"        plano: {line}" for line in statement['plan'])
+        self.diagnostics_text.delete("1.0", tk.END)
+        self.diagnostics_text.insert(tk.END, "\n".join(lines))
 
     def on_closing(self):
         """Handles the window closing event to ensure the database connection is closed properly.""" # Thanks to the Gemini here, i forgot that existed
-        self.db_manager.close()
+        self.db_worker.close() # Waits for the pending writes, flushes the logs and closes the database
         self.root.destroy()
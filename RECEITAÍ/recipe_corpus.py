@@ -0,0 +1,253 @@
+import argparse
+import bisect
+import itertools
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+from recipe_io import open_text
+from recipe_repository import RecipeRepository, RepositoryError
+
+# Deterministic generator of synthetic recipe collections, for benchmarks and load tests.
+# The same (count, seed) always gives the same recipes, so runs on different versions can be compared.
+# Examples:
+#   python recipe_corpus.py corpus_100k.db --recipes 100000
+#   python recipe_corpus.py corpus_10k.jsonl.gz --recipes 10000     (file for bulk_import.py)
+
+CORPUS_SIZES = (1000, 10000, 100000, 1000000)
+DEFAULT_SEED = 42
+
+# (name, kind, units, quantities), from the most to the least common. "doce" ingredients name the sweet dishes,
+# "salgado" ones the savory dishes, "base" ones show up everywhere but never name a dish.
+INGREDIENTS = (
+    ("sal", "base", ("pitada", "colher de chá", ""), ("1", "2", "a gosto")),
+    ("açúcar", "base", ("xícara", "colher de sopa"), ("1", "2", "1/2", "3")),
+    ("ovo", "base", ("",), ("1", "2", "3", "4")),
+    ("farinha de trigo", "base", ("xícara", "colher de sopa", "g"), ("1", "2", "3", "500")),
+    ("leite", "base", ("xícara", "ml", "copo"), ("1", "2", "200", "500")),
+    ("manteiga", "base", ("colher de sopa", "g"), ("1", "2", "100")),
+    ("óleo", "base", ("xícara", "colher de sopa"), ("1/2", "1", "3")),
+    ("cebola", "salgado", ("", "unidade"), ("1", "2", "1/2")),
+    ("alho", "salgado", ("dente", "colher de chá"), ("2", "3", "4")),
+    ("tomate", "salgado", ("", "unidade"), ("2", "3", "4")),
+    ("azeite", "base", ("colher de sopa", "fio"), ("1", "2", "3")),
+    ("fermento em pó", "base", ("colher de sopa", "colher de chá"), ("1",)),
+    ("chocolate", "doce", ("g", "xícara", "barra"), ("100", "200", "1")),
+    ("leite condensado", "doce", ("lata", "caixa"), ("1", "2")),
+    ("creme de leite", "base", ("lata", "caixa"), ("1",)),
+    ("frango", "salgado", ("g", "kg", "peito"), ("500", "1", "2")),
+    ("batata", "salgado", ("", "g", "kg"), ("3", "4", "500", "1")),
+    ("cenoura", "salgado", ("", "xícara"), ("2", "3", "1")),
+    ("arroz", "salgado", ("xícara", "g"), ("1", "2", "500")),
+    ("queijo", "salgado", ("g", "xícara"), ("100", "200", "1")),
+    ("pimenta do reino", "base", ("pitada", "colher de chá"), ("1", "a gosto")),
+    ("salsinha", "salgado", ("colher de sopa", "maço"), ("2", "1")),
+    ("carne moída", "salgado", ("g", "kg"), ("500", "1")),
+    ("feijão", "salgado", ("xícara", "g", "kg"), ("2", "500", "1")),
+    ("coco ralado", "doce", ("xícara", "g", "pacote"), ("1", "100", "1")),
+    ("banana", "doce", ("", "unidade"), ("2", "3", "4")),
+    ("limão", "doce", ("", "colher de sopa"), ("1", "2")),
+    ("milho", "salgado", ("lata", "xícara", "espiga"), ("1", "2")),
+    ("presunto", "salgado", ("g", "fatia"), ("100", "200", "5")),
+    ("mandioca", "salgado", ("kg", "g"), ("1", "500")),
+    ("cebolinha", "salgado", ("colher de sopa", "maço"), ("2", "1")),
+    ("canela", "base", ("colher de chá", "pitada"), ("1", "1/2")),
+    ("morango", "doce", ("xícara", "caixa", "g"), ("1", "2", "250")),
+    ("maçã", "doce", ("", "unidade"), ("2", "3")),
+    ("camarão", "salgado", ("g", "kg"), ("500", "1")),
+    ("peixe", "salgado", ("filé", "g", "kg"), ("4", "500", "1")),
+    ("bacon", "salgado", ("g", "fatia"), ("100", "200", "6")),
+    ("linguiça", "salgado", ("g", "gomo"), ("300", "2")),
+    ("abóbora", "salgado", ("g", "kg", "xícara"), ("500", "1", "2")),
+    ("leite de coco", "base", ("vidro", "ml"), ("1", "200")),
+    ("maracujá", "doce", ("", "polpa"), ("2", "1")),
+    ("goiabada", "doce", ("g",), ("300",)),
+    ("brócolis", "salgado", ("maço", "xícara"), ("1", "2")),
+    ("cogumelo", "salgado", ("g", "xícara"), ("200", "1")),
+    ("espinafre", "salgado", ("maço", "xícara"), ("1", "2")),
+    ("abacaxi", "doce", ("", "xícara", "fatia"), ("1", "2", "4")),
+    ("amendoim", "doce", ("xícara", "g"), ("1", "200")),
+    ("aveia", "doce", ("xícara", "colher de sopa"), ("1", "3")),
+    ("mel", "doce", ("colher de sopa", "xícara"), ("2", "1/2")),
+    ("fubá", "doce", ("xícara", "g"), ("2", "500")),
+    ("polvilho", "salgado", ("xícara", "g"), ("2", "500")),
+    ("requeijão", "salgado", ("copo", "colher de sopa"), ("1", "3")),
+    ("azeitona", "salgado", ("xícara", "g"), ("1/2", "100")),
+    ("palmito", "salgado", ("vidro", "g"), ("1", "300")),
+    ("pimentão", "salgado", ("", "unidade"), ("1", "2")),
+    ("gengibre", "base", ("colher de chá", "pedaço"), ("1", "1")),
+    ("iogurte", "doce", ("copo", "pote"), ("1",)),
+    ("castanha de caju", "doce", ("xícara", "g"), ("1/2", "100")),
+    ("uva passa", "doce", ("xícara", "g"), ("1/2", "50")),
+    ("manjericão", "salgado", ("folhas", "maço"), ("10", "1")),
+    ("berinjela", "salgado", ("", "unidade"), ("1", "2")),
+    ("abobrinha", "salgado", ("", "unidade"), ("1", "2")),
+    ("lentilha", "salgado", ("xícara", "g"), ("1", "500")),
+    ("grão de bico", "salgado", ("xícara", "g"), ("1", "500")),
+    ("cacau em pó", "doce", ("colher de sopa", "xícara"), ("3", "1/2")),
+    ("gelatina", "doce", ("caixa", "envelope"), ("1", "2")),
+    ("nozes", "doce", ("xícara", "g"), ("1/2", "100")),
+    ("bacalhau", "salgado", ("g", "kg"), ("500", "1")),
+    ("ricota", "salgado", ("g",), ("250",)),
+    ("cerveja", "salgado", ("lata", "ml"), ("1", "350")),
+)
+
+# (dish, kind of its main ingredient, category)
+DISHES = (
+    ("Bolo", "doce", "Doce"), ("Torta", "doce", "Doce"), ("Pudim", "doce", "Doce"), ("Mousse", "doce", "Doce"),
+    ("Brigadeiro", "doce", "Doce"), ("Doce", "doce", "Doce"), ("Sorvete", "doce", "Sobremesa"),
+    ("Vitamina", "doce", "Bebida"), ("Suco", "doce", "Bebida"), ("Torta", "salgado", "Salgado"),
+    ("Sopa", "salgado", "Salgado"), ("Risoto", "salgado", "Salgado"), ("Escondidinho", "salgado", "Salgado"),
+    ("Salada", "salgado", "Salgado"), ("Farofa", "salgado", "Acompanhamento"), ("Moqueca", "salgado", "Prato Principal"),
+    ("Assado", "salgado", "Prato Principal"), ("Refogado", "salgado", "Acompanhamento"), ("Empadão", "salgado", "Salgado"),
+    ("Panqueca", "salgado", "Prato Principal"), ("Pão", "salgado", "Lanche"), ("Bolinho", "salgado", "Lanche"),
+)
+NAME_SUFFIXES = ("", "", "", "da vovó", "rápido", "de liquidificador", "fit", "cremoso", "caseiro", "de festa", "simples")
+DIFFICULTIES = (("Fácil", 55), ("Médio", 35), ("Difícil", 10))
+TAGS = ("almoço", "jantar", "café da manhã", "lanche", "festa", "vegetariano", "sem glúten", "rápido", "econômico",
+        "natal", "fim de semana", "marmita", "infantil", "saudável")
+STEPS = ("Pré-aqueça o forno a 180 graus.", "Misture bem os ingredientes secos.", "Bata tudo no liquidificador.",
+         "Refogue a cebola e o alho no azeite.", "Acrescente o {main} e mexa por alguns minutos.",
+         "Cozinhe em fogo baixo até engrossar.", "Tempere com sal a gosto.", "Leve ao forno por 40 minutos.",
+         "Deixe esfriar antes de servir.", "Sirva quente.", "Leve à geladeira por 4 horas.", "Decore com {main} picado.")
+LOG_ACTIONS = (("Busca de Receita", 60), ("Ver Detalhes da Receita", 30), ("Receita Cadastrada", 6),
+               ("Receita Atualizada", 3), ("Receita Excluída", 1))
+
+
+def _cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+
+class _WeightedPicker:
+    """Picks items by weight with bisect on the cumulative weights (random.choices recomputes them every call)."""
+
+    def __init__(self, items, weights):
+        self.items = items
+        self.cumulative = _cumulative(weights)
+        self.total = self.cumulative[-1]
+
+    def pick(self, rng):
+        return self.items[bisect.bisect_right(self.cumulative, rng.random() * self.total)]
+
+
+# Zipf-like popularity: the n-th most common ingredient is used about 1/n as often as the first one
+_INGREDIENT_PICKER = _WeightedPicker(INGREDIENTS, [1.0 / rank for rank in range(1, len(INGREDIENTS) + 1)])
+_MAIN_PICKERS = {
+    kind: _WeightedPicker([item for item in INGREDIENTS if item[1] == kind],
+                          [1.0 / rank for rank, item in enumerate(INGREDIENTS, start=1) if item[1] == kind])
+    for kind in ("doce", "salgado")
+}
+_DIFFICULTY_PICKER = _WeightedPicker([name for name, _ in DIFFICULTIES], [weight for _, weight in DIFFICULTIES])
+_LOG_ACTION_PICKER = _WeightedPicker([name for name, _ in LOG_ACTIONS], [weight for _, weight in LOG_ACTIONS])
+
+
+def generate_recipe(rng, number):
+    """One synthetic recipe (the dict used by bulk_add_recipes), using rng for every random choice."""
+    dish, kind, category = DISHES[rng.randrange(len(DISHES))]
+    main = _MAIN_PICKERS[kind].pick(rng)
+    suffix = NAME_SUFFIXES[rng.randrange(len(NAME_SUFFIXES))]
+    name = f"{dish} de {main[0]}" + (f" {suffix}" if suffix else "")
+
+    ingredient_count = round(rng.triangular(3, 14, 7))
+    chosen = {main[0]: main}
+    while len(chosen) < ingredient_count:
+        ingredient = _INGREDIENT_PICKER.pick(rng)
+        chosen.setdefault(ingredient[0], ingredient)
+    ingredients = []
+    for ingredient_name, _, units, quantities in chosen.values():
+        ingredients.append({
+            'name': ingredient_name,
+            'quantity': quantities[rng.randrange(len(quantities))],
+            'unit': units[rng.randrange(len(units))],
+        })
+
+    steps = rng.sample(STEPS, rng.randint(2, 5))
+    return {
+        'name': name,
+        'prep_time': int(rng.lognormvariate(3.5, 0.6)) + 5, # Most between 20 and 60 minutes, a few take hours
+        'difficulty': _DIFFICULTY_PICKER.pick(rng),
+        'category': category,
+        'instructions': " ".join(step.format(main=main[0]) for step in steps) + f" (receita {number})",
+        'tags': ", ".join(rng.sample(TAGS, rng.randint(0, 3))),
+        'ingredients': ingredients,
+    }
+
+
+def generate_recipes(count, seed=DEFAULT_SEED):
+    """Yields count synthetic recipes. The same count and seed always give the same recipes."""
+    rng = random.Random(seed)
+    for number in range(1, count + 1):
+        yield generate_recipe(rng, number)
+
+
+def generate_log_rows(count, seed=DEFAULT_SEED, start=datetime(2024, 1, 1)):
+    """Yields count (timestamp, action_type, description) user_logs rows, a few seconds to minutes apart."""
+    rng = random.Random(seed + 1)
+    moment = start
+    for number in range(count):
+        moment += timedelta(seconds=rng.randint(1, 300))
+        action_type = _LOG_ACTION_PICKER.pick(rng)
+        yield moment.strftime("%Y-%m-%d %H:%M:%S"), action_type, f"Evento sintético {number}"
+
+
+def build_database(db_path, count, seed=DEFAULT_SEED, log_count=None, batch_size=10000, progress_callback=None):
+    """
+    Creates a database with count synthetic recipes and log_count log events (by default one per recipe).
+    Returns the bulk import summary.
+    """
+    log_count = count if log_count is None else log_count
+    repository = RecipeRepository(db_path)
+    try:
+        summary = repository.bulk_add_recipes(generate_recipes(count, seed), batch_size=batch_size,
+                                              progress_callback=progress_callback, source=f"corpus sintético (seed {seed})")
+        rows = generate_log_rows(log_count, seed)
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            repository._write_log_rows(batch)
+    finally:
+        repository.close()
+    return summary
+
+
+def write_jsonl(path, count, seed=DEFAULT_SEED):
+    """Writes count synthetic recipes to a JSONL file (gzip if it ends with .gz), ready for bulk_import.py."""
+    with open_text(path, "w") as file:
+        for recipe in generate_recipes(count, seed):
+            file.write(json.dumps(recipe, ensure_ascii=False) + "\n")
+
+
+def _print_progress(imported, elapsed):
+    rate = imported / elapsed if elapsed > 0 else 0.0
+    print(f"\r{imported} receitas geradas ({rate:.0f} receitas/s)", end="", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera uma coleção sintética (e sempre igual) de receitas.")
+    parser.add_argument("output", help="Banco de dados (.db) ou arquivo JSONL (.jsonl ou .jsonl.gz) a criar")
+    parser.add_argument("--recipes", type=int, default=10000, help=f"Quantidade de receitas (padrão: 10000; usuais: {CORPUS_SIZES})")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help=f"Semente (padrão: {DEFAULT_SEED})")
+    parser.add_argument("--logs", type=int, help="Eventos de log a gerar no banco (padrão: um por receita)")
+    args = parser.parse_args(argv)
+
+    if args.output.endswith((".jsonl", ".jsonl.gz")):
+        write_jsonl(args.output, args.recipes, args.seed)
+        return 0
+    if os.path.exists(args.output):
+        print(f"{args.output} já existe, apague-o antes para gerar de novo.", file=sys.stderr)
+        return 1
+    try:
+        summary = build_database(args.output, args.recipes, args.seed, args.logs, progress_callback=_print_progress)
+    except RepositoryError as e:
+        print(f"\nErro no banco de dados: {e}", file=sys.stderr)
+        return 1
+    print(file=sys.stderr)
+    print(f"{args.output}: {summary['imported']} receitas em {summary['seconds']:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
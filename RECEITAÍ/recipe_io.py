@@ -0,0 +1,214 @@
+import csv
+import gzip
+import json
+import os
+
+from ingredient_parser import parse_ingredient_block, parse_ingredient_line
+
+# Reading recipe files (JSON, JSONL and CSV) for the bulk import, and writing them for the export.
+# Everything here streams, so big files are read and written one recipe at a time and never fully loaded in memory.
+
+FORMATS = ("json", "jsonl", "csv")
+RECIPE_FIELDS = ("name", "prep_time", "difficulty", "category", "instructions", "tags", "ingredients")
+EXPORT_FIELDS = ("recipe_id",) + RECIPE_FIELDS # The import ignores recipe_id, it is there to find the recipe again
+GZIP_LEVEL = 6 # Compression level of the files written, 9 (gzip's default) is about twice as slow for a few % smaller
+
+
+def detect_format(path):
+    """Guesses the file format from its extension (a .gz at the end is ignored)."""
+    base = path[:-3] if path.endswith(".gz") else path
+    extension = os.path.splitext(base)[1].lower().lstrip(".")
+    if extension == "ndjson":
+        extension = "jsonl"
+    if extension not in FORMATS:
+        raise ValueError(f"Formato de arquivo desconhecido: '{path}'. Use um de {FORMATS}")
+    return extension
+
+
+def open_text(path, mode="r"):
+    """Opens a text file, compressed with gzip when the name ends with .gz."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", compresslevel=GZIP_LEVEL, encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def _text(record, field):
+    """A text field of a record as a str ('' when missing or empty). Numbers are accepted, lists and objects are not."""
+    value = record.get(field) or ''
+    if isinstance(value, (dict, list)):
+        raise ValueError(f"O campo '{field}' deve ser um texto, não {type(value).__name__}.")
+    return str(value)
+
+
+def normalize_recipe(record):
+    """
+    Turns a raw record (from any of the formats) into the recipe dict expected by bulk_add_recipes.
+    Ingredients may be dicts ({'name', 'quantity', 'unit'}), lines like "2 xícaras de farinha",
+    or a single text with one ingredient per line (or separated by ';', which is how the CSV stores them).
+    Lines are read by ingredient_parser, which also fills quantity_value and unit_canonical.
+    Raises ValueError if the record is not an object or a field has the wrong type.
+    """
+    if not isinstance(record, dict):
+        raise ValueError(f"A receita deve ser um objeto JSON, não {type(record).__name__}.")
+    ingredients = record.get('ingredients') or []
+    if isinstance(ingredients, str):
+        ingredients = parse_ingredient_block(ingredients, separators=";\n")
+    elif not isinstance(ingredients, list):
+        raise ValueError(f"O campo 'ingredients' deve ser uma lista ou um texto, não {type(ingredients).__name__}.")
+
+    ingredients_list = []
+    for ingredient in ingredients:
+        if isinstance(ingredient, dict) and 'quantity_value' in ingredient:
+            _text(ingredient, 'name') # Only checks its type
+            ingredients_list.append(ingredient) # Already parsed
+        elif isinstance(ingredient, dict):
+            ingredients_list.append({
+                'name': _text(ingredient, 'name'),
+                'quantity': _text(ingredient, 'quantity'),
+                'unit': _text(ingredient, 'unit'),
+            })
+        elif isinstance(ingredient, list):
+            raise ValueError("Cada ingrediente deve ser um texto ou um objeto, não uma lista.")
+        elif str(ingredient).strip():
+            ingredients_list.append(parse_ingredient_line(str(ingredient)))
+
+    prep_time = record.get('prep_time')
+    try:
+        prep_time = int(prep_time) if prep_time not in (None, '') else None
+    except (TypeError, ValueError):
+        prep_time = None # Same as the app: a bad time is not worth losing the recipe
+
+    tags = record.get('tags') or ''
+    if isinstance(tags, list):
+        tags = ', '.join(str(tag) for tag in tags)
+    elif isinstance(tags, dict):
+        raise ValueError("O campo 'tags' deve ser uma lista ou um texto, não dict.")
+
+    return {
+        'name': _text(record, 'name').strip(),
+        'prep_time': prep_time,
+        'difficulty': _text(record, 'difficulty').strip(),
+        'category': _text(record, 'category').strip(),
+        'instructions': _text(record, 'instructions').strip(),
+        'tags': str(tags).strip(),
+        'ingredients': ingredients_list,
+    }
+
+
+def _iter_json_array(file, chunk_size=1 << 16):
+    """Yields the items of a top level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+
+    def fill(buffer):
+        chunk = file.read(chunk_size)
+        return buffer + chunk, not chunk
+
+    while not eof and not buffer.lstrip():
+        buffer, eof = fill(buffer)
+    buffer = buffer.lstrip()
+    if not buffer.startswith('['):
+        raise ValueError("O arquivo JSON deve conter uma lista de receitas.")
+    buffer = buffer[1:]
+
+    while True:
+        buffer = buffer.lstrip()
+        if buffer.startswith(','):
+            buffer = buffer[1:].lstrip()
+        if not buffer:
+            if eof:
+                raise ValueError("Arquivo JSON incompleto: a lista de receitas não foi fechada.")
+            buffer, eof = fill(buffer)
+            continue
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            buffer, eof = fill(buffer) # The item is cut in half, read more and try again
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def iter_recipe_records(path, file_format=None):
+    """Yields the raw records of a JSON, JSONL or CSV file, one at a time."""
+    file_format = file_format or detect_format(path)
+    with open_text(path) as file:
+        if file_format == "json":
+            yield from _iter_json_array(file)
+        elif file_format == "jsonl":
+            for line_number, line in enumerate(file, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Linha {line_number} não é um JSON válido: {e}") from e
+        elif file_format == "csv":
+            yield from csv.DictReader(file)
+        else:
+            raise ValueError(f"Formato desconhecido: {file_format}. Use um de {FORMATS}")
+
+
+def read_recipes(path, file_format=None, on_invalid=None):
+    """
+    Yields the recipes of a file already normalized for RecipeRepository.bulk_add_recipes.
+    A record normalize_recipe rejects is yielded as None (bulk_add_recipes counts it as skipped), after
+    on_invalid(record_number, error) is called, so one bad record doesn't stop the import of the others.
+    """
+    for record_number, record in enumerate(iter_recipe_records(path, file_format), start=1):
+        try:
+            yield normalize_recipe(record)
+        except ValueError as e:
+            if on_invalid:
+                on_invalid(record_number, e)
+            yield None
+
+
+def export_record(recipe, file_format):
+    """
+    The recipe dict (as RecipeRepository returns it) to write in the file: the EXPORT_FIELDS, with the ingredients
+    as "quantidade unidade de ingrediente" lines, which normalize_recipe reads back. In CSV they go in one column,
+    separated by ';'.
+    """
+    record = {field: recipe.get(field) for field in EXPORT_FIELDS}
+    if file_format == "csv":
+        record['ingredients'] = "; ".join(record['ingredients'] or [])
+    return record
+
+
+def write_recipes(recipes, path, file_format=None, progress_callback=None, progress_every=10000):
+    """
+    Writes the recipes (any iterable, like RecipeRepository.iter_recipes) to a JSON, JSONL or CSV file, gzip compressed
+    when the name ends with .gz, one recipe at a time. progress_callback(written) is called every progress_every recipes.
+    Returns how many recipes were written.
+    """
+    file_format = file_format or detect_format(path)
+    if file_format not in FORMATS:
+        raise ValueError(f"Formato desconhecido: {file_format}. Use um de {FORMATS}")
+    written = 0
+    with open_text(path, "w") as file:
+        if file_format == "csv":
+            writer = csv.DictWriter(file, fieldnames=EXPORT_FIELDS)
+            writer.writeheader()
+        elif file_format == "json":
+            file.write("[")
+        for recipe in recipes:
+            record = export_record(recipe, file_format)
+            if file_format == "csv":
+                writer.writerow(record)
+            elif file_format == "json":
+                file.write(("\n" if written == 0 else ",\n") + json.dumps(record, ensure_ascii=False))
+            else:
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            written += 1
+            if progress_callback and written % progress_every == 0:
+                progress_callback(written)
+        if file_format == "json":
+            file.write("\n]\n")
+    return written
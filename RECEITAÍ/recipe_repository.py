@@ -0,0 +1,1880 @@
+import collections
+import functools
+import itertools
+import json
+import math
+import operator
+import pathlib
+import queue
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from ingredient_parser import (TO_TASTE, base_unit, canonical_unit, ingredient_key, quantity_value, readable_quantity,
+                               trigram_similarity)
+from instrumentation import Metrics, StatementTrace, configure_logging, logger, timed
+from log_buffer import LogBuffer
+from lru_cache import LRUCache
+from pantry_index import PantryIndex
+from prefix_index import PrefixIndex
+from recipe_similarity import band_buckets, estimated_similarity, minhash_signature
+
+# Oldest SQLite (the library Python was built with, sqlite3.sqlite_version) the queries run on: RETURNING needs 3.35,
+# the FTS5 trigram tokenizer 3.34, and the JSON1 functions (json_each, json_extract) must be compiled in
+MIN_SQLITE_VERSION = (3, 35, 0)
+
+MATCH_MODES = ("prefix", "exact", "contains")
+PREFIX_UPPER_BOUND = "\U0010ffff" # Biggest code point, everything that starts with the prefix sorts before prefix + this
+
+
+# bm25 weights for the name, instructions and tags columns, a word in the name counts way more
+FTS_RANK = "bm25(recipes_fts, 10.0, 1.0, 5.0)"
+
+# find_similar_recipes reads at most this many recipes from each LSH bucket (a bucket of a very common
+# ingredient combination can have a big part of the collection), and reranks the candidates that share
+# the most buckets with the recipe by their signatures
+LSH_BUCKET_LIMIT = 500
+SIMILAR_CANDIDATES = 200
+SIGNATURE_BACKFILL_BATCH = 10000 # Recipes per transaction when signing the recipes of an older database
+
+# Typo tolerant ingredient lookup (find_similar_ingredients): the trigram index gives the FUZZY_CANDIDATES names
+# sharing the most trigrams, which are then scored with trigram_similarity and kept from FUZZY_MIN_SIMILARITY up
+FUZZY_CANDIDATES = 200
+FUZZY_MIN_SIMILARITY = 0.4
+
+# Results bigger than this (get_all_recipes of a big collection) are not kept in the query cache, they would hold
+# too much memory for a search nobody repeats
+QUERY_CACHE_MAX_ROWS = 5000
+
+# Version of ingredient_parser.quantity_value the stored quantity_value columns were computed with, kept in
+# PRAGMA user_version. Raise it when the parser reads some quantity differently, see _reparse_quantities
+QUANTITY_PARSER_VERSION = 1
+
+# Recipes read per query by iter_recipes (the export): memory stays at one chunk no matter the database size
+EXPORT_CHUNK_SIZE = 500
+
+# user_logs retention (see archive_old_logs): the events older than LOG_RETENTION_DAYS move, LOG_ARCHIVE_BATCH at a time,
+# to zlib compressed chunks in user_logs_archive, and their counts by day and action stay in user_log_rollups
+LOG_RETENTION_DAYS = 90
+LOG_ARCHIVE_BATCH = 5000
+LOG_ARCHIVE_INTERVAL = 3600 # Seconds between background checks once there is nothing old left to archive
+INCREMENTAL_VACUUM_PAGES = 1000 # Free pages given back to the file system per archived batch (4 MB with 4 KB pages)
+
+# Pragmas for the opt-in WAL mode (wal=True). With WAL readers don't block the writer and the writer doesn't block
+# readers, and synchronous=NORMAL only syncs on checkpoints, which is still safe against app crashes.
+WAL_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+)
+# Used by every connection (writer and readers) in WAL mode
+CONNECTION_PRAGMAS = (
+    "PRAGMA cache_size = -20000", # 20 MB page cache per connection (negative means KiB)
+    "PRAGMA mmap_size = 268435456", # Read pages straight from a 256 MB memory map instead of copying them
+    "PRAGMA temp_store = MEMORY", # Sorts and temp tables for ORDER BY / GROUP BY stay in memory
+)
+
+
+class RepositoryError(Exception):
+    """Base of the errors raised by RecipeRepository. title is a short heading, handy for dialogs."""
+    title = "Erro de Banco de Dados"
+
+
+class DatabaseConnectionError(RepositoryError):
+    """The database file could not be opened or its tables could not be created."""
+
+
+class RecipeNotFoundError(RepositoryError):
+    """There is no recipe with the given recipe_id."""
+    title = "Receita Não Encontrada"
+
+
+class DuplicateIngredientError(RepositoryError):
+    """The same ingredient was given twice for one recipe (breaks the junction table primary key)."""
+    title = "Erro de Cadastro"
+
+
+def fts_match_expression(text):
+    """
+    Turns what the user typed into a safe FTS5 query. Each word is quoted (so characters like
+    - or " can't break the query syntax) and used as a prefix. Words are combined with AND.
+    """
+    words = re.findall(r"\w+", text or "")
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def format_ingredient(name, quantity, unit):
+    """
+    Format the ingredient string in the form "quantidade unidade de ingrediente" ("3 ovos" when there is no unit,
+    "sal a gosto"), the same way the user types it, so ingredient_parser reads it back the same when editing.
+    """
+    if quantity and not unit and quantity.lower() in TO_TASTE:
+        return f"{name} {quantity}"
+    ingredient_formatted = " ".join(part for part in (quantity, unit) if part)
+    if not name:
+        return ingredient_formatted
+    if unit:
+        ingredient_formatted += " de"
+    return f"{ingredient_formatted} {name}".strip()
+
+
+def ingredient_columns(ingredient):
+    """
+    (quantity, unit, quantity_value, unit_canonical) of an ingredient dict, as stored in recipe_ingredients.
+    Dicts from ingredient_parser already have the last two, for the others they are computed from the text.
+    """
+    quantity = ingredient.get('quantity', '')
+    unit = ingredient.get('unit', '')
+    value = ingredient['quantity_value'] if 'quantity_value' in ingredient else quantity_value(quantity)
+    canonical = ingredient['unit_canonical'] if 'unit_canonical' in ingredient else canonical_unit(unit)
+    return quantity, unit, value, canonical
+
+
+# recipes columns that update_recipe compares, with the names used in the audit log
+RECIPE_FIELD_LABELS = {
+    'name': "nome",
+    'prep_time': "tempo de preparo",
+    'difficulty': "dificuldade",
+    'category': "categoria",
+    'instructions': "modo de preparo",
+    'tags': "tags",
+}
+
+
+def _describe_changes(old_fields, new_fields, changed_fields, added, removed, changed, old_ingredients, new_ingredients):
+    """The "what changed" text of the update_recipe log entry."""
+    parts = []
+    for field in changed_fields:
+        if field == 'instructions':
+            parts.append(RECIPE_FIELD_LABELS[field]) # Too long to show
+        else:
+            parts.append(f"{RECIPE_FIELD_LABELS[field]}: {old_fields[field]!r} -> {new_fields[field]!r}")
+    parts.extend(f"+{ingredient_name}" for ingredient_name in added)
+    parts.extend(f"-{ingredient_name}" for ingredient_name in removed)
+    for ingredient_name in changed:
+        old_quantity, old_unit = old_ingredients[ingredient_name][1][:2]
+        new_quantity, new_unit = new_ingredients[ingredient_name][:2]
+        parts.append(f"~{ingredient_name} ({format_ingredient('', old_quantity, old_unit) or '-'} -> "
+                     f"{format_ingredient('', new_quantity, new_unit) or '-'})")
+    return "Alterações: " + ", ".join(parts)
+
+
+def _writes(method):
+    """Runs the method holding the write lock, so threads sharing a repository take turns on the single writer."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._writing():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class RecipeRepository:
+    """
+    All the recipe database code, without any GUI. Errors are raised as RepositoryError subclasses,
+    so it can be used by the app, scripts, benchmarks or the HTTP API (api_server.py).
+
+    There is one writer connection, and every write takes a lock, so a repository can be shared by
+    several threads. With read_pool_size > 0 the searches use a pool of read-only connections instead,
+    so they run in parallel with each other and (with wal=True) while an import or edit is writing.
+    Without the pool the reads also go through the writer connection, one at a time.
+    Repositories on the same file can share the recipe_cache (an LRUCache is thread safe),
+    so an update made by one of them doesn't leave stale recipes in the others.
+    Search results (filter_recipes, count_recipes, get_all_recipes) are kept in query_cache until the next write,
+    see _cached_query.
+    The public methods are timed (see TIMED_METHODS and diagnostics), and calls slower than slow_query_ms
+    are logged with the query plans of their statements.
+    """
+
+    def __init__(self, db_name="receitas.db", debug=False, detail_cache_size=256, recipe_cache=None,
+                 wal=False, read_pool_size=0, query_cache_size=64, slow_query_ms=200.0, log_retention_days=LOG_RETENTION_DAYS):
+        self.db_name = db_name
+        self.debug = debug # When True, filter_recipes logs its EXPLAIN QUERY PLAN (and the logger is turned on)
+        if debug:
+            configure_logging("DEBUG")
+        self.metrics = Metrics(slow_query_ms) # Latency histograms and slow query log, see instrumentation.timed
+        self.statement_trace = StatementTrace() # Trace callback of the connections during timed calls, for the slow query log
+        self.wal = wal # Opt-in: switches the database to WAL with the tuned pragmas above
+        # recipe_id --> recipe dict, used by get_recipe_by_id
+        self.recipe_cache = recipe_cache if recipe_cache is not None else LRUCache(detail_cache_size)
+        # search parameters --> results. Every write clears it, its generation is the database generation
+        self.query_cache = LRUCache(query_cache_size)
+        self._data_versions = {} # connection --> last PRAGMA data_version seen on it, see _check_data_version
+        self._ingredient_ids = None # ingredient name --> ingredient_id, see _load_ingredient_ids
+        self._pantry_index = None # recipe x ingredient bitsets for find_recipes_by_pantry, see _load_pantry_index
+        self._signatures_complete = False # True once every recipe has its signature, see _backfill_signatures
+        self._trigram_frequencies = None # trigram --> how many ingredient names have it, see _similar_ingredient_keys
+        self._autocomplete = None # PrefixIndex of the ingredient names and of the categories, see autocomplete_indexes
+        self._new_ingredient_names = [] # Ingredients inserted by the current transaction, for the autocomplete
+        self.log_buffer = LogBuffer(self._write_log_rows) # log_action events waiting to be written together
+        self.log_retention_days = log_retention_days # None keeps every event in user_logs, see archive_old_logs
+        self._next_log_archive = 0.0 # time.monotonic() of the next background archive step, see archive_logs_step
+        self.ingredient_cache_hits = 0
+        self.ingredient_cache_misses = 0
+        self._write_lock = threading.RLock()
+        self._read_pool = None # queue of read-only connections, see _reading
+        self._read_connections = []
+        self.conn = None
+        self.cursor = None
+        self._connect()
+        self._create_tables()
+        if read_pool_size > 0 and db_name != ":memory:":
+            self._open_read_pool(read_pool_size)
+
+    def _connect(self):
+        """Connects to the SQLite database."""
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise DatabaseConnectionError(f"O SQLite {sqlite3.sqlite_version} do Python é antigo demais, "
+                                          f"é preciso o {'.'.join(map(str, MIN_SQLITE_VERSION))} ou mais novo.")
+        try:
+            # check_same_thread=False because any thread may write, always holding _write_lock
+            self.conn = sqlite3.connect(self.db_name, check_same_thread=False)
+            self.conn.create_function("ingredient_key", 1, ingredient_key, deterministic=True)
+            self.cursor = self.conn.cursor()
+            if self.wal:
+                for pragma in WAL_PRAGMAS + CONNECTION_PRAGMAS:
+                    self.cursor.execute(pragma)
+        except sqlite3.Error as e:
+            raise DatabaseConnectionError(f"Não foi possível conectar ao banco de dados: {e}") from e
+
+    def _open_read_pool(self, size):
+        """Opens the read-only connections used by _reading."""
+        uri = pathlib.Path(self.db_name).resolve().as_uri() + "?mode=ro"
+        self._read_pool = queue.Queue()
+        try:
+            for _ in range(size):
+                conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+                if self.wal:
+                    for pragma in CONNECTION_PRAGMAS:
+                        conn.execute(pragma)
+                self._read_connections.append(conn)
+                self._read_pool.put(conn)
+        except sqlite3.Error as e:
+            self.close()
+            raise DatabaseConnectionError(f"Não foi possível abrir as conexões de leitura: {e}") from e
+
+    @contextmanager
+    def _reading(self):
+        """
+        Cursor for read only queries. It comes from a pooled read-only connection (waiting for a free one)
+        when there is a pool, otherwise it is the writer cursor, held with the write lock.
+        """
+        if self._read_pool is None:
+            with self._writing():
+                yield self.cursor
+        else:
+            conn = self._read_pool.get()
+            try:
+                with self.statement_trace.tracing(conn):
+                    yield conn.cursor()
+            finally:
+                self._read_pool.put(conn)
+
+    @contextmanager
+    def _writing(self):
+        """Holds the write lock, with the slow query log trace on the writer connection during timed calls (see StatementTrace)."""
+        with self._write_lock, self.statement_trace.tracing(self.conn):
+            yield
+
+    def _executemany(self, sql, rows):
+        """cursor.executemany on the writer without the statement trace, which would expand the SQL of every row."""
+        with self.statement_trace.paused(self.conn):
+            self.cursor.executemany(sql, rows)
+
+    def _create_tables(self):
+        """Create table if not exists."""
+        try:
+            self._enable_incremental_vacuum()
+
+            # Recipes Table
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS recipes (
+                    recipe_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    prep_time INTEGER,
+                    difficulty TEXT,
+                    category TEXT,
+                    instructions TEXT,
+                    tags TEXT
+                )
+            ''')
+
+            # Ingredients Table
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS ingredients (
+                    ingredient_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL UNIQUE,
+                    name_key TEXT -- ingredient_key(name): no accents, lowercase, so "acucar" finds "açúcar"
+                )
+            ''')
+            self._add_name_key_column()
+
+            # Made a junction table to handle recipes and ingredients (n-n) 
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS recipe_ingredients (
+                    recipe_id INTEGER,
+                    ingredient_id INTEGER,
+                    quantity TEXT,
+                    unit TEXT,
+                    quantity_value REAL, -- quantity as a number (ingredient_parser), NULL for "a gosto" and such
+                    unit_canonical TEXT, -- unit in its canonical form, so "colheres de sopa" and "colher de sopa" sum together
+                    PRIMARY KEY (recipe_id, ingredient_id),
+                    FOREIGN KEY (recipe_id) REFERENCES recipes (recipe_id) ON DELETE CASCADE,
+                    FOREIGN KEY (ingredient_id) REFERENCES ingredients (ingredient_id) ON DELETE CASCADE
+                )
+            ''')
+
+            self._add_quantity_columns()
+            self._reparse_quantities()
+
+            # MinHash signatures of the ingredient sets and their LSH buckets, for find_similar_recipes (see recipe_similarity.py)
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS recipe_signatures (
+                    recipe_id INTEGER PRIMARY KEY,
+                    signature BLOB NOT NULL
+                )
+            ''')
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS recipe_lsh_buckets (
+                    bucket INTEGER NOT NULL,
+                    recipe_id INTEGER NOT NULL,
+                    PRIMARY KEY (bucket, recipe_id)
+                ) WITHOUT ROWID
+            ''')
+
+            # Logs Table
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS user_logs (
+                    log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    action_type TEXT NOT NULL,
+                    description TEXT
+                )
+            ''')
+
+            # Events older than the retention period, compressed in chunks of up to LOG_ARCHIVE_BATCH events
+            # (a zlib compressed JSON list of [log_id, timestamp, action_type, description]), see archive_old_logs
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS user_logs_archive (
+                    chunk_id INTEGER PRIMARY KEY,
+                    first_timestamp TEXT NOT NULL,
+                    last_timestamp TEXT NOT NULL,
+                    events INTEGER NOT NULL,
+                    data BLOB NOT NULL
+                )
+            ''')
+            # How many events of each action there were each day, for the archived events
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS user_log_rollups (
+                    day TEXT NOT NULL, -- AAAA-MM-DD
+                    action_type TEXT NOT NULL,
+                    events INTEGER NOT NULL,
+                    PRIMARY KEY (day, action_type)
+                ) WITHOUT ROWID
+            ''')
+
+            # Indexes used by filter_recipes. Category and difficulty are indexed with NOCASE,
+            # so the case-insensitive exact and prefix searches don't need to scan the table
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_recipes_category ON recipes (category COLLATE NOCASE)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_recipes_difficulty ON recipes (difficulty COLLATE NOCASE)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_recipes_prep_time ON recipes (prep_time)")
+            # The primary key of the junction table starts with recipe_id, so searching by ingredient needs its own index
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_ingredient ON recipe_ingredients (ingredient_id)")
+            # Ingredient lookups ignoring accents and case
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_ingredients_name_key ON ingredients (name_key)")
+            # Indexes for the logs pages (newest first), with and without the action type filter
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_logs_timestamp ON user_logs (timestamp, log_id)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_logs_action ON user_logs (action_type, timestamp, log_id)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_logs_archive_time ON user_logs_archive (first_timestamp, last_timestamp)")
+
+            self._create_fts_table()
+            self._create_ingredient_trigram_table()
+            self.conn.commit()
+        except sqlite3.Error as e:
+            raise DatabaseConnectionError(f"Não foi possível criar as tabelas: {e}") from e
+
+    def _enable_incremental_vacuum(self):
+        """
+        New databases use auto_vacuum = INCREMENTAL, so archive_old_logs can give the pages it frees back to the file
+        system a few at a time. It can only be set before the first table exists: older databases need one full
+        vacuum (vacuum(), or archive_logs.py --vacuum), until then the freed pages are just reused by new rows.
+        """
+        self.cursor.execute("SELECT COUNT(*) FROM sqlite_master")
+        if self.cursor.fetchone()[0] == 0:
+            self.cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+    def _add_quantity_columns(self):
+        """Databases created before the quantity_value and unit_canonical columns get them, filled from the text columns."""
+        self.cursor.execute("PRAGMA table_info(recipe_ingredients)")
+        columns = {row[1] for row in self.cursor.fetchall()}
+        if 'quantity_value' in columns:
+            return
+        self.cursor.execute("ALTER TABLE recipe_ingredients ADD COLUMN quantity_value REAL")
+        self.cursor.execute("ALTER TABLE recipe_ingredients ADD COLUMN unit_canonical TEXT")
+        # One UPDATE with the parser registered as SQL functions, instead of reading and writing every row from Python
+        self.conn.create_function("parse_quantity", 1, quantity_value, deterministic=True)
+        self.conn.create_function("parse_unit", 1, canonical_unit, deterministic=True)
+        self.cursor.execute("UPDATE recipe_ingredients SET quantity_value = parse_quantity(quantity), unit_canonical = parse_unit(unit)")
+
+    def _reparse_quantities(self):
+        """
+        Fills quantity_value again for the rows the older parser read wrong, once per database: PRAGMA user_version
+        keeps the QUANTITY_PARSER_VERSION it was parsed with. Version 1 reads "1.000" as a thousand, so only the
+        quantities with a dot are parsed again.
+        """
+        self.cursor.execute("PRAGMA user_version")
+        if self.cursor.fetchone()[0] >= QUANTITY_PARSER_VERSION:
+            return
+        self.conn.create_function("parse_quantity", 1, quantity_value, deterministic=True)
+        self.cursor.execute("UPDATE recipe_ingredients SET quantity_value = parse_quantity(quantity) WHERE quantity LIKE '%.%'")
+        self.cursor.execute(f"PRAGMA user_version = {QUANTITY_PARSER_VERSION}")
+
+    def _add_name_key_column(self):
+        """Databases created before the name_key column get it, filled by the ingredient_key SQL function."""
+        self.cursor.execute("PRAGMA table_info(ingredients)")
+        columns = {row[1] for row in self.cursor.fetchall()}
+        if 'name_key' in columns:
+            return
+        self.cursor.execute("ALTER TABLE ingredients ADD COLUMN name_key TEXT")
+        self.cursor.execute("UPDATE ingredients SET name_key = ingredient_key(name)")
+
+    def _create_ingredient_trigram_table(self):
+        """
+        Trigram index (FTS5 trigram tokenizer) over the ingredient keys, for find_similar_ingredients.
+        Like recipes_fts it is an external content table kept in sync by triggers.
+        """
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ingredients_trigram'")
+        trigram_existed = self.cursor.fetchone() is not None
+
+        self.cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS ingredients_trigram USING fts5(
+                name_key,
+                content='ingredients', content_rowid='ingredient_id',
+                tokenize='trigram'
+            )
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS ingredients_trigram_insert AFTER INSERT ON ingredients BEGIN
+                INSERT INTO ingredients_trigram (rowid, name_key) VALUES (new.ingredient_id, new.name_key);
+            END
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS ingredients_trigram_delete AFTER DELETE ON ingredients BEGIN
+                INSERT INTO ingredients_trigram (ingredients_trigram, rowid, name_key) VALUES ('delete', old.ingredient_id, old.name_key);
+            END
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS ingredients_trigram_update AFTER UPDATE OF name_key ON ingredients BEGIN
+                INSERT INTO ingredients_trigram (ingredients_trigram, rowid, name_key) VALUES ('delete', old.ingredient_id, old.name_key);
+                INSERT INTO ingredients_trigram (rowid, name_key) VALUES (new.ingredient_id, new.name_key);
+            END
+        ''')
+
+        # How many names have each trigram, so the fuzzy lookup can start from the rare ones
+        self.cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS ingredients_trigram_vocab USING fts5vocab(ingredients_trigram, 'row')")
+
+        if not trigram_existed:
+            self.cursor.execute("INSERT INTO ingredients_trigram (ingredients_trigram) VALUES ('rebuild')")
+
+    def _create_fts_table(self):
+        """
+        Full text index (FTS5) over name, instructions and tags. It is an external content table,
+        so the text is not stored twice, and the triggers keep it in sync with the recipes table.
+        """
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipes_fts'")
+        fts_existed = self.cursor.fetchone() is not None
+
+        self.cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+                name, instructions, tags,
+                content='recipes', content_rowid='recipe_id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS recipes_fts_insert AFTER INSERT ON recipes BEGIN
+                INSERT INTO recipes_fts (rowid, name, instructions, tags) VALUES (new.recipe_id, new.name, new.instructions, new.tags);
+            END
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS recipes_fts_delete AFTER DELETE ON recipes BEGIN
+                INSERT INTO recipes_fts (recipes_fts, rowid, name, instructions, tags) VALUES ('delete', old.recipe_id, old.name, old.instructions, old.tags);
+            END
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS recipes_fts_update AFTER UPDATE OF name, instructions, tags ON recipes BEGIN
+                INSERT INTO recipes_fts (recipes_fts, rowid, name, instructions, tags) VALUES ('delete', old.recipe_id, old.name, old.instructions, old.tags);
+                INSERT INTO recipes_fts (rowid, name, instructions, tags) VALUES (new.recipe_id, new.name, new.instructions, new.tags);
+            END
+        ''')
+
+        if not fts_existed:
+            # Databases created before the FTS table already have recipes, so we index them once
+            self.cursor.execute("INSERT INTO recipes_fts (recipes_fts) VALUES ('rebuild')")
+
+    @_writes
+    def close(self):
+        """Close the database connections."""
+        for conn in self._read_connections:
+            conn.close()
+        self._read_connections = []
+        if self.conn:
+            self.flush_logs() # Buffered log events must not be lost when the app closes
+            self.conn.close() # Closed last: the last connection checkpoints the WAL back into the database
+            self.conn = None
+
+    @_writes
+    def log_action(self, action_type, description=""):
+        """
+        Logs user actions in the database registration. The events are buffered and written in batches,
+        see LogBuffer for when they are flushed.
+        """
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.log_buffer.add(timestamp, action_type, description)
+
+    @_writes
+    def flush_logs(self):
+        """Writes the buffered log events now. Returns how many were written."""
+        return self.log_buffer.flush()
+
+    @_writes
+    def flush_logs_if_due(self):
+        """Writes the buffered log events if the oldest one has waited long enough (see LogBuffer). Returns how many were written."""
+        return self.log_buffer.flush_if_due()
+
+    def _write_log_rows(self, rows):
+        """Writes a batch of log events in a single transaction (used by the LogBuffer)."""
+        try:
+            self._executemany("INSERT INTO user_logs (timestamp, action_type, description) VALUES (?, ?, ?)", rows)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self._rollback()
+            logger.error("Erro ao registrar log: %s", e)
+
+    def archive_old_logs(self, retention_days=None, max_batches=None):
+        """
+        Moves the user_logs events older than retention_days (default: log_retention_days, None archives nothing)
+        to user_logs_archive, oldest first, LOG_ARCHIVE_BATCH events per transaction: each batch becomes one
+        compressed chunk, its counts are added to user_log_rollups and the events leave user_logs. So user_logs only
+        has the recent events and get_logs stays fast however old the database is.
+        Whole days are archived (the cutoff is at midnight). max_batches bounds the work of one call,
+        the background job does one batch at a time (see archive_logs_step). Returns how many events were archived.
+        """
+        retention_days = self.log_retention_days if retention_days is None else retention_days
+        if retention_days is None:
+            return 0
+        cutoff = (datetime.now() - timedelta(days=retention_days)).strftime("%Y-%m-%d 00:00:00")
+        archived = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            count = self._archive_log_batch(cutoff)
+            archived += count
+            batches += 1
+            if count < LOG_ARCHIVE_BATCH:
+                break
+        if archived:
+            self._incremental_vacuum(INCREMENTAL_VACUUM_PAGES * batches)
+            logger.info("%s eventos de log anteriores a %s arquivados", archived, cutoff[:10])
+        return archived
+
+    @_writes
+    def _archive_log_batch(self, cutoff):
+        """Archives up to LOG_ARCHIVE_BATCH events older than cutoff in one transaction. Returns how many."""
+        try:
+            self.cursor.execute("SELECT log_id, timestamp, action_type, description FROM user_logs WHERE timestamp < ? ORDER BY timestamp, log_id LIMIT ?",
+                                (cutoff, LOG_ARCHIVE_BATCH))
+            rows = self.cursor.fetchall()
+            if not rows:
+                return 0
+            data = zlib.compress(json.dumps(rows, ensure_ascii=False).encode("utf-8"))
+            self.cursor.execute("INSERT INTO user_logs_archive (first_timestamp, last_timestamp, events, data) VALUES (?, ?, ?, ?)",
+                                (rows[0][1], rows[-1][1], len(rows), data))
+            rollups = collections.Counter((timestamp[:10], action_type) for _, timestamp, action_type, _ in rows)
+            self._executemany("INSERT INTO user_log_rollups (day, action_type, events) VALUES (?, ?, ?) "
+                              "ON CONFLICT (day, action_type) DO UPDATE SET events = events + excluded.events",
+                                    [(day, action_type, events) for (day, action_type), events in rollups.items()])
+            # The batch is everything up to its last (timestamp, log_id), so the delete walks the timestamp index
+            self.cursor.execute("DELETE FROM user_logs WHERE (timestamp, log_id) <= (?, ?)", (rows[-1][1], rows[-1][0]))
+            self.conn.commit()
+            return len(rows)
+        except sqlite3.Error as e:
+            self._rollback()
+            raise RepositoryError(f"Erro ao arquivar logs: {e}") from e
+
+    @_writes
+    def _incremental_vacuum(self, pages):
+        """Gives up to pages free pages back to the file system, if the database uses auto_vacuum = INCREMENTAL."""
+        try:
+            self.cursor.execute("PRAGMA auto_vacuum")
+            if self.cursor.fetchone()[0] == 2:
+                # Each step of this pragma frees one page, and execute() only does the first step when the statement
+                # returns no rows. executescript runs it to the end
+                self.conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+        except sqlite3.Error as e:
+            logger.warning("incremental_vacuum falhou: %s", e)
+
+    def archive_logs_step(self):
+        """
+        One bounded step of the retention job, for the idle moments of the DatabaseWorker: archives at most one batch,
+        and once there is nothing old left it waits LOG_ARCHIVE_INTERVAL seconds before looking again.
+        Never raises, the worker thread must keep running. Returns how many events were archived.
+        """
+        if self.log_retention_days is None or time.monotonic() < self._next_log_archive:
+            return 0
+        try:
+            archived = self.archive_old_logs(max_batches=1)
+        except RepositoryError as e:
+            logger.error("Erro ao arquivar logs: %s", e)
+            archived = 0
+        if archived < LOG_ARCHIVE_BATCH:
+            self._next_log_archive = time.monotonic() + LOG_ARCHIVE_INTERVAL
+        return archived
+
+    @_writes
+    def vacuum(self, incremental=True):
+        """
+        Rewrites the whole database file without its free pages. With incremental=True it also switches it to
+        auto_vacuum = INCREMENTAL (see _enable_incremental_vacuum). Slow on a big database, meant for the command line.
+        """
+        try:
+            if self.conn.in_transaction:
+                self.conn.commit()
+            if incremental:
+                self.cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self.cursor.execute("VACUUM")
+        except sqlite3.Error as e:
+            raise RepositoryError(f"Erro ao compactar o banco de dados: {e}") from e
+
+    def get_log_rollups(self, action_type=None, start_date=None, end_date=None):
+        """
+        (day, action_type, events) counts by day and action, newest day first: the rollups of the archived events
+        plus the events still in user_logs. The filters work like in get_logs.
+        """
+        rollup_conditions, rollup_params = [], []
+        log_conditions, log_params = [], []
+        if action_type:
+            rollup_conditions.append("action_type = ?")
+            rollup_params.append(action_type)
+            log_conditions.append("action_type = ?")
+            log_params.append(action_type)
+        if start_date:
+            rollup_conditions.append("day >= ?")
+            rollup_params.append(start_date[:10])
+            log_conditions.append("timestamp >= ?")
+            log_params.append(start_date)
+        if end_date:
+            rollup_conditions.append("day <= ?")
+            rollup_params.append(end_date[:10])
+            log_conditions.append("timestamp <= ?")
+            log_params.append(end_date + " 23:59:59" if len(end_date) == 10 else end_date)
+        rollup_where = " WHERE " + " AND ".join(rollup_conditions) if rollup_conditions else ""
+        log_where = " WHERE " + " AND ".join(log_conditions) if log_conditions else ""
+
+        self.flush_logs() # So the events that are still in memory are counted too
+        try:
+            with self._reading() as cursor:
+                cursor.execute(f"""
+                    SELECT day, action_type, SUM(events) FROM (
+                        SELECT day, action_type, events FROM user_log_rollups{rollup_where}
+                        UNION ALL
+                        SELECT substr(timestamp, 1, 10), action_type, COUNT(*) FROM user_logs{log_where} GROUP BY 1, 2
+                    ) GROUP BY day, action_type ORDER BY day DESC, action_type
+                """, tuple(rollup_params + log_params))
+                return cursor.fetchall()
+        except sqlite3.Error as e:
+            raise RepositoryError(f"Erro ao buscar o resumo dos logs: {e}") from e
+
+    def get_archived_logs(self, start_date=None, end_date=None):
+        """
+        Yields the archived events (log_id, timestamp, action_type, description) between the dates, oldest first,
+        decompressing one chunk at a time.
+        """
+        end = end_date + " 23:59:59" if end_date and len(end_date) == 10 else end_date
+        conditions, params = [], []
+        if start_date:
+            conditions.append("last_timestamp >= ?")
+            params.append(start_date)
+        if end:
+            conditions.append("first_timestamp <= ?")
+            params.append(end)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        try:
+            with self._reading() as cursor:
+                cursor.execute(f"SELECT chunk_id FROM user_logs_archive{where} ORDER BY chunk_id", tuple(params))
+                chunk_ids = [row[0] for row in cursor.fetchall()]
+            for chunk_id in chunk_ids:
+                with self._reading() as cursor: # One chunk per read, the caller may take its time between them
+                    cursor.execute("SELECT data FROM user_logs_archive WHERE chunk_id = ?", (chunk_id,))
+                    row = cursor.fetchone()
+                if row is None:
+                    continue
+                for log_id, timestamp, action_type, description in json.loads(zlib.decompress(row[0])):
+                    if (not start_date or timestamp >= start_date) and (not end or timestamp <= end):
+                        yield log_id, timestamp, action_type, description
+        except (sqlite3.Error, zlib.error) as e:
+            raise RepositoryError(f"Erro ao ler os logs arquivados: {e}") from e
+
+    def get_logs(self, before=None, limit=None, action_type=None, start_date=None, end_date=None):
+        """
+        Get logs function, newest first. Returns (log_id, timestamp, action_type, description) rows.
+        It pages with a keyset instead of OFFSET: pass the (timestamp, log_id) of the last row you got as before
+        and it continues right after it using the index, so every page costs the same no matter how deep it is.
+        action_type filters by the exact action, start_date and end_date ("AAAA-MM-DD", inclusive) by day.
+        Without limit every (filtered) log is returned. Events older than the retention period are not here,
+        see archive_old_logs, get_archived_logs and get_log_rollups.
+        """
+        self.flush_logs() # So the events that are still in memory show up too
+
+        conditions = []
+        params = []
+        if action_type:
+            conditions.append("action_type = ?")
+            params.append(action_type)
+        if start_date:
+            conditions.append("timestamp >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("timestamp <= ?")
+            params.append(end_date + " 23:59:59" if len(end_date) == 10 else end_date)
+        if before:
+            conditions.append("(timestamp, log_id) < (?, ?)")
+            params.extend(before)
+
+        query = "SELECT log_id, timestamp, action_type, description FROM user_logs"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY timestamp DESC, log_id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        try:
+            with self._reading() as cursor:
+                cursor.execute(query, tuple(params))
+                return cursor.fetchall()
+        except sqlite3.Error as e:
+            raise RepositoryError(f"Erro ao buscar logs: {e}") from e
+
+    @_writes
+    def add_recipe(self, name, prep_time, difficulty, category, instructions, tags, ingredients_list):
+        """
+        Recipe registration function. I used a list of dictionaries to handle the ingredients,
+        where each dictionary contains 'name', 'quantity', and 'unit'. (Null values are allowed for quantity and unit).
+        Dicts from ingredient_parser also bring 'quantity_value' and 'unit_canonical', otherwise they are computed here.
+        Returns the recipe_id of the new recipe.
+        """
+        try:
+            self.cursor.execute("INSERT INTO recipes (name, prep_time, difficulty, category, instructions, tags) VALUES (?, ?, ?, ?, ?, ?)",
+                                (name, prep_time, difficulty, category, instructions, tags))
+            recipe_id = self.cursor.lastrowid
+            ingredient_ids = []
+
+            for ingredient in ingredients_list:
+                ingredient_name = ingredient.get('name', '').strip().lower()
+
+                if not ingredient_name:
+                    continue
+
+                # Gets the ingredient id from the interning cache, creating the ingredient if it doesn't exist
+                ingredient_id = self._get_ingredient_id(ingredient_name)
+                ingredient_ids.append(ingredient_id)
+
+                # Links the recipe with the ingredient in the junction table
+                self.cursor.execute("INSERT INTO recipe_ingredients (recipe_id, ingredient_id, quantity, unit, quantity_value, unit_canonical) VALUES (?, ?, ?, ?, ?, ?)",
+                                    (recipe_id, ingredient_id) + ingredient_columns(ingredient))
+            self._write_signatures([(recipe_id, ingredient_ids)])
+            self.conn.commit()
+            self.query_cache.clear()
+            self._update_pantry_index(recipe_id, (), ingredient_ids)
+            self._update_autocomplete(added_categories=[category])
+            self.log_action("Receita Cadastrada", f"Nome: {name}")
+            return recipe_id
+        except sqlite3.IntegrityError as e:
+            self._rollback()
+            raise DuplicateIngredientError(f"Erro de integridade ao adicionar receita: {e}. Verifique se o ingrediente não está duplicado.") from e
+        except sqlite3.Error as e:
+            self._rollback()
+            raise RepositoryError(f"Erro ao adicionar receita: {e}") from e
+
+    def bulk_add_recipes(self, recipes, batch_size=10000, progress_callback=None, source=""):
+        """
+        Imports lots of recipes fast. recipes is any iterable (it can be a generator reading a file)
+        of dicts with the same fields as add_recipe and 'ingredients' as a list of dicts (None items are skipped).
+        Each batch is one transaction: ingredient ids are resolved for the whole batch at once
+        and everything is written with executemany. Only one log entry is written at the end.
+        progress_callback(imported, elapsed_seconds) is called after each batch.
+        If a batch fails it is rolled back and RepositoryError is raised (the batches before it stay imported).
+        Returns a summary dict with the counts and the throughput in recipes per second.
+        """
+        start = time.perf_counter()
+        imported = 0
+        skipped = 0
+        batch = []
+
+        for recipe in recipes:
+            if not recipe or not recipe.get('name'):
+                skipped += 1 # The name is required, just like in the form (None is a record read_recipes couldn't use)
+                continue
+            batch.append(recipe)
+            if len(batch) >= batch_size:
+                imported += self._insert_recipe_batch(batch)
+                batch = []
+                if progress_callback:
+                    progress_callback(imported, time.perf_counter() - start)
+        if batch:
+            imported += self._insert_recipe_batch(batch)
+            if progress_callback:
+                progress_callback(imported, time.perf_counter() - start)
+
+        elapsed = time.perf_counter() - start
+        summary = {
+            'imported': imported,
+            'skipped': skipped,
+            'seconds': elapsed,
+            'recipes_per_second': imported / elapsed if elapsed > 0 else 0.0,
+        }
+        self.log_action("Importação em Massa", f"Origem: {source or '-'}, Importadas: {imported}, Ignoradas: {skipped}, "
+                                               f"{summary['recipes_per_second']:.0f} receitas/s")
+        return summary
+
+    @_writes
+    def _insert_recipe_batch(self, batch):
+        """Writes one batch of recipes in a single transaction. Returns how many recipes were inserted."""
+        if self.conn.in_transaction:
+            self.conn.commit()
+        try:
+            self.cursor.execute("BEGIN IMMEDIATE") # Takes the write lock now, so nobody else gets the same recipe ids
+
+            # Resolve every ingredient of the batch with one SELECT, and insert the new ones together
+            names = {ingredient.get('name', '').strip().lower() for recipe in batch for ingredient in recipe.get('ingredients', [])}
+            names.discard('') # Nameless ingredients are skipped, like in add_recipe
+            ingredient_ids = self._resolve_ingredient_ids(names)
+
+            # The ids are assigned here, so recipes and their ingredients can both go with executemany
+            self.cursor.execute("SELECT MAX(COALESCE((SELECT MAX(recipe_id) FROM recipes), 0), COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'recipes'), 0))")
+            next_id = self.cursor.fetchone()[0] + 1
+
+            recipe_rows = []
+            ingredient_rows = []
+            for recipe_id, recipe in enumerate(batch, start=next_id):
+                recipe_rows.append((recipe_id, recipe['name'], recipe.get('prep_time'), recipe.get('difficulty', ''),
+                                    recipe.get('category', ''), recipe.get('instructions', ''), recipe.get('tags', '')))
+                seen = set()
+                for ingredient in recipe.get('ingredients', []):
+                    ingredient_name = ingredient.get('name', '').strip().lower()
+                    if not ingredient_name or ingredient_ids[ingredient_name] in seen:
+                        continue # Same ingredient twice in one recipe would break the junction table primary key
+                    seen.add(ingredient_ids[ingredient_name])
+                    ingredient_rows.append((recipe_id, ingredient_ids[ingredient_name]) + ingredient_columns(ingredient))
+
+            self._executemany("INSERT INTO recipes (recipe_id, name, prep_time, difficulty, category, instructions, tags) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              recipe_rows)
+            self._executemany("INSERT INTO recipe_ingredients (recipe_id, ingredient_id, quantity, unit, quantity_value, unit_canonical) VALUES (?, ?, ?, ?, ?, ?)",
+                              ingredient_rows)
+            recipe_ingredient_ids = [(recipe_id, [row[1] for row in rows]) for recipe_id, rows in itertools.groupby(ingredient_rows, key=lambda row: row[0])]
+            self._write_signatures(recipe_ingredient_ids)
+            self.conn.commit()
+            self.query_cache.clear()
+            for recipe_id, recipe_ingredients in recipe_ingredient_ids:
+                self._update_pantry_index(recipe_id, (), recipe_ingredients)
+            self._update_autocomplete(added_categories=[recipe.get('category', '') for recipe in batch])
+            return len(recipe_rows)
+        except sqlite3.Error as e:
+            self._rollback()
+            raise RepositoryError(f"Erro na importação em massa: {e}") from e
+        except BaseException:
+            self._rollback() # A bad record (or a KeyboardInterrupt) must not leave BEGIN IMMEDIATE open on the writer
+            raise
+
+    def _resolve_ingredient_ids(self, names):
+        """
+        Returns {name: ingredient_id} for all the names, inserting the ones that don't exist yet.
+        Names with the same key (only accents or case differ) share one ingredient.
+        """
+        ingredient_ids = self._load_ingredient_ids()
+        resolved = {}
+        missing = {} # key --> the first name typed with it, which becomes the ingredient's name
+        for name in names:
+            ingredient_id = ingredient_ids.get(ingredient_key(name))
+            if ingredient_id is None:
+                missing.setdefault(ingredient_key(name), name)
+            else:
+                resolved[name] = ingredient_id
+        self.ingredient_cache_hits += len(resolved)
+        self.ingredient_cache_misses += len(names) - len(resolved)
+
+        if missing:
+            self.cursor.execute("INSERT INTO ingredients (name, name_key) SELECT value, ingredient_key(value) FROM json_each(?) WHERE value NOT IN (SELECT name FROM ingredients)",
+                                (json.dumps(sorted(missing.values())),))
+            self._new_ingredient_names.extend(missing.values())
+            self.cursor.execute("SELECT name_key, MIN(ingredient_id) FROM ingredients WHERE name_key IN (SELECT value FROM json_each(?)) GROUP BY name_key",
+                                (json.dumps(sorted(missing)),))
+            ingredient_ids.update(self.cursor.fetchall())
+            for name in names:
+                if name not in resolved:
+                    resolved[name] = ingredient_ids[ingredient_key(name)]
+        return resolved
+
+    def _load_ingredient_ids(self):
+        """
+        The ingredient key --> id interning map (see ingredient_key). It is loaded the first time a write needs it.
+        Databases from before name_key can have a few ingredients with the same key, the oldest one is used
+        (merge_ingredients joins them). The ingredients table only grows, so after that we just add the new ingredients to it.
+        """
+        if self._ingredient_ids is None:
+            self.cursor.execute("SELECT name_key, MIN(ingredient_id) FROM ingredients GROUP BY name_key")
+            self._ingredient_ids = dict(self.cursor.fetchall())
+        return self._ingredient_ids
+
+    def _get_ingredient_id(self, ingredient_name):
+        """
+        Returns the id of the ingredient, inserting it if needed. Known names don't touch the database,
+        and a name typed with other accents or case gets the id of the ingredient already there.
+        """
+        key = ingredient_key(ingredient_name)
+        ingredient_ids = self._load_ingredient_ids()
+        ingredient_id = ingredient_ids.get(key)
+        if ingredient_id is not None:
+            self.ingredient_cache_hits += 1
+            return ingredient_id
+
+        self.ingredient_cache_misses += 1
+        # Insert and get the id in the same statement. If the name is already there (someone else inserted it),
+        # RETURNING gives nothing and we fall back to a SELECT
+        self.cursor.execute("INSERT INTO ingredients (name, name_key) VALUES (?, ?) ON CONFLICT (name) DO NOTHING RETURNING ingredient_id", (ingredient_name, key))
+        result = self.cursor.fetchone()
+        if result is None:
+            self.cursor.execute("SELECT ingredient_id FROM ingredients WHERE name = ?", (ingredient_name,))
+            result = self.cursor.fetchone()
+        else:
+            self._new_ingredient_names.append(ingredient_name)
+        ingredient_ids[key] = result[0]
+        return result[0]
+
+    def ingredient_cache_stats(self):
+        """Hit/miss counters of the ingredient interning cache."""
+        lookups = self.ingredient_cache_hits + self.ingredient_cache_misses
+        return {
+            'size': len(self._ingredient_ids) if self._ingredient_ids is not None else 0,
+            'hits': self.ingredient_cache_hits,
+            'misses': self.ingredient_cache_misses,
+            'hit_rate': self.ingredient_cache_hits / lookups if lookups else 0.0,
+        }
+
+    def _load_pantry_index(self):
+        """
+        The PantryIndex of all the recipes. It is built from recipe_ingredients the first time a pantry search needs it
+        (about a second for 1M recipes) and from then on every write updates it, see _update_pantry_index.
+        It is built holding the write lock, so no write can commit between the read and the index being in place.
+        """
+        with self._writing():
+            if self._pantry_index is None:
+                # Databases written before delete_recipe cleaned the junction table can have rows of deleted recipes
+                self.cursor.execute("SELECT recipe_id, ingredient_id FROM recipe_ingredients WHERE recipe_id IN (SELECT recipe_id FROM recipes)")
+                self._pantry_index = PantryIndex.build(self.cursor)
+            return self._pantry_index
+
+    def _update_pantry_index(self, recipe_id, old_ingredient_ids, new_ingredient_ids):
+        """Applies a committed change of the ingredients of a recipe to the pantry index, if it was already built."""
+        if self._pantry_index is not None:
+            self._pantry_index.update(recipe_id, old_ingredient_ids, new_ingredient_ids)
+
+    def autocomplete_indexes(self):
+        """
+        {'ingredients': PrefixIndex, 'categories': PrefixIndex} for search-as-you-type: all the ingredient names, and the
+        categories counted by recipe. They are read from the database the first time they are asked for and every write
+        updates them after its commit (see _update_autocomplete), so a keystroke never needs a query.
+        """
+        with self._writing():
+            if self._autocomplete is None:
+                try:
+                    self.cursor.execute("SELECT name FROM ingredients")
+                    ingredients = PrefixIndex(name for name, in self.cursor.fetchall())
+                    self.cursor.execute("SELECT category, COUNT(*) FROM recipes GROUP BY category")
+                    categories = PrefixIndex.from_counts(self.cursor.fetchall())
+                except sqlite3.Error as e:
+                    raise RepositoryError(f"Erro ao carregar o autocompletar: {e}") from e
+                self._autocomplete = {'ingredients': ingredients, 'categories': categories}
+            return self._autocomplete
+
+    def _update_autocomplete(self, added_categories=(), removed_categories=(), removed_ingredients=()):
+        """
+        Applies a committed write to the autocomplete indexes, if they were already built.
+        The ingredients inserted by the transaction were collected in _new_ingredient_names.
+        """
+        new_ingredient_names, self._new_ingredient_names = self._new_ingredient_names, []
+        if self._autocomplete is None:
+            return
+        for ingredient_name in new_ingredient_names:
+            self._autocomplete['ingredients'].add(ingredient_name)
+        for ingredient_name in removed_ingredients:
+            self._autocomplete['ingredients'].remove(ingredient_name)
+        for category in added_categories:
+            self._autocomplete['categories'].add(category)
+        for category in removed_categories:
+            self._autocomplete['categories'].remove(category)
+
+    def _write_signatures(self, recipes):
+        """
+        Stores the MinHash signature and LSH buckets of each (recipe_id, ingredient_ids).
+        Runs inside the caller's transaction, recipes without ingredients get no signature.
+        """
+        signature_rows = []
+        bucket_rows = []
+        for recipe_id, ingredient_ids in recipes:
+            signature = minhash_signature(ingredient_ids)
+            if signature is None:
+                continue
+            signature_rows.append((recipe_id, signature))
+            bucket_rows.extend((bucket, recipe_id) for bucket in band_buckets(signature))
+        bucket_rows.sort(key=operator.itemgetter(0)) # Inserting in key order keeps the writes on neighbouring pages of the buckets B-tree
+        self._executemany("INSERT OR REPLACE INTO recipe_signatures (recipe_id, signature) VALUES (?, ?)", signature_rows)
+        self._executemany("INSERT OR IGNORE INTO recipe_lsh_buckets (bucket, recipe_id) VALUES (?, ?)", bucket_rows)
+
+    def _delete_signatures(self, recipe_ids):
+        """Removes the signatures and buckets of these recipes (the buckets are found again from the stored signature)."""
+        self.cursor.execute("SELECT recipe_id, signature FROM recipe_signatures WHERE recipe_id IN (SELECT value FROM json_each(?))",
+                            (json.dumps(recipe_ids),))
+        bucket_rows = [(bucket, recipe_id) for recipe_id, signature in self.cursor.fetchall() for bucket in band_buckets(signature)]
+        self._executemany("DELETE FROM recipe_lsh_buckets WHERE bucket = ? AND recipe_id = ?", bucket_rows)
+        self.cursor.execute("DELETE FROM recipe_signatures WHERE recipe_id IN (SELECT value FROM json_each(?))", (json.dumps(recipe_ids),))
+
+    def _backfill_signatures(self):
+        """
+        Signs the recipes that have no signature yet, which only happens in databases written before the similar
+        recipes existed. Runs once per repository, SIGNATURE_BACKFILL_BATCH recipes per transaction,
+        releasing the write lock between the batches so the app can keep saving meanwhile.
+        """
+        if self._signatures_complete:
+            return
+        try:
+            with self._writing():
+                self.cursor.execute("SELECT COALESCE(MAX(recipe_id), 0) FROM recipes")
+                last_id = self.cursor.fetchone()[0]
+            for first_id in range(1, last_id + 1, SIGNATURE_BACKFILL_BATCH):
+                with self._writing():
+                    self.cursor.execute('''
+                        SELECT ri.recipe_id, ri.ingredient_id
+                        FROM recipe_ingredients ri
+                        WHERE ri.recipe_id BETWEEN ? AND ?
+                          AND EXISTS (SELECT 1 FROM recipes r WHERE r.recipe_id = ri.recipe_id)
+                          AND NOT EXISTS (SELECT 1 FROM recipe_signatures s WHERE s.recipe_id = ri.recipe_id)
+                        ORDER BY ri.recipe_id
+                    ''', (first_id, first_id + SIGNATURE_BACKFILL_BATCH - 1))
+                    rows = self.cursor.fetchall()
+                    if rows:
+                        self._write_signatures([(recipe_id, [row[1] for row in recipe_rows])
+                                                for recipe_id, recipe_rows in itertools.groupby(rows, key=lambda row: row[0])])
+                        self.conn.commit()
+            self._signatures_complete = True
+        except sqlite3.Error as e:
+            with self._writing():
+                self._rollback()
+            raise RepositoryError(f"Erro ao calcular as assinaturas das receitas: {e}") from e
+
+    def _pantry_ingredient_ids(self, pantry_input):
+        """Ids of the ingredients in a comma separated pantry (see resolve_ingredient_names). Unknown ones are just ignored."""
+        names = [name.strip().lower() for name in pantry_input.split(',') if name.strip()]
+        return sorted({ingredient_id for ingredient_ids in self.resolve_ingredient_names(names) for ingredient_id in ingredient_ids})
+
+    def resolve_ingredient_names(self, names, fuzzy=True):
+        """
+        The ingredient ids each typed name stands for, as one list per name. A name matches the ingredients with
+        the same key, ignoring accents and case. When there is none and fuzzy is True, it matches the closest name
+        in the trigram index (typos like "acuar" --> "açúcar"). A name that matches nothing gives [].
+        """
+        keys = [ingredient_key(name) for name in names]
+        with self._reading() as cursor:
+            cursor.execute("SELECT name_key, ingredient_id FROM ingredients WHERE name_key IN (SELECT value FROM json_each(?))",
+                           (json.dumps(sorted(set(keys))),))
+            ids_by_key = collections.defaultdict(list)
+            for key, ingredient_id in cursor.fetchall():
+                ids_by_key[key].append(ingredient_id)
+            for key in keys:
+                if key not in ids_by_key and fuzzy:
+                    matches = self._similar_ingredient_keys(cursor, key)
+                    if matches:
+                        best = matches[0][2]
+                        ids_by_key[key] = [ingredient_id for ingredient_id, _, match_key, _ in matches if match_key == best]
+        return [ids_by_key.get(key, []) for key in keys]
+
+    def _similar_ingredient_keys(self, cursor, key, limit=FUZZY_CANDIDATES):
+        """
+        (ingredient_id, name, name_key, similarity) of the ingredients most alike the key, best first.
+        A name with similarity >= FUZZY_MIN_SIMILARITY shares at least that fraction of the key's trigrams, so it must
+        have one of the (trigrams - shared + 1) rarest ones: only their posting lists are read from the trigram index,
+        and the names found in most of them are scored. Ranking by bm25 instead would score every name with a common
+        trigram like "ado", which takes hundreds of ms on a 100k names vocabulary.
+        """
+        trigrams = {key[i:i + 3] for i in range(len(key) - 2)}
+        if not trigrams:
+            return [] # Shorter than a trigram, only the exact match works
+        if self._trigram_frequencies is None:
+            # Counted once: names added later are missing from it, which only makes the choice of rare trigrams a bit worse
+            cursor.execute("SELECT term, doc FROM ingredients_trigram_vocab")
+            self._trigram_frequencies = dict(cursor.fetchall())
+        needed = math.ceil(FUZZY_MIN_SIMILARITY * len(trigrams))
+        rarest = sorted(trigrams, key=lambda trigram: (self._trigram_frequencies.get(trigram, 0), trigram))[:len(trigrams) - needed + 1]
+
+        postings = " UNION ALL ".join(["SELECT rowid FROM ingredients_trigram WHERE ingredients_trigram MATCH ?"] * len(rarest))
+        cursor.execute(f'''
+            SELECT i.ingredient_id, i.name, i.name_key
+            FROM (SELECT rowid, COUNT(*) AS shared FROM ({postings}) GROUP BY rowid ORDER BY shared DESC LIMIT ?) AS candidates
+            JOIN ingredients i ON i.ingredient_id = candidates.rowid
+        ''', ['"' + trigram.replace('"', '""') + '"' for trigram in rarest] + [limit])
+        matches = [(ingredient_id, name, name_key, trigram_similarity(key, name_key)) for ingredient_id, name, name_key in cursor.fetchall()]
+        matches = [match for match in matches if match[3] >= FUZZY_MIN_SIMILARITY]
+        matches.sort(key=lambda match: (-match[3], match[0]))
+        return matches
+
+    def find_similar_ingredients(self, name, limit=10):
+        """
+        The ingredients whose names look like this one (accents, case and typos), best first, as dicts with
+        'ingredient_id', 'name' and 'similarity' (1.0 for the same key). Handy to suggest corrections and merges.
+        """
+        try:
+            with self._reading() as cursor:
+                matches = self._similar_ingredient_keys(cursor, ingredient_key(name))
+        except sqlite3.Error as e:
+            raise RepositoryError(f"Erro ao buscar ingredientes parecidos: {e}") from e
+        return [{'ingredient_id': ingredient_id, 'name': ingredient_name, 'similarity': similarity}
+                for ingredient_id, ingredient_name, _, similarity in matches[:limit]]
+
+    def find_duplicate_ingredients(self):
+        """
+        Groups of ingredients that are the same once accents and case are ignored ("açúcar" and "acucar"),
+        as lists of (ingredient_id, name), oldest first. merge_ingredients joins each group into its first one.
+        """
+        try:
+            with self._reading() as cursor:
+                cursor.execute('''
+                    SELECT name_key, ingredient_id, name
+                    FROM ingredients
+                    WHERE name_key IN (SELECT name_key FROM ingredients GROUP BY name_key HAVING COUNT(*) > 1)
+                    ORDER BY name_key, ingredient_id
+                ''')
+                rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            raise RepositoryError(f"Erro ao buscar ingredientes duplicados: {e}") from e
+        return [[(ingredient_id, ingredient_name) for _, ingredient_id, ingredient_name in group]
+                for _, group in itertools.groupby(rows, key=lambda row: row[0])]
+
+    @_writes
+    def merge_ingredients(self, keep_id, merge_ids):
+        """
+        Joins the merge_ids ingredients into keep_id: their recipes use keep_id instead (a recipe that already had
+        keep_id keeps its own quantity) and the merged ingredients are deleted. Returns how many recipes changed.
+        """
+        merge_ids = sorted(set(merge_ids) - {keep_id})
+        if not merge_ids:
+            return 0
+        merge_json = json.dumps(merge_ids)
+        try:
+            self.cursor.execute("SELECT name FROM ingredients WHERE ingredient_id = ?", (keep_id,))
+            row = self.cursor.fetchone()
+            if row is None:
+                raise RepositoryError(f"Ingrediente {keep_id} não encontrado.")
+            keep_name = row[0]
+            self.cursor.execute("SELECT name FROM ingredients WHERE ingredient_id IN (SELECT value FROM json_each(?)) ORDER BY ingredient_id", (merge_json,))
+            merged_names = [row[0] for row in self.cursor.fetchall()]
+
+            self.cursor.execute("SELECT DISTINCT recipe_id FROM recipe_ingredients WHERE ingredient_id IN (SELECT value FROM json_each(?))", (merge_json,))
+            recipe_ids = [row[0] for row in self.cursor.fetchall()]
+            old_ingredient_ids = self._recipe_ingredient_ids(recipe_ids)
+
+            # Rows that would repeat keep_id in a recipe are left alone by OR IGNORE and deleted right after
+            self.cursor.execute("UPDATE OR IGNORE recipe_ingredients SET ingredient_id = ? WHERE ingredient_id IN (SELECT value FROM json_each(?))", (keep_id, merge_json))
+            self.cursor.execute("DELETE FROM recipe_ingredients WHERE ingredient_id IN (SELECT value FROM json_each(?))", (merge_json,))
+            self.cursor.execute("DELETE FROM ingredients WHERE ingredient_id IN (SELECT value FROM json_each(?))", (merge_json,))
+            new_ingredient_ids = self._recipe_ingredient_ids(recipe_ids)
+            self._delete_signatures(recipe_ids)
+            self._write_signatures(list(new_ingredient_ids.items()))
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self._rollback()
+            raise RepositoryError(f"Erro ao mesclar ingredientes: {e}") from e
+
+        self._ingredient_ids = None # Keys of the merged names now belong to keep_id
+        self.recipe_cache.clear() # The merged recipes show the kept name now
+        self.query_cache.clear()
+        for recipe_id in recipe_ids:
+            self._update_pantry_index(recipe_id, old_ingredient_ids.get(recipe_id, ()), new_ingredient_ids.get(recipe_id, ()))
+        self._update_autocomplete(removed_ingredients=merged_names)
+        self.log_action("Ingredientes Mesclados", f"Mantido: {keep_name}, Mesclados: {', '.join(merged_names)}, Receitas: {len(recipe_ids)}")
+        return len(recipe_ids)
+
+    def _recipe_ingredient_ids(self, recipe_ids):
+        """{recipe_id: [ingredient_id, ...]} of these recipes, read with the writer connection."""
+        self.cursor.execute("SELECT recipe_id, ingredient_id FROM recipe_ingredients WHERE recipe_id IN (SELECT value FROM json_each(?)) ORDER BY recipe_id",
+                            (json.dumps(recipe_ids),))
+        return {recipe_id: [row[1] for row in rows] for recipe_id, rows in itertools.groupby(self.cursor.fetchall(), key=lambda row: row[0])}
+
+    def _rollback(self):
+        """
+        Rolls back the current transaction. Ingredients inserted in it are gone from the database,
+        so the interning cache is thrown away and loaded again on the next write, and the autocomplete never sees them.
+        """
+        try:
+            self.conn.rollback()
+        except sqlite3.Error as e:
+            logger.error("Erro ao desfazer a transação: %s", e)
+        self._ingredient_ids = None
+        self._new_ingredient_names = []
+
+    @_writes
+    def update_recipe(self, recipe_id, name, prep_time, difficulty, category, instructions, tags, ingredients_list):
+        """
+        Update a recipe by its ID. The ingredients_list is a list of dictionaries.
+        Only what changed is written: the UPDATE sets just the changed columns (so the FTS trigger only runs when
+        name, instructions or tags changed) and the ingredients are diffed by name, so unchanged ones are not touched.
+        Existing ingredients keep their order, new ones go to the end.
+        Saving without changes writes nothing and doesn't log. Returns True.
+        """
+        new_fields = dict(zip(RECIPE_FIELD_LABELS, (name, prep_time, difficulty, category, instructions, tags)))
+        new_ingredients = {}
+        new_keys = set()
+        for ingredient in ingredients_list:
+            ingredient_name = ingredient.get('name', '').strip().lower()
+            if not ingredient_name:
+                continue
+            if ingredient_key(ingredient_name) in new_keys:
+                raise DuplicateIngredientError(f"O ingrediente '{ingredient_name}' aparece mais de uma vez. Verifique se o ingrediente não está duplicado.")
+            new_keys.add(ingredient_key(ingredient_name))
+            new_ingredients[ingredient_name] = ingredient_columns(ingredient)
+
+        try:
+            self.cursor.execute("SELECT name, prep_time, difficulty, category, instructions, tags FROM recipes WHERE recipe_id = ?", (recipe_id,))
+            row = self.cursor.fetchone()
+            if row is None:
+                raise RecipeNotFoundError(f"Receita {recipe_id} não encontrada.")
+            old_fields = dict(zip(RECIPE_FIELD_LABELS, row))
+            self.cursor.execute("""
+                SELECT i.name, ri.ingredient_id, ri.quantity, ri.unit, ri.quantity_value, ri.unit_canonical
+                FROM recipe_ingredients ri
+                JOIN ingredients i ON ri.ingredient_id = i.ingredient_id
+                WHERE ri.recipe_id = ?
+            """, (recipe_id,))
+            old_ingredients = {ingredient_name: (ingredient_id, tuple(columns)) for ingredient_name, ingredient_id, *columns in self.cursor.fetchall()}
+            # A name typed with other accents is the ingredient the recipe already has ("acucar" --> "açúcar")
+            old_names = {ingredient_key(ingredient_name): ingredient_name for ingredient_name in old_ingredients}
+            new_ingredients = {old_names.get(ingredient_key(ingredient_name), ingredient_name): columns
+                               for ingredient_name, columns in new_ingredients.items()}
+
+            changed_fields = [field for field in RECIPE_FIELD_LABELS if old_fields[field] != new_fields[field]]
+            removed = [ingredient_name for ingredient_name in old_ingredients if ingredient_name not in new_ingredients]
+            added = [ingredient_name for ingredient_name in new_ingredients if ingredient_name not in old_ingredients]
+            changed = [ingredient_name for ingredient_name, columns in new_ingredients.items()
+                       if ingredient_name in old_ingredients and old_ingredients[ingredient_name][1] != columns]
+            if not (changed_fields or removed or added or changed):
+                return True # Nothing to save
+
+            if changed_fields:
+                assignments = ", ".join(f"{field} = ?" for field in changed_fields)
+                self.cursor.execute(f"UPDATE recipes SET {assignments} WHERE recipe_id = ?",
+                                    [new_fields[field] for field in changed_fields] + [recipe_id])
+            if removed:
+                self.cursor.execute("DELETE FROM recipe_ingredients WHERE recipe_id = ? AND ingredient_id IN (SELECT value FROM json_each(?))",
+                                    (recipe_id, json.dumps([old_ingredients[ingredient_name][0] for ingredient_name in removed])))
+            if changed:
+                self._executemany("UPDATE recipe_ingredients SET quantity = ?, unit = ?, quantity_value = ?, unit_canonical = ? WHERE recipe_id = ? AND ingredient_id = ?",
+                                  [new_ingredients[ingredient_name] + (recipe_id, old_ingredients[ingredient_name][0]) for ingredient_name in changed])
+            added_ids = {ingredient_name: self._get_ingredient_id(ingredient_name) for ingredient_name in added}
+            if added:
+                self._executemany("INSERT INTO recipe_ingredients (recipe_id, ingredient_id, quantity, unit, quantity_value, unit_canonical) VALUES (?, ?, ?, ?, ?, ?)",
+                                  [(recipe_id, added_ids[ingredient_name]) + new_ingredients[ingredient_name] for ingredient_name in added])
+            new_ingredient_ids = [old_ingredients[ingredient_name][0] if ingredient_name in old_ingredients else added_ids[ingredient_name]
+                                  for ingredient_name in new_ingredients]
+            if added or removed:
+                self._delete_signatures([recipe_id])
+                self._write_signatures([(recipe_id, new_ingredient_ids)])
+            self.conn.commit()
+            self.recipe_cache.invalidate(recipe_id)
+            self.query_cache.clear()
+            if added or removed:
+                self._update_pantry_index(recipe_id, [ingredient_id for ingredient_id, _ in old_ingredients.values()], new_ingredient_ids)
+            if 'category' in changed_fields:
+                self._update_autocomplete(added_categories=[category], removed_categories=[old_fields['category']])
+            else:
+                self._update_autocomplete()
+            self.log_action("Receita Atualizada", f"ID: {recipe_id}, Nome: {name}; "
+                                                  + _describe_changes(old_fields, new_fields, changed_fields, added, removed, changed,
+                                                                      old_ingredients, new_ingredients))
+            return True
+        except sqlite3.Error as e:
+            self._rollback()
+            raise RepositoryError(f"Erro ao atualizar receita: {e}") from e
+
+    @_writes
+    def delete_recipe(self, recipe_id):
+        """
+        Delete a recipe by its ID.
+        Deletes the recipe and all associated ingredients in the junction table.
+        """
+        try:
+            # Get the recipe name before deleting
+            self.cursor.execute("SELECT name, category FROM recipes WHERE recipe_id = ?", (recipe_id,))
+            result = self.cursor.fetchone()
+            if result is None:
+                raise RecipeNotFoundError(f"Receita {recipe_id} não encontrada.")
+            name, category = result
+            ingredient_ids = []
+            if self._pantry_index is not None:
+                self.cursor.execute("SELECT ingredient_id FROM recipe_ingredients WHERE recipe_id = ?", (recipe_id,))
+                ingredient_ids = [row[0] for row in self.cursor.fetchall()]
+            self.log_action("Receita Excluída", f"ID: {recipe_id}, Nome: {name}")
+            # Delete the recipe and all associated ingredients. The foreign keys pragma is off,
+            # so ON DELETE CASCADE never runs and the junction rows have to go explicitly
+            self.cursor.execute("DELETE FROM recipe_ingredients WHERE recipe_id = ?", (recipe_id,))
+            self.cursor.execute("DELETE FROM recipes WHERE recipe_id = ?", (recipe_id,))
+            self._delete_signatures([recipe_id])
+            self.conn.commit()
+            self.recipe_cache.invalidate(recipe_id)
+            self.query_cache.clear()
+            self._update_pantry_index(recipe_id, ingredient_ids, ())
+            self._update_autocomplete(removed_categories=[category])
+            
+            return True
+        except sqlite3.Error as e:
+            self._rollback()
+            raise RepositoryError(f"Erro ao excluir receita: {e}") from e
+
+    def get_all_recipes(self):
+        """Get all recipes function."""
+        try:
+            return self._cached_query(("get_all_recipes",), lambda: self._load_recipes(
+                "SELECT recipe_id, name, prep_time, difficulty, category, instructions, tags FROM recipes"))
+        except sqlite3.Error as e:
+            raise RepositoryError(f"Erro ao buscar todas as receitas: {e}") from e
+
+    def iter_recipes(self, chunk_size=EXPORT_CHUNK_SIZE, after_id=0):
+        """
+        Yields every recipe, in recipe_id order, as the same dicts get_all_recipes returns, reading chunk_size recipes
+        (and their ingredients) per query, so a whole database can be exported without holding it in memory.
+        Chunks are read by keyset (recipe_id > the last one seen), each with a connection taken only for that read:
+        the caller may take its time between recipes without blocking the app, and a recipe changed meanwhile
+        shows up as it is when its chunk is read. after_id starts after that recipe (to resume an export).
+        Not cached, it would only push everything else out of the query cache.
+        """
+        last_id = after_id
+        while True:
+            try:
+                with self._reading() as cursor:
+                    cursor.execute("""
+                        SELECT recipe_id, name, prep_time, difficulty, category, instructions, tags
+                        FROM recipes WHERE recipe_id > ? ORDER BY recipe_id LIMIT ?
+                    """, (last_id, chunk_size))
+                    recipes_data = cursor.fetchall()
+                    recipes = self._attach_ingredients(cursor, recipes_data) if recipes_data else []
+            except sqlite3.Error as e:
+                raise RepositoryError(f"Erro ao exportar as receitas: {e}") from e
+            if not recipes:
+                return
+            last_id = recipes[-1]['recipe_id']
+            yield from recipes
+            if len(recipes) < chunk_size:
+                return
+
+    def shopping_list(self, recipe_ids):
+        """
+        Everything needed to cook the recipes, for the shopping list. One grouped query over recipe_ingredients sums
+        quantity_value by ingredient and unit_canonical, then the units of an ingredient that convert to each other
+        (see ingredient_parser.UNIT_CONVERSIONS) are summed together: 1 xícara + 100 ml of milk --> 340 ml.
+        An ingredient with a single unit keeps it (3 xícaras stay 3 xícaras), and weights never sum with volumes.
+        Returns dicts {'ingredient', 'quantity', 'unit', 'recipes', 'unquantified'} sorted by ingredient name:
+        quantity is None when no recipe gave a number ("sal a gosto"), unit is None for counted things ("3 ovos"),
+        recipes is how many of the recipes use it and unquantified how many of those have no number.
+        """
+        recipe_ids = list(dict.fromkeys(int(recipe_id) for recipe_id in recipe_ids))
+        if not recipe_ids:
+            return []
+        try:
+            with self._reading() as cursor:
+                cursor.execute('''
+                    SELECT ri.ingredient_id, i.name, ri.unit_canonical, SUM(ri.quantity_value), COUNT(ri.quantity_value), COUNT(*)
+                    FROM recipe_ingredients ri
+                    JOIN ingredients i ON ri.ingredient_id = i.ingredient_id
+                    WHERE ri.recipe_id IN (SELECT value FROM json_each(?))
+                    GROUP BY ri.ingredient_id, ri.unit_canonical
+                    ORDER BY i.name_key, i.name, ri.ingredient_id
+                ''', (json.dumps(recipe_ids),))
+                rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            raise RepositoryError(f"Erro ao montar a lista de compras: {e}") from e
+
+        # (ingredient_id, base unit) --> item, plus the total of each unit that had a number.
+        # Groups without any number ("a gosto") go under base unit None
+        items = {}
+        for ingredient_id, name, unit, total, quantified, recipes in rows:
+            key = (ingredient_id, base_unit(unit)[0] if quantified else None)
+            item = items.setdefault(key, {'ingredient': name, 'quantity': None, 'unit': None,
+                                          'recipes': 0, 'unquantified': 0, 'totals': {}})
+            item['recipes'] += recipes
+            item['unquantified'] += recipes - quantified
+            if quantified:
+                item['totals'][unit] = total
+
+        # "sal a gosto" next to "1 colher de chá de sal" is one line: 1 colher de chá, and some recipes don't say how much
+        quantified_keys = {}
+        for key, item in items.items():
+            if item['totals']:
+                quantified_keys.setdefault(key[0], key)
+        for key, item in list(items.items()):
+            if not item['totals'] and key[0] in quantified_keys:
+                target = items[quantified_keys[key[0]]]
+                target['recipes'] += item['recipes']
+                target['unquantified'] += item['unquantified']
+                del items[key]
+
+        shopping_list = []
+        for (_, base), item in items.items():
+            totals = item.pop('totals')
+            if len(totals) == 1:
+                unit, total = next(iter(totals.items()))
+                item['quantity'], item['unit'] = readable_quantity(total, unit)
+            elif totals:
+                item['quantity'], item['unit'] = readable_quantity(
+                    sum(total * base_unit(unit)[1] for unit, total in totals.items()), base)
+            shopping_list.append(item)
+        return shopping_list
+
+    def _cached_query(self, key, load):
+        """
+        Returns the query_cache entry of key, or runs load() and caches what it returns.
+        The cache has no per entry invalidation: every write to the recipes clears it, which bumps its generation,
+        and a result loaded while a write committed is not stored (put with the generation seen before loading).
+        Commits made by other connections (another process importing, for example) are noticed through
+        PRAGMA data_version, see _check_data_version.
+        Recipe lists are returned as copies, so the caller can change them without touching the cache.
+        """
+        self._check_data_version()
+        result = self.query_cache.get(key)
+        if result is None:
+            generation = self.query_cache.generation
+            result = load()
+            if not isinstance(result, list) or len(result) <= QUERY_CACHE_MAX_ROWS:
+                self.query_cache.put(key, result, generation)
+        if isinstance(result, list):
+            return [{**recipe, 'ingredients': list(recipe['ingredients'])} for recipe in result]
+        return result
+
+    def _check_data_version(self):
+        """
+        Clears the query cache if the database was changed by another connection. data_version changes when any
+        other connection commits, so on a pooled read connection our own writes also count (a harmless extra clear).
+        """
+        with self._reading() as cursor:
+            cursor.execute("PRAGMA data_version")
+            data_version = cursor.fetchone()[0]
+            previous = self._data_versions.get(cursor.connection)
+            self._data_versions[cursor.connection] = data_version
+        if previous is not None and previous != data_version:
+            self.query_cache.clear()
+
+    @staticmethod
+    def _filter_cache_key(method, ingredients_input, max_prep_time, category, difficulty, match_mode, text, fuzzy, *page):
+        """
+        query_cache key of a filter_recipes/count_recipes call. Ingredients are compared like the query compares them
+        (see ingredient_key), so "Açúcar, ovo" and "ovo, acucar" are the same search.
+        """
+        ingredient_keys = tuple(sorted({ingredient_key(name) for name in ingredients_input.split(',') if name.strip()}))
+        return (method, ingredient_keys, max_prep_time, category, difficulty, match_mode, text, fuzzy) + page
+
+    def query_cache_stats(self):
+        """Hit/miss counters of the search results cache (see _cached_query)."""
+        return self.query_cache.stats()
+
+    def get_recipe_by_id(self, recipe_id):
+        """
+        Get one recipe by its primary key (same dict as get_all_recipes) or None if it doesn't exist.
+        Recently opened recipes come from the LRU cache, which update_recipe and delete_recipe keep up to date.
+        """
+        recipe = self.recipe_cache.get(recipe_id)
+        if recipe is None:
+            generation = self.recipe_cache.generation # If it changes while we read, what we read may be stale
+            try:
+                recipes = self._load_recipes("SELECT recipe_id, name, prep_time, difficulty, category, instructions, tags FROM recipes WHERE recipe_id = ?", (recipe_id,))
+            except sqlite3.Error as e:
+                raise RepositoryError(f"Erro ao buscar a receita: {e}") from e
+            if not recipes:
+                return None
+            recipe = recipes[0]
+            self.recipe_cache.put(recipe_id, recipe, generation)
+        # A copy, so whoever edits the returned dict doesn't change the cached one
+        return {**recipe, 'ingredients': list(recipe['ingredients'])}
+
+    def _load_recipes(self, recipes_query, params=()):
+        """
+        Runs the recipes query and loads the ingredients of every returned recipe in a single extra query,
+        instead of one query per recipe. The recipes query must select the recipe columns in the usual order
+        (recipe_id, name, prep_time, difficulty, category, instructions, tags).
+        """
+        with self._reading() as cursor:
+            cursor.execute(recipes_query, tuple(params))
+            recipes_data = cursor.fetchall()
+            if not recipes_data:
+                return []
+            return self._attach_ingredients(cursor, recipes_data)
+
+    def _attach_ingredients(self, cursor, recipes_data):
+        """Builds the recipe dicts of the recipes rows and fills their ingredients with one query."""
+
+        all_recipes = []
+        recipes_by_id = {}
+        for recipe_id, name, prep_time, difficulty, category, instructions, tags in recipes_data:
+            recipe = {
+                'recipe_id': recipe_id,
+                'name': name,
+                'prep_time': prep_time,
+                'difficulty': difficulty,
+                'category': category,
+                'instructions': instructions,
+                'tags': tags,
+                'ingredients': []
+            }
+            all_recipes.append(recipe)
+            recipes_by_id[recipe_id] = recipe
+
+        # The ids go as one JSON array parameter, so the ingredients of all the recipes come in one pass
+        # no matter how many recipes there are (and the recipes query doesn't have to run again)
+        cursor.execute('''
+            SELECT ri.recipe_id, i.name, ri.quantity, ri.unit
+            FROM recipe_ingredients ri
+            JOIN ingredients i ON ri.ingredient_id = i.ingredient_id
+            WHERE ri.recipe_id IN (SELECT value FROM json_each(?))
+            ORDER BY ri.recipe_id, ri.rowid
+        ''', (json.dumps(list(recipes_by_id)),))
+        for recipe_id, ing_name, ing_quantity, ing_unit in cursor.fetchall():
+            recipes_by_id[recipe_id]['ingredients'].append(format_ingredient(ing_name, ing_quantity, ing_unit))
+        return all_recipes
+
+    def search_recipes_text(self, text, limit=200):
+        """
+        Full text search over name, instructions and tags, best matches first (bm25).
+        Every word must appear, and the words also match as prefixes ("choc" finds "chocolate").
+        """
+        match_expression = fts_match_expression(text)
+        if not match_expression:
+            return []
+
+        query = f"""
+            SELECT r.recipe_id, r.name, r.prep_time, r.difficulty, r.category, r.instructions, r.tags
+            FROM recipes_fts
+            JOIN recipes r ON r.recipe_id = recipes_fts.rowid
+            WHERE recipes_fts MATCH ?
+            ORDER BY {FTS_RANK}
+            LIMIT ?
+        """
+        try:
+            return self._load_recipes(query, (match_expression, limit))
+        except sqlite3.Error as e:
+            raise RepositoryError(f"Erro na busca por texto: {e}") from e
+
+    def explain_query_plan(self, query, params=()):
+        """Returns the EXPLAIN QUERY PLAN lines of a query, so we can check which indexes it uses."""
+        with self._reading() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + query, tuple(params))
+            return [row[3] for row in cursor.fetchall()]
+
+    def _report_query_plan(self, query, params, expect_index=True):
+        """Logs the query plan and warns when a filtered search falls back to a full table scan."""
+        try:
+            plan = self.explain_query_plan(query, params)
+        except sqlite3.Error as e:
+            logger.debug("query plan: não foi possível obter o plano: %s", e)
+            return
+        for line in plan:
+            logger.debug("query plan: %s", line)
+        # "SCAN sub" is just the small materialized ingredient subquery, any other SCAN is a real table scan
+        table_scans = [line for line in plan if line.startswith("SCAN ") and not line.startswith("SCAN sub")]
+        if expect_index and table_scans:
+            logger.warning("query plan: ATENÇÃO, busca sem índice: %s", table_scans)
+
+    def _explain_statements(self, statements):
+        """
+        [{'sql', 'plan'}] of the statements of a slow call, for the slow query log. The statements come from the trace
+        callback with their parameters already in the text, so EXPLAIN QUERY PLAN can run them as they are.
+        """
+        explained = []
+        for statement in dict.fromkeys(statements or ()): # Without repeats, in order
+            plan = []
+            if statement.lstrip().upper().startswith(("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")):
+                try:
+                    plan = self.explain_query_plan(statement)
+                except sqlite3.Error as e:
+                    plan = [f"sem plano: {e}"]
+            explained.append({'sql': statement, 'plan': plan})
+        return explained
+
+    def diagnostics(self):
+        """Snapshot of the metrics (latencies by method and slow query log) and of the caches and indexes, for the diagnostics panel."""
+        snapshot = self.metrics.snapshot()
+        snapshot['caches'] = {
+            'query_cache': self.query_cache.stats(),
+            'recipe_cache': self.recipe_cache.stats(),
+            'ingredient_ids': self.ingredient_cache_stats(),
+        }
+        if self._pantry_index is not None:
+            snapshot['pantry_index'] = self._pantry_index.stats()
+        if self._autocomplete is not None:
+            snapshot['autocomplete'] = {name: len(index) for name, index in self._autocomplete.items()}
+        snapshot['slow_query_ms'] = self.metrics.slow_ms
+        try:
+            with self._reading() as cursor:
+                cursor.execute("SELECT (SELECT COUNT(*) FROM user_logs), COALESCE(SUM(events), 0), COUNT(*), COALESCE(SUM(length(data)), 0) FROM user_logs_archive")
+                snapshot['user_logs'] = dict(zip(('events', 'archived_events', 'archive_chunks', 'archive_bytes'), cursor.fetchone()))
+        except sqlite3.Error as e:
+            logger.warning("Não foi possível contar os logs: %s", e)
+        return snapshot
+
+    def filter_recipes(self, ingredients_input, max_prep_time, category, difficulty, match_mode="prefix", text="", limit=None, offset=0,
+                       fuzzy=True):
+        """
+        Filters recipes based on ingredients, maximum preparation time, category, and difficulty.
+        If text is given, only recipes matching it in the full text index are returned, best matches first,
+        otherwise they come in the order of the index the filters use (see _build_filter_query): by category for a category
+        prefix, quickest first for a maximum time alone, recipe_id for everything else.
+        match_mode says how category and difficulty are compared (always ignoring case):
+        "prefix" --> category starts with the text and difficulty is exact (uses the indexes, default)
+        "exact" --> both must be equal (uses the indexes)
+        "contains" --> the old LIKE '%text%' search, which has to scan the whole recipes table
+        limit and offset return just one page of the results (use count_recipes for the total).
+        Ingredient names are matched ignoring accents and case and, with fuzzy=True, a name that matches no ingredient
+        matches the closest one instead (see resolve_ingredient_names).
+        Repeating a search before the next write gets its results from query_cache.
+        """
+        key = self._filter_cache_key("filter_recipes", ingredients_input, max_prep_time, category, difficulty, match_mode, text, fuzzy, limit, offset)
+        try:
+            return self._cached_query(key, lambda: self._filter_recipes(ingredients_input, max_prep_time, category, difficulty,
+                                                                        match_mode, text, limit, offset, fuzzy))
+        except sqlite3.Error as e:
+            raise RepositoryError(f"Erro ao filtrar receitas: {e}") from e
+
+    def _filter_recipes(self, ingredients_input, max_prep_time, category, difficulty, match_mode, text, limit, offset, fuzzy):
+        """Runs the filter_recipes query, without the cache."""
+        try:
+            query, params, match_expression, order_by = self._build_filter_query(ingredients_input, max_prep_time, category,
+                                                                                difficulty, match_mode, text, fuzzy)
+        except sqlite3.Error as e:
+            raise RepositoryError(f"Erro ao filtrar receitas: {e}") from e
+        query += f" ORDER BY {FTS_RANK}" if match_expression else f" ORDER BY {order_by}"
+        if limit is not None:
+            query += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+
+        logger.debug("filter_recipes: query final: %s", query)
+        logger.debug("filter_recipes: parâmetros finais: %s", params)
+
+        if self.debug:
+            self._report_query_plan(query, params, expect_index=" WHERE " in query)
+
+        try:
+            return self._load_recipes(query, params)
+        except sqlite3.Error as e:
+            raise RepositoryError(f"Erro ao filtrar receitas: {e}") from e
+
+    def count_recipes(self, ingredients_input, max_prep_time, category, difficulty, match_mode="prefix", text="", fuzzy=True):
+        """How many recipes filter_recipes returns for these filters (without loading them). Cached like filter_recipes."""
+        def count():
+            query, params, _, _ = self._build_filter_query(ingredients_input, max_prep_time, category, difficulty, match_mode, text, fuzzy)
+            with self._reading() as cursor:
+                cursor.execute(f"SELECT COUNT(*) FROM ({query})", tuple(params))
+                return cursor.fetchone()[0]
+        try:
+            return self._cached_query(self._filter_cache_key("count_recipes", ingredients_input, max_prep_time, category, difficulty,
+                                                             match_mode, text, fuzzy), count)
+        except sqlite3.Error as e:
+            raise RepositoryError(f"Erro ao contar receitas: {e}") from e
+
+    def find_recipes_by_pantry(self, pantry_input, limit=None, offset=0, max_missing=None):
+        """
+        "What can I cook": every recipe that uses at least one of the pantry ingredients (comma separated, like in
+        filter_recipes), the ones missing fewer ingredients first and, among those, the ones with the biggest part of
+        their ingredients in the pantry. max_missing leaves out the recipes missing more ingredients than that.
+        Each recipe dict also has 'matched' (how many of its ingredients are in the pantry), 'missing' (the names of
+        the others) and 'coverage' (matched / total, from 0 to 1).
+        The ranking comes from the in-memory PantryIndex, the database is only read for the recipes in the page.
+        """
+        try:
+            pantry_ids = self._pantry_ingredient_ids(pantry_input)
+            ranked = self._load_pantry_index().rank(pantry_ids, limit, offset, max_missing)
+            if not ranked:
+                return []
+            ids_json = json.dumps([recipe_id for recipe_id, _, _ in ranked])
+            recipes_by_id = {recipe['recipe_id']: recipe for recipe in self._load_recipes(
+                "SELECT recipe_id, name, prep_time, difficulty, category, instructions, tags FROM recipes WHERE recipe_id IN (SELECT value FROM json_each(?))",
+                (ids_json,))}
+            missing_names = {recipe_id: [] for recipe_id in recipes_by_id}
+            with self._reading() as cursor:
+                cursor.execute('''
+                    SELECT ri.recipe_id, i.name
+                    FROM recipe_ingredients ri
+                    JOIN ingredients i ON ri.ingredient_id = i.ingredient_id
+                    WHERE ri.recipe_id IN (SELECT value FROM json_each(?)) AND ri.ingredient_id NOT IN (SELECT value FROM json_each(?))
+                    ORDER BY ri.recipe_id, ri.rowid
+                ''', (ids_json, json.dumps(pantry_ids)))
+                for recipe_id, ingredient_name in cursor.fetchall():
+                    missing_names[recipe_id].append(ingredient_name)
+        except sqlite3.Error as e:
+            raise RepositoryError(f"Erro ao buscar receitas pela despensa: {e}") from e
+
+        recipes = []
+        for recipe_id, matched, missing in ranked:
+            recipe = recipes_by_id.get(recipe_id)
+            if recipe is None:
+                continue # Deleted between the ranking and the query
+            recipe['matched'] = matched
+            recipe['missing'] = missing_names[recipe_id]
+            recipe['coverage'] = matched / (matched + missing)
+            recipes.append(recipe)
+        return recipes
+
+    def count_recipes_by_pantry(self, pantry_input, max_missing=None):
+        """How many recipes find_recipes_by_pantry returns for this pantry (straight from the index)."""
+        try:
+            return self._load_pantry_index().count(self._pantry_ingredient_ids(pantry_input), max_missing)
+        except sqlite3.Error as e:
+            raise RepositoryError(f"Erro ao contar receitas pela despensa: {e}") from e
+
+    def find_similar_recipes(self, recipe_id, limit=10):
+        """
+        The recipes whose ingredients look the most like this one's, most similar first, each dict with an extra
+        'similarity' (estimated Jaccard similarity of the ingredient sets, 0 to 1).
+        Only the LSH buckets of the recipe are read (see recipe_similarity.py), so it doesn't depend on the collection size.
+        It is an estimate: a similar recipe can be missed, especially with few ingredients in common.
+        """
+        try:
+            self._backfill_signatures()
+            with self._reading() as cursor:
+                cursor.execute("SELECT signature FROM recipe_signatures WHERE recipe_id = ?", (recipe_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    return [] # No such recipe, or a recipe without ingredients
+                signature = row[0]
+
+                shared_buckets = collections.Counter()
+                for bucket in band_buckets(signature):
+                    cursor.execute("SELECT recipe_id FROM recipe_lsh_buckets WHERE bucket = ? LIMIT ?", (bucket, LSH_BUCKET_LIMIT))
+                    shared_buckets.update(candidate_id for (candidate_id,) in cursor.fetchall())
+                shared_buckets.pop(recipe_id, None)
+                candidates = [candidate_id for candidate_id, _ in shared_buckets.most_common(SIMILAR_CANDIDATES)]
+                if not candidates:
+                    return []
+
+                cursor.execute("SELECT recipe_id, signature FROM recipe_signatures WHERE recipe_id IN (SELECT value FROM json_each(?))",
+                               (json.dumps(candidates),))
+                similarities = {candidate_id: estimated_similarity(signature, other) for candidate_id, other in cursor.fetchall()}
+
+            best = sorted(similarities, key=lambda candidate_id: (-similarities[candidate_id], candidate_id))[:limit]
+            recipes = self._load_recipes(
+                "SELECT recipe_id, name, prep_time, difficulty, category, instructions, tags FROM recipes WHERE recipe_id IN (SELECT value FROM json_each(?))",
+                (json.dumps(best),))
+        except sqlite3.Error as e:
+            raise RepositoryError(f"Erro ao buscar receitas parecidas: {e}") from e
+
+        for recipe in recipes:
+            recipe['similarity'] = similarities[recipe['recipe_id']]
+        recipes.sort(key=lambda recipe: (-recipe['similarity'], recipe['recipe_id']))
+        return recipes
+
+    def _build_filter_query(self, ingredients_input, max_prep_time, category, difficulty, match_mode="prefix", text="", fuzzy=True):
+        """
+        Builds the filter_recipes query (without ORDER BY). Returns (query, params, fts match expression, order by).
+        The order is the one of the index the filter walks, so a page never needs the whole table or a sort:
+        a category prefix goes by category and a maximum time by prep_time, but as soon as there is an equality filter
+        (difficulty, exact category) the order is recipe_id, which is already the order of their index entries
+        (and the ingredient matches get sorted anyway). Always ends with recipe_id, so LIMIT/OFFSET pages are stable.
+        """
+        if match_mode not in MATCH_MODES:
+            raise ValueError(f"match_mode inválido: {match_mode}. Use um de {MATCH_MODES}")
+
+        ingredients_list = [ing.strip().lower() for ing in ingredients_input.split(',') if ing.strip()]
+        
+        logger.debug("filter_recipes: ingredientes processados: %s", ingredients_list)
+
+        query = """ 
+            SELECT r.recipe_id, r.name, r.prep_time, r.difficulty, r.category, r.instructions, r.tags
+            FROM recipes r
+        """ # Query to select recipes
+        
+        conditions = []
+        params = []
+        order_by = None # Column of the range filter whose index gives the order, see the docstring
+        equality_filter = False
+
+        # Adds conditions based on the provided filters
+        if category:
+            if match_mode == "contains":
+                conditions.append("r.category LIKE ?")
+                params.append(f"%{category}%")
+            elif match_mode == "exact":
+                conditions.append("r.category = ? COLLATE NOCASE")
+                params.append(category)
+                equality_filter = True
+            else:
+                # A range instead of LIKE 'x%', so SQLite can walk the NOCASE index
+                conditions.append("r.category >= ? COLLATE NOCASE AND r.category < ? COLLATE NOCASE")
+                params.extend([category, category + PREFIX_UPPER_BOUND])
+                order_by = "r.category COLLATE NOCASE, r.recipe_id"
+        if difficulty:
+            if match_mode == "contains":
+                conditions.append("r.difficulty LIKE ?")
+                params.append(f"%{difficulty}%")
+            else:
+                # Difficulty comes from a combobox, so the user always means the exact value
+                conditions.append("r.difficulty = ? COLLATE NOCASE")
+                params.append(difficulty)
+                equality_filter = True
+        if max_prep_time:
+            try:
+                max_time = int(max_prep_time)
+                conditions.append("r.prep_time <= ?")
+                params.append(max_time)
+                order_by = order_by or "r.prep_time, r.recipe_id" # Quickest first
+            except ValueError:
+                pass # If max_prep_time is not a valid integer, we ignore this condition so it doesnt break everything
+
+        # If there are ingredients to filter, we create a subquery to count matched ingredients
+        if ingredients_list:
+            # Each typed name can stand for a few ingredients (same name with other accents, or the closest names for a typo),
+            # so the subquery counts the typed names matched, not the ingredients: one [ingredient_id, name position] pair each
+            ingredient_pairs = [[ingredient_id, position] for position, ingredient_ids in enumerate(self.resolve_ingredient_names(ingredients_list, fuzzy))
+                                for ingredient_id in ingredient_ids]
+            ingredient_subquery = """
+                SELECT ri.recipe_id, COUNT(DISTINCT json_extract(m.value, '$[1]')) as matched_ingredients
+                FROM json_each(?) m
+                JOIN recipe_ingredients ri ON ri.ingredient_id = json_extract(m.value, '$[0]')
+                GROUP BY ri.recipe_id
+            """
+            # This subquery counts how many of the specified ingredients are in each recipe. 
+            query += f" JOIN ({ingredient_subquery}) AS sub ON r.recipe_id = sub.recipe_id"
+            conditions.append(f"sub.matched_ingredients >= ?")
+            # The subquery placeholders come before the WHERE ones in the final query, so its params go first
+            params = [json.dumps(ingredient_pairs)] + params # Adiciona os ingredientes aos parâmetros
+            params.append(len(ingredients_list)) # Adiciona a contagem de ingredientes aos parâmetros
+            equality_filter = True # The matched recipes come from the subquery and get sorted anyway
+
+        match_expression = fts_match_expression(text)
+        if match_expression:
+            query += " JOIN recipes_fts ON recipes_fts.rowid = r.recipe_id"
+            conditions.append("recipes_fts MATCH ?")
+            params.append(match_expression)
+
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        if equality_filter or order_by is None:
+            order_by = "r.recipe_id"
+        return query, params, match_expression, order_by
+
+
+# Public methods timed by instrumentation.timed (DatabaseManager inherits them timed too)
+TIMED_METHODS = (
+    'add_recipe', 'bulk_add_recipes', 'update_recipe', 'delete_recipe', 'merge_ingredients',
+    'get_all_recipes', 'get_recipe_by_id', 'filter_recipes', 'count_recipes', 'search_recipes_text',
+    'find_recipes_by_pantry', 'count_recipes_by_pantry', 'find_similar_recipes', 'resolve_ingredient_names',
+    'find_similar_ingredients', 'find_duplicate_ingredients', 'autocomplete_indexes', 'shopping_list',
+    'log_action', 'flush_logs', 'get_logs', 'archive_old_logs', 'get_log_rollups',
+)
+for _name in TIMED_METHODS:
+    setattr(RecipeRepository, _name, timed(getattr(RecipeRepository, _name)))
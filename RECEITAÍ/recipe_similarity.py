@@ -0,0 +1,73 @@
+import functools
+import operator
+import random
+import struct
+
+# MinHash + LSH for the "similar recipes" of the details window.
+# Comparing a recipe with every other one is linear per lookup (and quadratic for all of them), so each recipe gets a
+# MinHash signature of its ingredient set: NUM_HASHES small numbers where the fraction of equal positions between two
+# recipes estimates the Jaccard similarity of their ingredients (shared / all of both).
+# The signature is cut in NUM_BANDS bands and each band is hashed to a bucket: recipes that share a bucket are the
+# candidates, so a lookup only reads a few buckets instead of the whole collection.
+# With 16 bands of 3 rows, two recipes with Jaccard 0.5 share a bucket 88% of the time, with 0.2 only 12%.
+# The signatures and buckets are stored in the database (recipe_signatures and recipe_lsh_buckets), see RecipeRepository.
+
+NUM_BANDS = 16
+ROWS_PER_BAND = 3
+NUM_HASHES = NUM_BANDS * ROWS_PER_BAND
+
+_PRIME = (1 << 61) - 1
+# Fixed seed: the stored signatures must be computed the same way every time the app opens
+_rng = random.Random(20240601)
+_HASH_PARAMETERS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_HASHES)]
+_SIGNATURE_FORMAT = f"<{NUM_HASHES}H" # 16 bits per hash, 96 bytes per recipe
+_BAND_BYTES = ROWS_PER_BAND * 2
+_BANDS = [(band << (8 * _BAND_BYTES), band * _BAND_BYTES) for band in range(NUM_BANDS)] # (bucket prefix, offset) per band
+
+# The hash values of an ingredient are packed in one big int, 24 bits per hash: the 16 bit value and a guard bit
+# above it. Then the minimum of all the hashes of two ingredients takes a few int operations (see minhash_signature)
+# instead of a Python loop over the NUM_HASHES values, which makes signing a batch of imported recipes ~3x faster.
+_LANE_BITS = 24
+_GUARD_BITS = sum(1 << (_LANE_BITS * lane + 16) for lane in range(NUM_HASHES))
+
+
+@functools.lru_cache(maxsize=65536)
+def _ingredient_hashes(ingredient_id):
+    """The NUM_HASHES hash values of one ingredient, packed. Cached, there are few ingredients and many recipes."""
+    packed = 0
+    for lane, (a, b) in enumerate(_HASH_PARAMETERS):
+        packed |= (((a * ingredient_id + b) % _PRIME) & 0xFFFF) << (_LANE_BITS * lane)
+    return packed
+
+
+def minhash_signature(ingredient_ids):
+    """The MinHash signature (bytes) of a recipe's ingredient ids, or None for a recipe without ingredients."""
+    ingredient_ids = iter(set(ingredient_ids))
+    first = next(ingredient_ids, None)
+    if first is None:
+        return None
+    minimum = _ingredient_hashes(first)
+    for ingredient_id in ingredient_ids:
+        hashes = _ingredient_hashes(ingredient_id)
+        # The guard bit of a lane survives the subtraction only where minimum >= hashes, and becomes a 16 bit mask
+        take = (((minimum | _GUARD_BITS) - hashes) & _GUARD_BITS) >> 16
+        take *= 0xFFFF
+        minimum = (hashes & take) | (minimum & ~take)
+    # Little endian lanes are (low byte, high byte, guard byte): dropping every guard byte leaves the "<H" values
+    signature = bytearray(minimum.to_bytes(NUM_HASHES * _LANE_BITS // 8, "little"))
+    del signature[2::3]
+    return bytes(signature)
+
+
+def band_buckets(signature):
+    """
+    The LSH bucket of each band of a signature: its part of the signature read as one integer, with the band number
+    on top. So it is exact (no two different bands share a bucket) and fits SQLite's 64 bit integers.
+    """
+    return [band_prefix | int.from_bytes(signature[start:start + _BAND_BYTES], "little") for band_prefix, start in _BANDS]
+
+
+def estimated_similarity(signature, other_signature):
+    """Estimated Jaccard similarity (0 to 1) of the ingredients of two recipes, from their signatures."""
+    equal = sum(map(operator.eq, struct.unpack(_SIGNATURE_FORMAT, signature), struct.unpack(_SIGNATURE_FORMAT, other_signature)))
+    return equal / NUM_HASHES
@@ -0,0 +1,125 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from recipe_corpus import INGREDIENTS, build_database
+from recipe_repository import RecipeRepository, RepositoryError
+
+# Stress test for the read connection pool: several threads searching while one thread keeps writing.
+# It runs once with the default rollback journal and once with WAL, to compare how long the searches take.
+# Run it with: python stress_test.py --recipes 20000 --readers 8 --seconds 5
+
+INGREDIENT_NAMES = [ingredient[0] for ingredient in INGREDIENTS]
+SEARCH_WORDS = ("bolo", "torta", "chocolate", "sopa", "cremoso", "forno", "vovó", "arroz")
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def _reader(repository, stop, max_id, latencies, errors, seed):
+    """Runs a mix of the searches the app does, recording how long each one took."""
+    rng = random.Random(seed)
+    while not stop.is_set():
+        choice = rng.random()
+        start = time.perf_counter()
+        try:
+            if choice < 0.4:
+                repository.get_recipe_by_id(rng.randint(1, max_id))
+            elif choice < 0.7:
+                repository.filter_recipes(rng.choice(INGREDIENT_NAMES), "", rng.choice(["Doce", "Salgado"]), "", limit=50)
+            elif choice < 0.9:
+                repository.search_recipes_text(rng.choice(SEARCH_WORDS), limit=50)
+            else:
+                repository.count_recipes("", str(rng.randint(10, 130)), "", "")
+        except RepositoryError as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+def _writer(repository, stop, max_id, counters, errors):
+    """Keeps adding, editing and bulk importing recipes until stop is set."""
+    rng = random.Random(0)
+    n = 0
+    while not stop.is_set():
+        n += 1
+        ingredients = [{'name': INGREDIENT_NAMES[(n + k) % len(INGREDIENT_NAMES)], 'quantity': "1", 'unit': "xícara"} for k in range(5)]
+        try:
+            if n % 10 == 0:
+                batch = [{'name': f"Importada {n}-{k}", 'prep_time': 30, 'difficulty': "Fácil", 'category': "Doce",
+                          'instructions': "Misture tudo.", 'tags': "", 'ingredients': ingredients} for k in range(500)]
+                repository.bulk_add_recipes(batch)
+                counters['imported'] += len(batch)
+            elif n % 2 == 0:
+                repository.update_recipe(rng.randint(1, max_id), f"Receita editada {n}", 20, "Médio", "Salgado",
+                                         "Misture tudo de novo.", "", ingredients)
+                counters['writes'] += 1
+            else:
+                repository.add_recipe(f"Receita nova {n}", 15, "Fácil", "Doce", "Misture tudo.", "", ingredients)
+                counters['writes'] += 1
+        except RepositoryError as e:
+            errors.append(str(e))
+
+
+def run(db_path, recipes, readers, seconds, wal):
+    build_database(db_path, recipes, log_count=0)
+
+    repository = RecipeRepository(db_path, wal=wal, read_pool_size=readers)
+    stop = threading.Event()
+    latencies = [[] for _ in range(readers)]
+    errors = []
+    counters = {'writes': 0, 'imported': 0}
+    threads = [threading.Thread(target=_reader, args=(repository, stop, recipes, latencies[n], errors, n)) for n in range(readers)]
+    threads.append(threading.Thread(target=_writer, args=(repository, stop, recipes, counters, errors)))
+
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    repository.close()
+
+    all_latencies = [latency for reader_latencies in latencies for latency in reader_latencies]
+    return {
+        'reads': len(all_latencies),
+        'reads_per_second': len(all_latencies) / seconds,
+        'p50_ms': _percentile(all_latencies, 0.50) * 1000,
+        'p95_ms': _percentile(all_latencies, 0.95) * 1000,
+        'max_ms': max(all_latencies, default=0.0) * 1000,
+        'writes': counters['writes'],
+        'imported': counters['imported'],
+        'errors': errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga: leitores em paralelo com um escritor.")
+    parser.add_argument("--recipes", type=int, default=20000, help="Receitas iniciais (padrão: 20000)")
+    parser.add_argument("--readers", type=int, default=8, help="Threads de leitura (padrão: 8)")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duração de cada rodada (padrão: 5)")
+    args = parser.parse_args(argv)
+
+    print(f"{'modo':>9} {'leituras/s':>11} {'p50 (ms)':>9} {'p95 (ms)':>9} {'máx (ms)':>9} {'gravações':>10} {'importadas':>11} {'erros':>6}")
+    failed = False
+    for wal in (False, True):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            result = run(os.path.join(tmp_dir, "stress.db"), args.recipes, args.readers, args.seconds, wal)
+        print(f"{'WAL' if wal else 'rollback':>9} {result['reads_per_second']:>11.0f} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+              f"{result['max_ms']:>9.1f} {result['writes']:>10} {result['imported']:>11} {len(result['errors']):>6}")
+        for error in result['errors'][:5]:
+            print(f"    {error}", file=sys.stderr)
+        failed = failed or bool(result['errors'])
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+import unittest
+
+from ingredient_parser import parse_ingredient_line, quantity_value
+
+# Run with: python -m pytest test_ingredient_parser.py (or python -m unittest test_ingredient_parser)
+
+
+class QuantityValueTest(unittest.TestCase):
+
+    def test_sample_lines(self):
+        # line --> (name, quantity as typed, quantity_value, unit_canonical)
+        samples = {
+            "1.000 g de farinha": ("farinha", "1.000", 1000.0, "g"),
+            "2.500 ml de água": ("água", "2.500", 2500.0, "ml"),
+            "1.000,5 g de queijo": ("queijo", "1.000,5", 1000.5, "g"),
+            "1,5 kg de açúcar": ("açúcar", "1,5", 1.5, "kg"),
+            "1.5 xícara de leite": ("leite", "1.5", 1.5, "xícara"),
+            "0.500 kg de carne": ("carne", "0.500", 0.5, "kg"),
+            "1/2 xícara de óleo": ("óleo", "1/2", 0.5, "xícara"),
+            "2 a 3 colheres de sopa de manteiga": ("manteiga", "2 a 3", 3.0, "colher de sopa"),
+            "3 ovos": ("ovos", "3", 3.0, None),
+            "sal a gosto": ("sal", "a gosto", None, None),
+        }
+        for line, (name, quantity, value, unit) in samples.items():
+            with self.subTest(line=line):
+                parsed = parse_ingredient_line(line)
+                self.assertEqual(parsed['name'], name)
+                self.assertEqual(parsed['quantity'], quantity)
+                self.assertEqual(parsed['quantity_value'], value)
+                self.assertEqual(parsed['unit_canonical'], unit)
+
+    def test_thousands_separator_needs_groups_of_three(self):
+        self.assertEqual(quantity_value("10.000"), 10000.0)
+        self.assertEqual(quantity_value("1.000-1.500"), 1500.0)
+        self.assertEqual(quantity_value("1.00"), 1.0)
+        self.assertEqual(quantity_value("1.5000"), 1.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import random
+import unittest
+
+from pantry_index import PantryIndex
+
+# Run with: python -m pytest test_pantry_index.py (or python -m unittest test_pantry_index)
+
+COMMON_INGREDIENTS = range(1, 6) # In about half of the recipes each, so they get bitsets
+RARE_INGREDIENTS = range(100, 1100) # In a handful of recipes each, so they get sorted arrays
+
+
+def _random_ingredients(rng):
+    ingredients = {ingredient_id for ingredient_id in COMMON_INGREDIENTS if rng.random() < 0.5}
+    ingredients.update(rng.sample(RARE_INGREDIENTS, rng.randint(1, 4)))
+    return ingredients
+
+
+def _brute_force(recipes, pantry, max_missing=None):
+    """What rank should return, comparing the sets of every recipe with the pantry."""
+    results = []
+    for recipe_id, ingredients in recipes.items():
+        matched = len(ingredients & pantry)
+        missing = len(ingredients) - matched
+        if matched and (max_missing is None or missing <= max_missing):
+            results.append((recipe_id, matched, missing))
+    # Fewest missing, then the most ingredients (best coverage), then recipe_id
+    results.sort(key=lambda result: (result[2], -(result[1] + result[2]), result[0]))
+    return results
+
+
+class PantryIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(7)
+        self.recipes = {recipe_id: _random_ingredients(self.rng) for recipe_id in range(1, 641)}
+        self.index = PantryIndex.build((recipe_id, ingredient_id) for recipe_id, ingredients in self.recipes.items()
+                                       for ingredient_id in ingredients)
+
+    def assertMatchesBruteForce(self):
+        for _ in range(30):
+            pantry = set(self.rng.sample(COMMON_INGREDIENTS, 2) + self.rng.sample(RARE_INGREDIENTS, 40))
+            for max_missing in (None, 0, 2):
+                with self.subTest(pantry=sorted(pantry), max_missing=max_missing):
+                    expected = _brute_force(self.recipes, pantry, max_missing)
+                    self.assertEqual(self.index.rank(pantry, max_missing=max_missing), expected)
+                    self.assertEqual(self.index.rank(pantry, limit=7, offset=5, max_missing=max_missing), expected[5:12])
+                    self.assertEqual(self.index.count(pantry, max_missing), len(expected))
+
+    def test_both_kinds_of_posting(self):
+        stats = self.index.stats()
+        self.assertEqual(stats['bitsets'], len(COMMON_INGREDIENTS))
+        self.assertEqual(stats['recipes'], len(self.recipes))
+        self.assertMatchesBruteForce()
+
+    def test_after_add_update_and_remove(self):
+        for recipe_id in range(641, 700): # Past the highest id, so the bitsets grow
+            self.recipes[recipe_id] = _random_ingredients(self.rng)
+            self.index.add(recipe_id, self.recipes[recipe_id])
+        for recipe_id in self.rng.sample(sorted(self.recipes), 100):
+            new_ingredients = _random_ingredients(self.rng)
+            self.index.update(recipe_id, self.recipes[recipe_id], new_ingredients)
+            self.recipes[recipe_id] = new_ingredients
+        for recipe_id in self.rng.sample(sorted(self.recipes), 100):
+            self.index.remove(recipe_id, self.recipes.pop(recipe_id))
+        self.assertMatchesBruteForce()
+
+    def test_rare_ingredient_becomes_common_and_back(self):
+        # 200 recipes with ingredient 100 turn its array into a bitset, removing them turns it back
+        new_ids = range(1000, 1200)
+        for recipe_id in new_ids:
+            self.recipes[recipe_id] = {100, 101}
+            self.index.add(recipe_id, {100, 101})
+        self.assertEqual(self.index.stats()['bitsets'], len(COMMON_INGREDIENTS) + 2)
+        self.assertMatchesBruteForce()
+        for recipe_id in new_ids:
+            self.index.remove(recipe_id, self.recipes.pop(recipe_id))
+        self.assertEqual(self.index.stats()['bitsets'], len(COMMON_INGREDIENTS))
+        self.assertMatchesBruteForce()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+
+from recipe_repository import RecipeRepository
+from recipe_similarity import NUM_BANDS
+
+# Run with: python -m pytest test_recipe_repository.py (or python -m unittest test_recipe_repository)
+
+INGREDIENTS = [
+    {'name': 'farinha', 'quantity': '2', 'unit': 'xícara'},
+    {'name': 'ovo', 'quantity': '3', 'unit': ''},
+    {'name': 'açúcar', 'quantity': '1', 'unit': 'xícara'},
+]
+
+
+class UpdateRecipeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db = RecipeRepository(":memory:")
+        self.recipe_id = self.db.add_recipe("Bolo", 40, "Fácil", "Doce", "Asse", "festa", INGREDIENTS)
+        self.db.get_recipe_by_id(self.recipe_id) # Now it is in the recipe cache
+        self.db.flush_logs()
+
+    def tearDown(self):
+        self.db.close()
+
+    def update(self, name="Bolo", ingredients=INGREDIENTS):
+        return self.db.update_recipe(self.recipe_id, name, 40, "Fácil", "Doce", "Asse", "festa", ingredients)
+
+    def test_no_changes_writes_and_logs_nothing(self):
+        changes = self.db.conn.total_changes
+        # "acucar" is the ingredient the recipe already has, typed without the accents
+        self.assertTrue(self.update(ingredients=INGREDIENTS[:2] + [{'name': 'acucar', 'quantity': '1', 'unit': 'xícara'}]))
+        self.assertEqual(self.db.conn.total_changes, changes)
+        self.assertFalse(self.db.conn.in_transaction)
+        self.assertEqual(len(self.db.log_buffer), 0)
+
+    def test_rename_keeps_the_ingredient_order(self):
+        self.update(name="Bolo de Festa")
+        recipe = self.db.get_recipe_by_id(self.recipe_id)
+        self.assertEqual(recipe['name'], "Bolo de Festa") # Not the cached copy
+        self.assertEqual(recipe['ingredients'], ['2 xícara de farinha', '3 ovo', '1 xícara de açúcar'])
+        self.assertEqual([log[2] for log in self.db.get_logs()], ["Receita Atualizada", "Receita Cadastrada"])
+
+    def test_changed_and_added_ingredients(self):
+        self.update(ingredients=[{'name': 'ovo', 'quantity': '4', 'unit': ''}] + INGREDIENTS[0:1] + INGREDIENTS[2:]
+                    + [{'name': 'leite', 'quantity': '1', 'unit': 'xícara'}])
+        recipe = self.db.get_recipe_by_id(self.recipe_id)
+        # Existing ingredients stay where they were, the new one goes to the end
+        self.assertEqual(recipe['ingredients'], ['2 xícara de farinha', '4 ovo', '1 xícara de açúcar', '1 xícara de leite'])
+        self.assertEqual([found['recipe_id'] for found in self.db.find_recipes_by_pantry("leite")], [self.recipe_id])
+
+        self.update(ingredients=INGREDIENTS[:2])
+        self.assertEqual(self.db.get_recipe_by_id(self.recipe_id)['ingredients'], ['2 xícara de farinha', '3 ovo'])
+        self.assertEqual(self.db.find_recipes_by_pantry("leite"), [])
+        self.assertEqual(self.db.count_recipes_by_pantry("açúcar"), 0)
+
+
+def _ingredients(names):
+    return [{'name': name, 'quantity': '1', 'unit': ''} for name in names]
+
+
+class FindSimilarRecipesTest(unittest.TestCase):
+    CAKE = ['farinha', 'ovo', 'leite', 'açúcar', 'manteiga', 'fermento']
+
+    def setUp(self):
+        self.db = RecipeRepository(":memory:")
+        self.cake = self.db.add_recipe("Bolo", 40, "", "", "", "", _ingredients(self.CAKE))
+        self.other_cake = self.db.add_recipe("Bolo de sal", 40, "", "", "", "", _ingredients(self.CAKE[:5] + ['sal']))
+        self.rice = self.db.add_recipe("Arroz", 20, "", "", "", "", _ingredients(['arroz', 'alho', 'cebola', 'óleo', 'sal']))
+
+    def tearDown(self):
+        self.db.close()
+
+    def similar_ids(self, recipe_id):
+        return [recipe['recipe_id'] for recipe in self.db.find_similar_recipes(recipe_id)]
+
+    def buckets_of(self, recipe_id):
+        self.db.cursor.execute("SELECT COUNT(*) FROM recipe_lsh_buckets WHERE recipe_id = ?", (recipe_id,))
+        return self.db.cursor.fetchone()[0]
+
+    def test_edited_recipe_is_found_with_its_new_ingredients(self):
+        self.assertEqual(self.similar_ids(self.cake), [self.other_cake])
+        self.db.update_recipe(self.rice, "Bolo de cacau", 20, "", "", "", "", _ingredients(self.CAKE[:5] + ['cacau']))
+        self.assertEqual(sorted(self.similar_ids(self.cake)), sorted([self.other_cake, self.rice]))
+        self.assertLessEqual(self.buckets_of(self.rice), NUM_BANDS) # The buckets of the old ingredients are gone
+
+        self.db.update_recipe(self.rice, "Arroz", 20, "", "", "", "", _ingredients(['arroz', 'alho']))
+        self.assertEqual(self.similar_ids(self.cake), [self.other_cake])
+
+    def test_deleted_recipe_is_dropped(self):
+        self.db.delete_recipe(self.other_cake)
+        self.assertEqual(self.similar_ids(self.cake), [])
+        self.assertEqual(self.similar_ids(self.other_cake), [])
+        self.assertEqual(self.buckets_of(self.other_cake), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()